@@ -0,0 +1,158 @@
+import argparse
+import random
+import time
+from typing import Any, Callable
+
+from pytexalarm.pialarm import (
+    ZONE_TYPES,
+    ZONE_WIRING,
+    WintexEliteDecoder,
+    get_panel_decoder,
+)
+
+# Measures WintexEliteDecoder.decode() calls/sec over a panel filled with
+# random bytes, so every string and record field is populated, against the
+# byte at a time decoder the schema layouts replaced.
+# e.g. $ python -m benchmarks.decode --count 2000
+
+
+def get_bcd(mem: bytes, start: int, sz: int) -> str:
+    rgn = mem[start : start + sz]
+    return "".join(["{:01x}".format(x) for x in rgn])
+
+
+def get_ascii(mem: bytes, start: int, sz: int) -> str:
+    rgn = mem[start : start + sz].strip(b"\000")
+    return "".join([chr(x) for x in rgn])
+
+
+def baseline_decode(panel: WintexEliteDecoder) -> dict[str, Any]:
+    # WintexEliteDecoder.decode before schema.Layout, indexing panel.mem
+    # (a bytearray then, as it is again) field by field
+    mem, io = panel.mem[:], panel.io[:]
+    js: dict[str, Any] = {}
+    js["zones"] = [
+        {
+            "name": get_ascii(mem, 0x005400 + i * 32, 16),
+            "name2": get_ascii(mem, 0x005400 + i * 32 + 16, 16),
+            "type": mem[0 + i],
+            "chime": mem[0x000030 + i],
+            "area": mem[0x000060 + i],
+            "wiring": mem[0x000090 + i],
+            "attrib1": mem[0x0000C0 + i * 2],
+            "attrib2": mem[0x0000C1 + i * 2],
+        }
+        for i in range(panel.zones)
+    ]
+    pincode = mem[0x004190 : 0x004190 + 0x4B] + mem[0x00630B : 0x00630B + 0x18]
+    js["users"] = [
+        {
+            "name": get_ascii(mem, 0x004000 + 8 * i, 8).rstrip(),
+            "pincode": pincode[3 * i : 3 * i + 3].hex().strip("def"),
+            "access_areas": mem[0x0042EE + i * 2],
+            "flags0": "{:02x}".format(mem[0x0042B6 + i]),
+            "flags1": "{:02x}".format(mem[0x0043E8 + i]),
+        }
+        for i in range(panel.users)
+    ]
+    js["areas"] = [
+        {"text": get_ascii(mem, 0x0016A0 + i * 16, 16)} for i in range(panel.areas)
+    ]
+    js["config"] = {
+        "unique_id": get_bcd(mem, 0x005D04, 0x10),
+        "engineer_reset": get_ascii(mem, 0x001100, 32),
+        "anticode_reset": get_ascii(mem, 0x001120, 32),
+        "service_message": get_ascii(mem, 0x001140, 32),
+        "panel_location": get_ascii(mem, 0x001160, 32),
+        "banner_message": get_ascii(mem, 0x001180, 16),
+        "part_arm_header": get_ascii(mem, 0x001190, 16),
+        "part_arm1_message": get_ascii(mem, 0x001800, 16),
+        "part_arm2_message": get_ascii(mem, 0x001810, 16),
+        "part_arm3_message": get_ascii(mem, 0x001820, 16),
+    }
+    js["area_suites"] = [
+        {
+            "id": i,
+            "text": get_ascii(mem, 0x0005E8 + i * 16, 16),
+            "arm_mode": "",
+            "areas": "",
+        }
+        for i in range(2)
+    ]
+    js["expanders"] = [
+        {
+            "location": get_ascii(mem, 0x000E50 + i * 16, 16),
+            "area": mem[0x000F50 + i * 2],
+            "aux_input": mem[0x000F70 + i],
+            "sounds": mem[0x000F80 + i],
+            "speaker": mem[0x000F90 + i],
+        }
+        for i in range(panel.expanders)
+    ]
+    js["enums"] = {
+        "zones.type": {"type": "lookup", "key": "int1", "values": list(ZONE_TYPES)},
+        "zones.wiring": {"type": "lookup", "key": "int0", "values": list(ZONE_WIRING)},
+        "zones.access_areas": {"type": "bitmask", "values": ["A", "B"]},
+        "keypad.leds": {"type": "bitmask", "values": ["?", "?", "Omit"]},
+    }
+    js["communications"] = {
+        "sms_centre1": get_ascii(mem, 0x001A30, 16),
+        "sms_centre2": get_ascii(mem, 0x001A40, 16),
+    }
+    js["virtualkeypad"] = {
+        "screen": get_ascii(io, 0x001196, 16),
+        "screen2": get_ascii(io, 0x0011A6, 16),
+        "leds": io[0x11B7],
+    }
+    js["keypads"] = [
+        {
+            "keypad_z1_zone": mem[0x000FC0 + i * 2],
+            "keypad_z2_zone": mem[0x000FC1 + i * 2],
+            "areas": mem[0x000FA0 + i * 2],
+            "options": mem[0x000FE0 + i * 2],
+            "sounds": mem[0x001010 + i],
+            "volume": mem[0x001000 + i],
+        }
+        for i in range(panel.keypads)
+    ]
+    return js
+
+
+def best_of(fn: Callable[[], Any], count: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--count", help="decodes per run", default=1000, type=int)
+    parser.add_argument("--repeat", help="best of N runs", default=5, type=int)
+    args = parser.parse_args()
+
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    assert isinstance(panel, WintexEliteDecoder)
+    rng = random.Random(0)
+    panel.mem[:] = rng.randbytes(len(panel.mem))
+    panel.io[:] = rng.randbytes(len(panel.io))
+    if panel.decode() != baseline_decode(panel):
+        raise SystemExit("layouts and baseline decode differently")
+
+    baseline = best_of(lambda: baseline_decode(panel), args.count, args.repeat)
+    layouts = best_of(panel.decode, args.count, args.repeat)
+    for name, best in (("baseline", baseline), ("layouts", layouts)):
+        print(
+            f"{name:8s} {args.count} decodes {best * 1000:8.1f}ms"
+            f" {args.count / best:10.0f} decodes/sec"
+        )
+    print(f"layouts take {layouts / baseline:.2f}x the baseline time")
+
+
+if __name__ == "__main__":
+    main()
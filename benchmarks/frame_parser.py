@@ -0,0 +1,147 @@
+import argparse
+import contextlib
+import glob
+import io
+import time
+from typing import Any, Callable, Optional
+
+from pytexalarm.hexdump import printable
+from pytexalarm.udl import SerialWintex
+
+# Measures SerialWintex.on_bytes frames/sec over the ser2net trace corpus, for
+# the copying and cursor (zerocopy) parsers, against the parser they replaced.
+# e.g. $ python -m benchmarks.frame_parser --repeat 5
+
+
+class CountingWintex(SerialWintex):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.frames = 0
+
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        self.frames += 1
+        return None
+
+
+def baseline_checksum(data: bytes) -> int:
+    # udl_checksum before it summed with the builtin
+    sz = data[0]
+    if sz != len(data):
+        raise ValueError("length does not match framing!")
+    v = 255
+    for b in data:
+        v -= b
+    return v % 256
+
+
+class BaselineWintex(CountingWintex):
+    # SerialWintex.on_bytes and log_msg as they were, formatting every frame
+    # for the log whether verbose or not
+
+    def on_bytes(self, bytes_message: bytes) -> None:
+        self.buf.extend(bytes_message)
+        if self.debug:
+            print(f" buffer: {self.direction:4s} {self.buf}")
+        while len(self.buf) > 0 and len(self.buf) >= self.buf[0]:
+            sz = self.buf[0]
+            msg = self.buf[0:sz]
+            if baseline_checksum(msg) == 0:
+                self.log_msg(msg)
+                reply = self.handle_msg(msg[1 : sz - 1])
+                if reply:
+                    self.log_msg(reply)
+                del self.buf[0:sz]
+            else:
+                print(f"Warning: bad UDL checksum for {self.direction} at {self.buf}")
+                try:
+                    rpos = self.buf.index(b"ATZ\r")
+                    print(f"removing before index {rpos}")
+                    del self.buf[: rpos + 4]
+                except ValueError:
+                    print("emptying buffer")
+                    del self.buf[:]
+
+    def log_msg(self, msg: bytes) -> None:
+        mtype = msg[0]
+        printable_type = printable(mtype)
+        msg_hex = " ".join("{:02x}".format(m) for m in msg[1:])
+        msg_ascii = "".join(printable(c) for c in msg[1:])
+        if self.verbose:
+            print(f"  {self.direction:4s} {printable_type} {msg_hex} | {msg_ascii} ")
+
+
+PARSERS: dict[str, Callable[[str], CountingWintex]] = {
+    "baseline": lambda direction: BaselineWintex(direction=direction),
+    "copy": lambda direction: CountingWintex(direction=direction, zerocopy=False),
+    "cursor": lambda direction: CountingWintex(direction=direction, zerocopy=True),
+}
+
+
+def load_corpus(pattern: str) -> list[tuple[str, bytes]]:
+    # one (direction, bytes) chunk per trace line, as ser2net logged them
+    chunks = []
+    for fn in sorted(glob.glob(pattern)):
+        with open(fn, "r") as r:
+            for line in r:
+                direction = line[20:25].strip()
+                if direction in ("tcp", "term"):
+                    hexbytes = line[25:50].strip().split(" ")
+                    chunks.append((direction, bytes.fromhex("".join(hexbytes))))
+    return chunks
+
+
+def coalesce(chunks: list[tuple[str, bytes]]) -> list[tuple[str, bytes]]:
+    # join consecutive chunks in the same direction, like a large socket recv
+    joined: list[tuple[str, bytes]] = []
+    for direction, data in chunks:
+        if joined and joined[-1][0] == direction:
+            joined[-1] = (direction, joined[-1][1] + data)
+        else:
+            joined.append((direction, data))
+    return joined
+
+
+def run(chunks: list[tuple[str, bytes]], mode: str) -> tuple[int, float]:
+    parsers = {"tcp": PARSERS[mode]("tcp"), "term": PARSERS[mode]("term")}
+    # corpus has a few corrupt frames, keep the recovery chatter out of the timing
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for direction, data in chunks:
+            parsers[direction].on_bytes(data)
+        elapsed = time.perf_counter() - start
+    return sum(p.frames for p in parsers.values()), elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--traces", help="trace glob", default="protocol/wintex-ser2net/*.trace"
+    )
+    parser.add_argument("--repeat", help="best of N runs", default=5, type=int)
+    args = parser.parse_args()
+
+    per_line = load_corpus(args.traces)
+    workloads = {
+        "per-line": per_line,
+        "coalesced": coalesce(per_line),
+        "single-chunk": [
+            (d, b"".join(c for cd, c in per_line if cd == d)) for d in ("tcp", "term")
+        ],
+    }
+    for name, chunks in workloads.items():
+        baseline = 0.0
+        for mode in PARSERS:
+            best = min(run(chunks, mode)[1] for _ in range(args.repeat))
+            frames, _ = run(chunks, mode)
+            baseline = baseline or best
+            print(
+                f"{name:12s} {mode:8s} {frames:6d} frames"
+                f" {best * 1000:8.1f}ms {frames / best:10.0f} frames/sec"
+                f" {best / baseline:5.2f}x baseline time"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import time
+from typing import Any, Optional
+
+from pytexalarm.pialarm import PanelDecoder, get_panel_decoder
+from pytexalarm.udl import SerialWintex
+from pytexalarm.udlclient import ProtocolUDLClient
+from pytexalarm.udlserver import SerialWintexPanel, start_udl_server
+
+from .frame_parser import load_corpus
+
+# Drives an in-process udlserver with many simulated Wintex sessions, each
+# replaying the requests from one of the ser2net traces (login, downloads,
+# live state polling, heartbeats) as fast as the replies come back.
+# e.g. $ python -m benchmarks.load --clients 50 --out load.json
+#      $ python -m benchmarks.load --clients 50 --compare load.json
+
+
+class RequestRecorder(SerialWintex):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.msgs: list[bytes] = []
+
+    def handle_msg(self, body: bytes) -> None:
+        self.msgs.append(bytes(body))
+
+
+def load_scripts(pattern: str, banner: str) -> dict[str, list[bytes]]:
+    # requests Wintex sent in each trace, less those the emulator leaves
+    # unanswered (unknown commands), which would just measure our timeout.
+    # They are tried on a throwaway panel, so the trace's writes don't change
+    # the one the benchmark serves.
+    scripts = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for fn in sorted(glob.glob(pattern)):
+            rec = RequestRecorder()
+            for direction, data in load_corpus(fn):
+                if direction == "tcp":
+                    rec.on_bytes(data)
+            probe = SerialWintexPanel(get_panel_decoder(banner))
+            script = [m for m in rec.msgs if probe.handle_msg(m) is not None]
+            if script:
+                scripts[os.path.basename(fn)] = script
+    return scripts
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def run_client(
+    port: int, script: list[bytes], timeout: float, latencies: dict[str, list[float]]
+) -> int:
+    # replay one script, one request at a time like Wintex. Returns failures.
+    client = await ProtocolUDLClient.create("127.0.0.1", "", port=port, stupid_delay=0)
+    failures = 0
+    try:
+        for msg in script:
+            start = time.perf_counter()
+            await client.send_frame(msg)
+            try:
+                await asyncio.wait_for(client.read_frame(), timeout)
+            except asyncio.TimeoutError:
+                failures += 1
+                # a late reply would be taken as the answer to the next
+                # request, drop it and anything else in flight first
+                await client.discard_input()
+                continue
+            latencies.setdefault(chr(msg[0]), []).append(time.perf_counter() - start)
+    finally:
+        await client.close()
+    return failures
+
+
+async def load_test(
+    scripts: dict[str, list[bytes]], panel: PanelDecoder, clients: int, timeout: float
+) -> dict[str, Any]:
+    server = await start_udl_server(panel, False, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    names = sorted(scripts)
+    latencies: dict[str, list[float]] = {}
+    # client and server both narrate every frame, keep that off the terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        failures = await asyncio.gather(
+            *(
+                run_client(port, scripts[names[i % len(names)]], timeout, latencies)
+                for i in range(clients)
+            )
+        )
+        elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+
+    requests = sum(len(v) for v in latencies.values())
+    commands = {}
+    for cmd, samples in sorted(latencies.items()):
+        ordered = sorted(samples)
+        commands[cmd] = {
+            "count": len(ordered),
+            "p50_ms": percentile(ordered, 0.50) * 1000,
+            "p95_ms": percentile(ordered, 0.95) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+        }
+    return {
+        "python": platform.python_version(),
+        "clients": clients,
+        "scripts": names,
+        "requests": requests,
+        "failures": sum(failures),
+        "elapsed": elapsed,
+        "requests_per_sec": requests / elapsed,
+        "commands": commands,
+    }
+
+
+def print_results(results: dict[str, Any], baseline: Optional[dict[str, Any]]) -> None:
+    def change(new: float, old: Optional[float]) -> str:
+        return f" ({(new - old) / old:+6.1%})" if old else ""
+
+    base = baseline or {}
+    base_cmds = base.get("commands", {})
+    print(
+        f"{results['clients']} clients, {results['requests']} requests,"
+        f" {results['failures']} unanswered, in {results['elapsed']:.2f}s"
+    )
+    print(
+        f"{results['requests_per_sec']:.0f} requests/sec"
+        + change(results["requests_per_sec"], base.get("requests_per_sec"))
+    )
+    print(f"cmd {'count':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for cmd, r in results["commands"].items():
+        old = base_cmds.get(cmd, {})
+        print(
+            f"{cmd:3s} {r['count']:7d} {r['p50_ms']:8.3f} {r['p95_ms']:8.3f}"
+            f" {r['p99_ms']:8.3f}" + change(r["p99_ms"], old.get("p99_ms"))
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--traces", help="trace glob", default="protocol/wintex-ser2net/*.trace"
+    )
+    parser.add_argument("--clients", help="simulated sessions", default=20, type=int)
+    parser.add_argument(
+        "--timeout", help="seconds to wait for a reply", default=2.0, type=float
+    )
+    parser.add_argument("--out", help="write results as json to FILE", default=None)
+    parser.add_argument(
+        "--compare", help="show changes against an earlier --out FILE", default=None
+    )
+    args = parser.parse_args()
+
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    scripts = load_scripts(args.traces, panel.banner)
+    results = asyncio.run(load_test(scripts, panel, args.clients, args.timeout))
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import time
+from typing import Awaitable, Callable
+
+from pytexalarm.pialarm import get_panel_decoder
+from pytexalarm.udlclient import AsyncioUDLClient, BaseUDLClient, ProtocolUDLClient
+from pytexalarm.udlserver import LinkModel, start_udl_server
+
+# Measures request/reply round trips per second against a udlserver on
+# loopback, for the stream and protocol client transports, both one request
+# at a time (read_mem) and pipelined (read_ranges). The server runs in a
+# process of its own so the numbers are the client's, unless --in-process.
+# The --link options put a simulated UART/IPCom between them, with faults
+# repeated from --seed.
+# e.g. $ python -m benchmarks.round_trips --count 2000
+#      $ python -m benchmarks.round_trips --count 200 --baud 19200 --buffer 0.02
+
+
+async def run(client: BaseUDLClient, count: int, pipelined: bool) -> float:
+    start = time.perf_counter()
+    if pipelined:
+        await client.read_ranges([(64 * (i % 256), 64) for i in range(count)])
+    else:
+        for i in range(count):
+            await client.read_mem(64 * (i % 256), 64)
+    return time.perf_counter() - start
+
+
+async def serve(link: LinkModel, ports: "multiprocessing.Queue[int]") -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    server = await start_udl_server(panel, False, "127.0.0.1", 0, link=link)
+    ports.put(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def server_process(link: LinkModel, ports: "multiprocessing.Queue[int]") -> None:
+    # the server narrates every frame, keep that off the terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(serve(link, ports))
+
+
+async def bench(count: int, repeat: int, window: int, port: int) -> list[str]:
+    transports: dict[str, Callable[..., Awaitable[BaseUDLClient]]] = {
+        "stream": AsyncioUDLClient.create,
+        "protocol": ProtocolUDLClient.create,
+    }
+    results = []
+    for name, create in transports.items():
+        for pipelined in (False, True):
+            mode = "pipelined" if pipelined else "serial"
+            client = await create(
+                "127.0.0.1", "1234", port=port, stupid_delay=0, max_window=window
+            )
+            client.log = lambda msg: None
+            best = min([await run(client, count, pipelined) for _ in range(repeat)])
+            await client.close()
+            results.append(
+                f"{name:8s} {mode:9s} {count:6d} reads"
+                f" {best * 1000:8.1f}ms {count / best:10.0f} round trips/sec"
+            )
+    return results
+
+
+async def bench_in_process(
+    count: int, repeat: int, window: int, link: LinkModel
+) -> list[str]:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    # the server narrates every frame, keep that out of the timing
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = await start_udl_server(panel, False, "127.0.0.1", 0, link=link)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await bench(count, repeat, window, port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--count", help="reads per run", default=2000, type=int)
+    parser.add_argument("--repeat", help="best of N runs", default=3, type=int)
+    parser.add_argument(
+        "--window", help="most reads in flight when pipelined", default=16, type=int
+    )
+    parser.add_argument(
+        "--in-process",
+        help="run the server on the client's event loop",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument("--baud", help="simulated UART baud", default=0, type=int)
+    parser.add_argument(
+        "--delay", help="simulated panel seconds per request", default=0.0, type=float
+    )
+    parser.add_argument(
+        "--buffer", help="simulated IPCom seconds per reply", default=0.0, type=float
+    )
+    parser.add_argument("--jitter", help="simulated jitter", default=0.0, type=float)
+    parser.add_argument(
+        "--corrupt", help="simulated chance a byte is garbled", default=0.0, type=float
+    )
+    parser.add_argument("--seed", help="simulated fault seed", default=0, type=int)
+    args = parser.parse_args()
+    link = LinkModel(
+        baudrate=args.baud,
+        frame_delay=args.delay,
+        buffer_delay=args.buffer,
+        jitter=args.jitter,
+        corrupt_rate=args.corrupt,
+        seed=args.seed,
+    )
+    if args.in_process:
+        results = asyncio.run(
+            bench_in_process(args.count, args.repeat, args.window, link)
+        )
+        print("\n".join(results))
+        return
+    ports: "multiprocessing.Queue[int]" = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=server_process, args=(link, ports), daemon=True
+    )
+    server.start()
+    try:
+        results = asyncio.run(bench(args.count, args.repeat, args.window, ports.get()))
+        print("\n".join(results))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
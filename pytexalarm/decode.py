@@ -18,10 +18,16 @@ if __name__ == "__main__":
     parser.add_argument(
         "--json", help="dump json extracted data", default=False, action="store_true"
     )
+    parser.add_argument(
+        "--migrate",
+        help="rewrite a version 1 MEMFILE in the current format",
+        default=False,
+        action="store_true",
+    )
 
     args = parser.parse_args()
 
-    panel = panel_from_file(args.mem)
+    panel = panel_from_file(args.mem, migrate=args.migrate)
 
     if not panel:
         print("error: panel type not determined -- incomplete trace?")
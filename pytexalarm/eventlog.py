@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import struct
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Mapping, NamedTuple, Tuple
+
+from .paged import Region
+from .pialarm import PanelDecoder
+from .udl import UDLClient, plan_reads
+
+# The event log is a ring of 8-byte records at 0x2000. The little-endian word
+# at 0x1FFE is the slot the panel will write next, so Wintex reads it first and
+# then only the slots written since its last visit (see log-recv.trace).
+LOG_POINTER = 0x1FFE
+LOG_BASE = 0x2000
+LOG_RECORD_SIZE = 8
+LOG_SLOTS = 500
+
+# store entries are the ring slot number followed by the raw record
+STORE_ENTRY = struct.Struct(f"<H{LOG_RECORD_SIZE}s")
+
+
+class LogStore:
+    """
+    Append-only local copy of the records fetched from one panel's log ring.
+
+    The slot of the last stored record doubles as the remembered log pointer,
+    so there is no separate state to keep in step with the records. Only
+    while a fetch has found no records since the last stored (an empty log,
+    or one just cleared) is the pointer kept in a '.ptr' file beside it, so
+    the same slots aren't read again every time.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def __iter__(self) -> Iterator[Tuple[int, bytes]]:
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % STORE_ENTRY.size  # ignore a torn append
+        for slot, record in STORE_ENTRY.iter_unpack(data[:usable]):
+            yield slot, record
+
+    def last(self) -> Tuple[int, bytes] | None:
+        # the slot and record last stored
+        if not os.path.exists(self.filename):
+            return None
+        size = os.path.getsize(self.filename)
+        size -= size % STORE_ENTRY.size
+        if size == 0:
+            return None
+        with open(self.filename, "rb") as f:
+            f.seek(size - STORE_ENTRY.size)
+            slot, record = STORE_ENTRY.unpack(f.read(STORE_ENTRY.size))
+        return int(slot), bytes(record)
+
+    def next_slot(self) -> int | None:
+        saved = self.saved_pointer()
+        if saved is not None:
+            return saved
+        last = self.last()
+        return None if last is None else (last[0] + 1) % LOG_SLOTS
+
+    def saved_pointer(self) -> int | None:
+        try:
+            with open(self.filename + ".ptr", "r") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def save_pointer(self, slot: int) -> None:
+        with open(self.filename + ".ptr", "w") as f:
+            f.write(str(slot))
+
+    def append(self, entries: list[Tuple[int, bytes]]) -> None:
+        with open(self.filename, "ab") as f:
+            f.write(b"".join(STORE_ENTRY.pack(slot, rec) for slot, rec in entries))
+        # the last record is the pointer again
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.filename + ".ptr")
+
+
+def slots_between(start: int, end: int) -> list[int]:
+    # ring slots written after 'start' up to (not including) 'end'
+    if start <= end:
+        return list(range(start, end))
+    return list(range(start, LOG_SLOTS)) + list(range(0, end))
+
+
+def is_empty_record(record: bytes) -> bool:
+    return record in (b"\x00" * LOG_RECORD_SIZE, b"\xff" * LOG_RECORD_SIZE)
+
+
+def log_record(mem: Region, slot: int) -> bytes:
+    base = LOG_BASE + slot * LOG_RECORD_SIZE
+    return bytes(mem[base : base + LOG_RECORD_SIZE])
+
+
+async def read_slots(panel: PanelDecoder, client: UDLClient, slots: list[int]) -> None:
+    # a wrapped run of slots is two runs, plan_reads keeps them apart
+    ranges = [(LOG_BASE + s * LOG_RECORD_SIZE, LOG_RECORD_SIZE) for s in slots]
+    reads = plan_reads(ranges, client.read_size, merge_gap=0)
+    for (base, sz), bs in zip(reads, await client.read_ranges(reads)):
+        panel.mem[base : base + sz] = bs
+        panel.mark_known(base, sz)
+
+
+async def fetch_log(panel: PanelDecoder, client: UDLClient, store: LogStore) -> int:
+    """Fetch log records written since the last fetch into store and panel.mem.
+
+    The first fetch reads the whole ring, oldest record first. Later ones
+    read the new slots and the last one stored, which should be unchanged.
+    If it isn't, the log was cleared or has come round past it, and the
+    whole ring is stored again, with a warning that records may be missing.
+    Returns the number of records appended."""
+    ptr = await client.read_mem(LOG_POINTER, 2)
+    panel.mem[LOG_POINTER : LOG_POINTER + 2] = ptr
+    panel.mark_known(LOG_POINTER, 2)
+    end = int.from_bytes(ptr, "little")
+    if end >= LOG_SLOTS:
+        raise ValueError(f"log pointer {end} outside ring of {LOG_SLOTS}")
+    # whole ring, oldest first. Never-written slots are skipped below.
+    ring = slots_between(end, LOG_SLOTS) + slots_between(0, end)
+    start = store.next_slot()
+    last = store.last()
+    if last and start != (last[0] + 1) % LOG_SLOTS:
+        last = None  # already checked, the log was empty after it
+    whole = start is None
+    slots = ring if start is None else slots_between(start, end)
+    if not slots:
+        # an unchanged pointer is taken as nothing new. A log cleared back to
+        # the same slot, or a whole ring written since, goes unnoticed until
+        # the pointer next moves.
+        return 0
+
+    # the last stored slot is next to the new ones, so costs no extra read
+    await read_slots(panel, client, [last[0]] + slots if last else slots)
+    if last and log_record(panel.mem, last[0]) != last[1]:
+        panel.log(
+            f"log slot {last[0]} has changed since it was fetched, the log was"
+            f" cleared or over {LOG_SLOTS} records were written, re-reading it"
+            " all. Records may be missing."
+        )
+        whole = True
+        slots = ring
+        await read_slots(panel, client, slots)
+
+    entries = []
+    for s in slots:
+        record = log_record(panel.mem, s)
+        if not whole or not is_empty_record(record):
+            entries.append((s, record))
+    if entries:
+        store.append(entries)
+    else:
+        # nothing written yet, but the slots read needn't be read again
+        store.save_pointer(end)
+    panel.log(f"fetched {len(slots)} log slots, {len(entries)} new records")
+    return len(entries)
+
+
+# Records are event type, group type, parameter (zone/user number), area bitmask
+# then a packed little-endian timestamp: seconds in bits 0-5, minutes 6-11,
+# hours 12-16, day 17-21, month 22-25 and years since 2000 in 26-31. The packed
+# value orders the same as the time, so it is used directly as a sort key.
+LOG_RECORD = struct.Struct("<BBBBI")
+
+
+def unpack_log_time(v: int) -> datetime | None:
+    try:
+        return datetime(
+            2000 + (v >> 26),
+            (v >> 22) & 0xF,
+            (v >> 17) & 0x1F,
+            (v >> 12) & 0x1F,
+            (v >> 6) & 0x3F,
+            v & 0x3F,
+        )
+    except ValueError:
+        return None  # panel clock not set
+
+
+def pack_log_time(t: datetime) -> int:
+    return (
+        (t.year - 2000) << 26
+        | t.month << 22
+        | t.day << 17
+        | t.hour << 12
+        | t.minute << 6
+        | t.second
+    )
+
+
+class LogEvent(NamedTuple):
+    slot: int
+    event: int
+    group: int
+    parameter: int
+    areas: int
+    time: int  # packed, see unpack_log_time
+
+    @classmethod
+    def decode(cls, slot: int, record: bytes) -> LogEvent:
+        return cls(slot, *LOG_RECORD.unpack(record))
+
+    def as_dict(self) -> dict[str, Any]:
+        when = unpack_log_time(self.time)
+        return {
+            "slot": self.slot,
+            "event": self.event,
+            "group": self.group,
+            "parameter": self.parameter,
+            "areas": self.areas,
+            "time": when.isoformat() if when else f"{self.time:08x}",
+        }
+
+
+def decode_log(mem: Region) -> list[LogEvent]:
+    # the ring held in panel memory, oldest event first
+    end = int.from_bytes(mem[LOG_POINTER : LOG_POINTER + 2], "little") % LOG_SLOTS
+    events = []
+    for s in slots_between(end, LOG_SLOTS) + slots_between(0, end):
+        base = LOG_BASE + s * LOG_RECORD_SIZE
+        record = bytes(mem[base : base + LOG_RECORD_SIZE])
+        if not is_empty_record(record):
+            events.append(LogEvent.decode(s, record))
+    return events
+
+
+class EventQuery(NamedTuple):
+    start: int = 0  # packed times, start inclusive and end exclusive
+    end: int = 0xFFFFFFFF
+    events: frozenset[int] | None = None
+    areas: int | None = None  # bitmask, matches events in any of these areas
+    parameter: int | None = None
+
+    @classmethod
+    def from_params(cls, params: Mapping[str, str]) -> EventQuery:
+        # e.g. ?start=2025-01-01T00:00&event=1,2&areas=1&parameter=5
+        events = params.get("event")
+        return cls(
+            pack_log_time(datetime.fromisoformat(params["start"]))
+            if "start" in params
+            else 0,
+            pack_log_time(datetime.fromisoformat(params["end"]))
+            if "end" in params
+            else 0xFFFFFFFF,
+            frozenset(int(e) for e in events.split(",")) if events else None,
+            int(params["areas"]) if "areas" in params else None,
+            int(params["parameter"]) if "parameter" in params else None,
+        )
+
+    def match(self, e: LogEvent) -> bool:
+        return (
+            self.start <= e.time < self.end
+            and (self.events is None or e.event in self.events)
+            and (self.areas is None or bool(e.areas & self.areas))
+            and (self.parameter is None or e.parameter == self.parameter)
+        )
+
+
+# A block summarises INDEX_BLOCK consecutive store entries: time bounds, OR of
+# area masks, and bitmaps of the event types and parameters present.
+INDEX_BLOCK = 64
+INDEX_ENTRY = struct.Struct("<IIB32s32s")
+
+
+class BlockSummary(NamedTuple):
+    first: int
+    last: int
+    areas: int
+    events: int
+    parameters: int
+
+    def may_match(self, q: EventQuery) -> bool:
+        return (
+            self.first < q.end
+            and self.last >= q.start
+            and (q.events is None or any(self.events >> e & 1 for e in q.events))
+            and (q.areas is None or bool(self.areas & q.areas))
+            and (q.parameter is None or bool(self.parameters >> q.parameter & 1))
+        )
+
+
+def summarise(events: list[LogEvent]) -> BlockSummary:
+    areas = evs = params = 0
+    for e in events:
+        areas |= e.areas
+        evs |= 1 << e.event
+        params |= 1 << e.parameter
+    times = [e.time for e in events]
+    return BlockSummary(min(times), max(times), areas, evs, params)
+
+
+class LogIndex:
+    """
+    Append-only block index over a LogStore, kept in a '.idx' file beside it.
+
+    Only whole blocks are indexed. A query checks the block summaries and
+    decodes just the blocks that might match, plus the unindexed tail.
+    """
+
+    def __init__(self, store: LogStore):
+        self.store = store
+        self.filename = store.filename + ".idx"
+        self.data = b""
+        self.count = 0
+        self.blocks: list[BlockSummary] = []
+        self.block_last: list[int] = []  # running max of block.last, for bisect
+        self.decoded: dict[int, list[LogEvent]] = {}
+
+    def decode_range(self, first: int, last: int) -> list[LogEvent]:
+        sz = STORE_ENTRY.size
+        return [
+            LogEvent.decode(slot, rec)
+            for slot, rec in STORE_ENTRY.iter_unpack(self.data[first * sz : last * sz])
+        ]
+
+    def block(self, n: int) -> list[LogEvent]:
+        if n not in self.decoded:
+            self.decoded[n] = self.decode_range(n * INDEX_BLOCK, (n + 1) * INDEX_BLOCK)
+        return self.decoded[n]
+
+    def load(self) -> LogIndex:
+        """Read the store and index, indexing any new whole blocks."""
+        self.data = b""
+        if os.path.exists(self.store.filename):
+            with open(self.store.filename, "rb") as f:
+                self.data = f.read()
+        self.count = len(self.data) // STORE_ENTRY.size
+        self.decoded = {}
+        self.blocks = []
+        if os.path.exists(self.filename):
+            with open(self.filename, "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_ENTRY.size
+            for first, last, areas, evs, params in INDEX_ENTRY.iter_unpack(
+                data[:usable]
+            ):
+                self.blocks.append(
+                    BlockSummary(
+                        first,
+                        last,
+                        areas,
+                        int.from_bytes(evs, "little"),
+                        int.from_bytes(params, "little"),
+                    )
+                )
+        # ignore summaries past the end of a truncated store, then extend
+        self.blocks = self.blocks[: self.count // INDEX_BLOCK]
+        new = [
+            summarise(self.block(n))
+            for n in range(len(self.blocks), self.count // INDEX_BLOCK)
+        ]
+        if new:
+            with open(self.filename, "ab") as f:
+                for b in new:
+                    f.write(
+                        INDEX_ENTRY.pack(
+                            b.first,
+                            b.last,
+                            b.areas,
+                            b.events.to_bytes(32, "little"),
+                            b.parameters.to_bytes(32, "little"),
+                        )
+                    )
+            self.blocks.extend(new)
+        self.block_last = []
+        latest = 0
+        for b in self.blocks:
+            latest = max(latest, b.last)
+            self.block_last.append(latest)
+        return self
+
+    def refresh(self) -> LogIndex:
+        """Reload if records have been appended to the store since load."""
+        if os.path.exists(self.store.filename):
+            if os.path.getsize(self.store.filename) != len(self.data):
+                self.load()
+        return self
+
+    def query(self, q: EventQuery) -> list[LogEvent]:
+        # blocks that all end before the query starts are skipped wholesale
+        found: list[LogEvent] = []
+        for n in range(bisect_left(self.block_last, q.start), len(self.blocks)):
+            if self.blocks[n].may_match(q):
+                found.extend(e for e in self.block(n) if q.match(e))
+        tail = self.decode_range(len(self.blocks) * INDEX_BLOCK, self.count)
+        found.extend(e for e in tail if q.match(e))
+        return found
+
+
+def query_events(events: Iterable[LogEvent], q: EventQuery) -> list[LogEvent]:
+    return [e for e in events if q.match(e)]
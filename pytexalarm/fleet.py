@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from functools import reduce
+from typing import Any, Callable, Optional
+
+from .pialarm import UDLTopics, get_panel_decoder
+from .udlclient import AsyncioUDLClient
+
+# Download many panels concurrently on one event loop.
+# The inventory is a json list of panels, e.g.
+#   [{"name": "home", "host": "192.168.1.50", "password": "1234",
+#     "topics": ["ZONES", "USERS"]},
+#    {"name": "shop", "host": "10.0.0.7", "port": 10001, "password": "5678"}]
+# $ python -m pytexalarm.fleet inventory.json --outdir panels --concurrency 16
+
+
+@dataclass
+class PanelSpec:
+    name: str
+    host: str
+    password: str
+    port: int = 10001
+    topics: UDLTopics = UDLTopics.ALL
+    mem: Optional[str] = None  # defaults to OUTDIR/NAME.panel
+    delay: float = 2.0  # connect delay, see AsyncioUDLClient.create
+
+    @classmethod
+    def from_json(cls, js: dict[str, Any]) -> PanelSpec:
+        spec = dict(js)
+        if "topics" in spec:
+            spec["topics"] = reduce(
+                lambda a, b: a | b, (UDLTopics[t] for t in spec["topics"])
+            )
+        return cls(**spec)
+
+
+@dataclass
+class PanelResult:
+    name: str
+    ok: bool
+    elapsed: float
+    banner: str = ""
+    frames: int = 0
+    nbytes: int = 0
+    retries: int = 0
+    mem: str = ""
+    error: str = ""
+
+
+def load_inventory(filename: str) -> list[PanelSpec]:
+    with open(filename, "r") as f:
+        return [PanelSpec.from_json(p) for p in json.load(f)]
+
+
+def panel_log(name: str, verbose: bool) -> Callable[[str], None]:
+    # sessions run at once, so their progress is tagged by panel or dropped
+    if not verbose:
+        return lambda msg: None
+    return lambda msg: print(f"[{name}] {msg}")
+
+
+async def sync_panel(
+    spec: PanelSpec, outdir: str, verbose: bool = False
+) -> PanelResult:
+    start = time.monotonic()
+    result = PanelResult(spec.name, False, 0.0)
+    log = panel_log(spec.name, verbose)
+    client = None
+    try:
+        client = await AsyncioUDLClient.create(
+            spec.host, spec.password, port=spec.port, stupid_delay=spec.delay
+        )
+        client.log = log
+        result.banner = await client.read_identification()
+        panel = get_panel_decoder(result.banner)
+        panel.log = log
+        await panel.udl_read_with(client, spec.topics)
+        result.frames = client.last_read_stats.frames
+        result.nbytes = client.last_read_stats.nbytes
+        result.retries = client.counters.retries
+        result.mem = spec.mem or os.path.join(outdir, f"{spec.name}.panel")
+        panel.save(result.mem)
+        result.ok = True
+    except Exception as e:
+        result.error = repr(e)
+    finally:
+        if client:
+            try:
+                await client.close()
+            except Exception:
+                pass
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+async def sync_fleet(
+    specs: list[PanelSpec], outdir: str, concurrency: int = 8, verbose: bool = False
+) -> list[PanelResult]:
+    """Sync every panel, at most 'concurrency' at once. One panel failing
+    does not affect the others. Progress is only printed if verbose, each
+    line tagged with its panel."""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(spec: PanelSpec) -> PanelResult:
+        async with limit:
+            return await sync_panel(spec, outdir, verbose)
+
+    return list(await asyncio.gather(*(limited(s) for s in specs)))
+
+
+def print_summary(results: list[PanelResult], elapsed: float) -> None:
+    print(f"{'panel':20s} {'status':6s} {'time':>7s} {'frames':>6s} {'bytes':>7s}")
+    for r in results:
+        status = "ok" if r.ok else "FAILED"
+        print(
+            f"{r.name:20s} {status:6s} {r.elapsed:6.1f}s {r.frames:6d} {r.nbytes:7d}"
+            f" {r.error}"
+        )
+    failed = sum(1 for r in results if not r.ok)
+    slowest = max((r.elapsed for r in results), default=0.0)
+    print(
+        f"{len(results)} panels, {failed} failed, in {elapsed:.1f}s"
+        f" (slowest panel {slowest:.1f}s)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("inventory", help="json list of panels to sync")
+    parser.add_argument("--outdir", help="directory for memfiles", default=".")
+    parser.add_argument(
+        "--concurrency", help="panels synced at once", default=8, type=int
+    )
+    parser.add_argument("--summary", help="write json summary to FILE", default=None)
+    parser.add_argument(
+        "--verbose", help="show each panel's progress", action="store_true"
+    )
+    args = parser.parse_args()
+
+    specs = load_inventory(args.inventory)
+    start = time.monotonic()
+    results = await sync_fleet(specs, args.outdir, args.concurrency, args.verbose)
+    print_summary(results, time.monotonic() - start)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump([asdict(r) for r in results], f, indent=4)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
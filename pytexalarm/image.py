@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import mmap
+import struct
+import time
+from typing import Optional, Tuple
+
+from .memfile import pack_text
+from .paged import ValidRanges
+from .pialarm import PanelDecoder, get_panel_decoder
+
+# A panel image is a fixed layout file that panel mem and io are mapped from,
+# so writes land in the file as they are made, with no save step, and several
+# processes (udlserver, webapp) can map the same panel. The header holds the
+# panel identity and where each section starts, all on mapping boundaries:
+#  - the live mem and io the emulator reads and writes
+#  - a published copy of them, updated only when a batch of writes is
+#    committed, for readers in other processes (see PanelImage.snapshot)
+#  - a bitmap of which bytes of mem and io are valid, written on flush
+# The sequence number is odd while the published copy is being updated.
+IMAGE_MAGIC = b"pytexalarm-image"
+IMAGE_VERSION = 2
+# magic, version, banner, serial, udlpasswd, mem offset, mem size, io offset,
+# io size, published mem offset, published io offset, valid bitmap offset,
+# sequence
+IMAGE_HEADER = struct.Struct("<16sI32s32s32sQQQQQQQQ")
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = IMAGE_HEADER.size - SEQUENCE.size
+
+
+def align(n: int) -> int:
+    g = mmap.ALLOCATIONGRANULARITY
+    return (n + g - 1) // g * g
+
+
+def bitmap_size(mem_size: int, io_size: int) -> int:
+    return (mem_size + 7) // 8 + (io_size + 7) // 8
+
+
+def create_image(panel: PanelDecoder, filename: str) -> None:
+    mem_offset = align(IMAGE_HEADER.size)
+    io_offset = align(mem_offset + len(panel.mem))
+    published_mem = align(io_offset + len(panel.io))
+    published_io = align(published_mem + len(panel.mem))
+    valid_offset = align(published_io + len(panel.io))
+    header = IMAGE_HEADER.pack(
+        IMAGE_MAGIC,
+        IMAGE_VERSION,
+        pack_text("banner", panel.banner, 32),
+        pack_text("serial", panel.serial, 32),
+        pack_text("udlpasswd", panel.udlpasswd, 32),
+        mem_offset,
+        len(panel.mem),
+        io_offset,
+        len(panel.io),
+        published_mem,
+        published_io,
+        valid_offset,
+        0,
+    )
+    with open(filename, "wb") as f:
+        f.write(header)
+        for offset in (mem_offset, published_mem):
+            f.seek(offset)
+            f.write(panel.mem[:])
+        for offset in (io_offset, published_io):
+            f.seek(offset)
+            f.write(panel.io[:])
+        f.seek(valid_offset)
+        f.write(panel.mem_valid.to_bitmap(len(panel.mem)))
+        f.write(panel.io_valid.to_bitmap(len(panel.io)))
+    print(f"wrote image {filename}")
+
+
+class PanelImage:
+    """
+    A panel whose mem and io are mapped from an image file. Writes to
+    panel.mem/panel.io go straight to the shared mapping, and are seen at
+    once by every other process mapping the image. Open readonly to get a
+    view that cannot be written through.
+
+    Readers in another process should decode snapshot() rather than the
+    live panel, so they never see a batch of Wintex writes half applied.
+    The writer makes them visible with publish, see PanelSnapshots.
+    """
+
+    def __init__(self, filename: str, readonly: bool = False):
+        self.filename = filename
+        self.readonly = readonly
+        access = mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE
+        with open(filename, "rb" if readonly else "r+b") as f:
+            header = f.read(IMAGE_HEADER.size)
+            if len(header) != IMAGE_HEADER.size:
+                raise ValueError(f"{filename} is not a panel image")
+            (
+                magic,
+                version,
+                banner,
+                serial,
+                udlpasswd,
+                mem_offset,
+                mem_size,
+                io_offset,
+                io_size,
+                published_mem,
+                published_io,
+                valid_offset,
+                _,
+            ) = IMAGE_HEADER.unpack(header)
+            if magic != IMAGE_MAGIC:
+                raise ValueError(f"{filename} is not a panel image")
+            if version != IMAGE_VERSION:
+                raise ValueError(f"Unsupported panel image version {version}")
+
+            def region(offset: int, size: int) -> mmap.mmap:
+                return mmap.mmap(f.fileno(), size, offset=offset, access=access)
+
+            self.header = region(0, IMAGE_HEADER.size)
+            self.mem = region(mem_offset, mem_size)
+            self.io = region(io_offset, io_size)
+            self.published_mem = region(published_mem, mem_size)
+            self.published_io = region(published_io, io_size)
+            self.valid = region(valid_offset, bitmap_size(mem_size, io_size))
+
+        self.panel = get_panel_decoder(banner.rstrip(b"\0").decode())
+        self.panel.serial = serial.rstrip(b"\0").decode()
+        self.panel.udlpasswd = udlpasswd.rstrip(b"\0").decode()
+        # mmap is a PanelMemory: it indexes, slices and takes equal length
+        # slice assignment like the bytearray it replaces
+        self.panel.mem = self.mem
+        self.panel.io = self.io
+        split = (mem_size + 7) // 8
+        self.panel.mem_valid = ValidRanges.from_bitmap(self.valid[:split])
+        self.panel.io_valid = ValidRanges.from_bitmap(self.valid[split:])
+        self.cached: Optional[Tuple[int, PanelDecoder]] = None
+
+    @property
+    def sequence(self) -> int:
+        seq: int = SEQUENCE.unpack_from(self.header, SEQUENCE_OFFSET)[0]
+        return seq
+
+    def publish(self, mem: list[Tuple[int, int]], io: list[Tuple[int, int]]) -> None:
+        """Copy the (base, sz) ranges of live mem and io to the published copy
+        readers decode, bracketed by an odd sequence number."""
+        seq = self.sequence
+        SEQUENCE.pack_into(self.header, SEQUENCE_OFFSET, seq + 1)
+        for live, published, ranges in (
+            (self.mem, self.published_mem, mem),
+            (self.io, self.published_io, io),
+        ):
+            for base, sz in ranges:
+                published[base : base + sz] = live[base : base + sz]
+        SEQUENCE.pack_into(self.header, SEQUENCE_OFFSET, seq + 2)
+
+    def snapshot(self) -> PanelDecoder:
+        """A decoder over the last published copy. Treat as read only, it is
+        shared by every reader until the next publish."""
+        while True:
+            seq = self.sequence
+            cached = self.cached
+            if cached and cached[0] == seq:
+                return cached[1]
+            if seq % 2 == 0:
+                mem, io = self.published_mem[:], self.published_io[:]
+                if self.sequence == seq:
+                    break
+            # a publish is copying a few pages, it won't be long
+            time.sleep(0.001)
+        snap = get_panel_decoder(self.panel.banner)
+        snap.serial = self.panel.serial
+        snap.udlpasswd = self.panel.udlpasswd
+        snap.mem = bytearray(mem)
+        snap.io = bytearray(io)
+        self.cached = (seq, snap)
+        return snap
+
+    def maps(self) -> Tuple[mmap.mmap, ...]:
+        return (
+            self.header,
+            self.mem,
+            self.io,
+            self.published_mem,
+            self.published_io,
+            self.valid,
+        )
+
+    def flush(self) -> None:
+        # writes are already visible to other mappings, this forces them to
+        # disk, along with which bytes are valid
+        if self.readonly or self.mem.closed:
+            return
+        mem_bits = self.panel.mem_valid.to_bitmap(len(self.mem))
+        io_bits = self.panel.io_valid.to_bitmap(len(self.io))
+        self.valid[:] = mem_bits + io_bits
+        for m in self.maps():
+            m.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for m in self.maps():
+            m.close()
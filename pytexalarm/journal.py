@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import os
+import struct
+from typing import Iterator, Tuple
+
+from .paged import PanelMemory
+
+# A download journal records each page as soon as it arrives, so a download
+# that dies partway can be resumed with only the missing ranges re-read. It
+# sits beside the memfile and is removed once the memfile has been written.
+JOURNAL_MAGIC = b"pytexalarm-journal\n"
+JOURNAL_ENTRY = struct.Struct("<IH")  # base, size, then size bytes of memory
+
+
+class ReadJournal:
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def start(self, banner: str) -> None:
+        # begin a fresh journal, discarding any earlier one
+        with open(self.filename, "wb") as f:
+            f.write(JOURNAL_MAGIC)
+            f.write(banner.encode() + b"\n")
+
+    def banner(self) -> str | None:
+        if not os.path.exists(self.filename):
+            return None
+        with open(self.filename, "rb") as f:
+            if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+                raise ValueError(f"{self.filename} is not a download journal")
+            return f.readline().rstrip(b"\n").decode()
+
+    def __iter__(self) -> Iterator[Tuple[int, bytes]]:
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "rb") as f:
+            f.read(len(JOURNAL_MAGIC))
+            f.readline()
+            data = f.read()
+        pos = 0
+        while pos + JOURNAL_ENTRY.size <= len(data):
+            base, sz = JOURNAL_ENTRY.unpack_from(data, pos)
+            pos += JOURNAL_ENTRY.size
+            if pos + sz > len(data):
+                break  # torn append, that page is read again
+            yield base, data[pos : pos + sz]
+            pos += sz
+
+    def append(self, pages: list[Tuple[int, bytes]]) -> None:
+        with open(self.filename, "ab") as f:
+            f.write(
+                b"".join(JOURNAL_ENTRY.pack(base, len(bs)) + bs for base, bs in pages)
+            )
+
+    def replay(self, banner: str, mem: PanelMemory) -> list[Tuple[int, int]]:
+        """Copy journalled pages into mem, returning the (base, sz) ranges they
+        cover. A journal from a different panel type is ignored."""
+        if self.banner() != banner:
+            return []
+        done = []
+        for base, bs in self:
+            mem[base : base + len(bs)] = bs
+            done.append((base, len(bs)))
+        return done
+
+    def remove(self) -> None:
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
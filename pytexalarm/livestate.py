@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+from .pialarm import ELITE_VIRTUALKEYPAD, PanelDecoder
+from .schema import Field, Layout
+from .udl import UDLClient, union_ranges
+
+# Poll the live state (io) region with 'R' reads, as Wintex does for the
+# virtual keypad, and report field level changes rather than raw bytes.
+# Fields are schema Fields of single records, by default the virtual keypad
+# WintexEliteDecoder shows.
+
+
+class ChangeEvent(NamedTuple):
+    field: str
+    old: Any
+    new: Any
+    time: float
+
+
+class PollRange:
+    """One contiguous io read, and how often it is currently worth polling."""
+
+    def __init__(self, base: int, sz: int, fields: list[Field], interval: float):
+        self.base = base
+        self.sz = sz
+        self.fields = fields
+        self.interval = interval
+        self.due = 0.0
+        self.polls = 0
+        self.changes = 0
+
+
+class LivePoller:
+    """
+    Polls io ranges covering the given fields into panel.io, calling back with a
+    ChangeEvent for each field whose decoded value differs from the last poll.
+
+    Each range keeps its own interval between min_interval and max_interval.
+    A poll that sees a change halves it, a quiet poll stretches it by a
+    quarter, so busy ranges like the keypad screen are polled most often.
+    """
+
+    def __init__(
+        self,
+        panel: PanelDecoder,
+        client: UDLClient,
+        callback: Callable[[ChangeEvent], None],
+        fields: Optional[list[Field]] = None,
+        min_interval: float = 0.25,
+        max_interval: float = 5.0,
+        merge_gap: int = 16,
+    ):
+        self.panel = panel
+        self.client = client
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.layout = Layout("live", fields or ELITE_VIRTUALKEYPAD.fields)
+        self.ranges = []
+        fields = self.layout.fields
+        for base, sz in union_ranges([(f.base, f.size) for f in fields], merge_gap):
+            covered = [f for f in fields if base <= f.base < base + sz]
+            self.ranges.append(PollRange(base, sz, covered, min_interval))
+        self.last: dict[str, Any] = {}
+
+    async def poll(self, rng: PollRange) -> list[ChangeEvent]:
+        data = await self.client.read_io(rng.base, rng.sz)
+        now = time.monotonic()
+        self.panel.io[rng.base : rng.base + rng.sz] = data
+        self.panel.mark_io_known(rng.base, rng.sz)
+        events = []
+        for f in rng.fields:
+            value = self.layout.value(f.name, self.panel.io)
+            if f.name in self.last and self.last[f.name] != value:
+                events.append(ChangeEvent(f.name, self.last[f.name], value, now))
+            self.last[f.name] = value
+        rng.polls += 1
+        if events:
+            rng.changes += 1
+            rng.interval = max(self.min_interval, rng.interval / 2)
+        else:
+            rng.interval = min(self.max_interval, rng.interval * 1.25)
+        rng.due = now + rng.interval
+        for e in events:
+            self.callback(e)
+        return events
+
+    async def run(self) -> None:
+        """Poll until cancelled."""
+        while True:
+            rng = min(self.ranges, key=lambda r: r.due)
+            delay = rng.due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.poll(rng)
+
+    def stats(self) -> list[Tuple[int, int, int, int, float]]:
+        # (base, sz, polls, polls with changes, current interval) per range
+        return [(r.base, r.sz, r.polls, r.changes, r.interval) for r in self.ranges]
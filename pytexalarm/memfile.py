@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, BinaryIO, NamedTuple, Tuple
+
+from .paged import PAGE_SIZE, Region
+
+# Memfiles hold a panel's identity and the contents of its mem and io. After
+# the magic and version comes a fixed header, then a directory of the pages
+# stored, then the (base, sz) ranges of bytes known to have been read from
+# the panel, then the page data. Pages that are all zero are left out, and a page may
+# be stored zlib compressed. Version 1 files were pickles; they are still
+# read so they can be migrated, see pialarm.panel_from_file.
+FILE_MAGIC = b"pytexalarm\n"
+FILE_VERSION = b"2"
+LEGACY_VERSION = b"1"
+# banner, serial, udlpasswd, page size, mem size, io size, pages stored,
+# valid ranges stored
+HEADER = struct.Struct("<32s32s32sIIIII")
+# region, flags, page number, offset in file, stored length
+ENTRY = struct.Struct("<BBxxIQI")
+# region, base, sz
+RANGE = struct.Struct("<BxxxII")
+COMPRESSED = 0x01
+
+
+class MemfileHeader(NamedTuple):
+    banner: str
+    serial: str
+    udlpasswd: str
+
+
+def pages_in(sz: int) -> int:
+    return (sz + PAGE_SIZE - 1) // PAGE_SIZE
+
+
+def pack_text(name: str, value: str, size: int) -> bytes:
+    # a fixed size header field, which struct would silently truncate
+    data = value.encode()
+    if len(data) > size:
+        raise ValueError(f"{name} {value!r} is longer than {size} bytes")
+    return data
+
+
+def unpack_from(s: struct.Struct, f: BinaryIO, what: str) -> Tuple[Any, ...]:
+    data = f.read(s.size)
+    if len(data) != s.size:
+        raise ValueError(f"memfile truncated in {what}")
+    return s.unpack(data)
+
+
+def write_memfile(
+    filename: str,
+    header: MemfileHeader,
+    regions: Tuple[Region, Region],
+    known: Tuple[list[Tuple[int, int]], list[Tuple[int, int]]],
+    compress: bool = False,
+) -> None:
+    stored = []
+    for r, region in enumerate(regions):
+        for p in range(pages_in(len(region))):
+            page = region[p * PAGE_SIZE : (p + 1) * PAGE_SIZE]
+            if not any(page):
+                continue
+            data, flags = bytes(page), 0
+            if compress:
+                packed = zlib.compress(data)
+                if len(packed) < len(data):
+                    data, flags = packed, COMPRESSED
+            stored.append((r, flags, p, data))
+
+    ranges = [(r, base, sz) for r, k in enumerate(known) for base, sz in k]
+    offset = (
+        len(FILE_MAGIC + FILE_VERSION)
+        + HEADER.size
+        + ENTRY.size * len(stored)
+        + RANGE.size * len(ranges)
+    )
+    # write beside the file and rename over it, so a failed save leaves the
+    # old memfile intact
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(FILE_MAGIC + FILE_VERSION)
+        f.write(
+            HEADER.pack(
+                pack_text("banner", header.banner, 32),
+                pack_text("serial", header.serial, 32),
+                pack_text("udlpasswd", header.udlpasswd, 32),
+                PAGE_SIZE,
+                len(regions[0]),
+                len(regions[1]),
+                len(stored),
+                len(ranges),
+            )
+        )
+        for r, flags, p, data in stored:
+            f.write(ENTRY.pack(r, flags, p, offset, len(data)))
+            offset += len(data)
+        for r, base, sz in ranges:
+            f.write(RANGE.pack(r, base, sz))
+        for _, _, _, data in stored:
+            f.write(data)
+    os.replace(tmp, filename)
+
+
+def read_version(f: BinaryIO) -> bytes:
+    magic = f.read(len(FILE_MAGIC))
+    if magic != FILE_MAGIC:
+        raise Exception("Unsuported file format")
+    version = f.read(len(FILE_VERSION))
+    if version not in (FILE_VERSION, LEGACY_VERSION):
+        raise Exception("Unsuported file version")
+    return version
+
+
+def read_header(f: BinaryIO) -> Tuple[MemfileHeader, int, int, int, int]:
+    # (identity, mem size, io size, pages stored, ranges stored), just after
+    # the version
+    banner, serial, udlpasswd, page_size, mem_size, io_size, count, nranges = (
+        unpack_from(HEADER, f, "header")
+    )
+    if page_size != PAGE_SIZE:
+        raise Exception(f"Unsuported memfile page size {page_size}")
+    header = MemfileHeader(
+        banner.rstrip(b"\0").decode(),
+        serial.rstrip(b"\0").decode(),
+        udlpasswd.rstrip(b"\0").decode(),
+    )
+    return header, mem_size, io_size, count, nranges
+
+
+def read_memfile(
+    filename: str,
+) -> Tuple[
+    MemfileHeader,
+    Tuple[int, int],
+    list[Tuple[int, int, bytes]],
+    Tuple[list[Tuple[int, int]], list[Tuple[int, int]]],
+]:
+    """The identity, (mem, io) sizes, (region, page, data) for each stored
+    page and (mem, io) known (base, sz) ranges of a version 2 memfile. The
+    file is mapped and only the stored pages copied out. Anything that
+    doesn't fit the regions the header describes raises ValueError."""
+    with open(filename, "rb") as f:
+        read_version(f)
+        header, mem_size, io_size, count, nranges = read_header(f)
+        sizes = (mem_size, io_size)
+        entries = [unpack_from(ENTRY, f, "page directory") for _ in range(count)]
+        known: Tuple[list[Tuple[int, int]], list[Tuple[int, int]]] = ([], [])
+        for _ in range(nranges):
+            r, base, sz = unpack_from(RANGE, f, "valid ranges")
+            if r >= len(sizes) or base + sz > sizes[r]:
+                raise ValueError(f"memfile range {base:06x} sz={sz} outside region {r}")
+            known[r].append((base, sz))
+        file_size = os.fstat(f.fileno()).st_size
+        pages = []
+        if entries:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                for r, flags, p, offset, length in entries:
+                    if r >= len(sizes) or p >= pages_in(sizes[r]):
+                        raise ValueError(f"memfile page {p} outside region {r}")
+                    if offset + length > file_size:
+                        raise ValueError(f"memfile page {p} of region {r} truncated")
+                    want = min(PAGE_SIZE, sizes[r] - p * PAGE_SIZE)
+                    data = m[offset : offset + length]
+                    if flags & COMPRESSED:
+                        # no more than a page, whatever the stream claims
+                        z = zlib.decompressobj()
+                        try:
+                            data = z.decompress(data, want)
+                        except zlib.error as e:
+                            raise ValueError(f"memfile page {p} corrupt: {e}")
+                        if not z.eof or z.unconsumed_tail:
+                            raise ValueError(f"memfile page {p} corrupt")
+                    if len(data) != want:
+                        raise ValueError(f"memfile page {p} is {len(data)} bytes")
+                    pages.append((r, p, data))
+    return header, sizes, pages, known
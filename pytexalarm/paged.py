@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from itertools import repeat
+from typing import Iterator, Optional, Protocol, Tuple, Union, overload
+
+# Panel memory is mostly never read: an unknown panel gets 640KB of address
+# space, and a download of every topic touches a few KB of it. PagedMemory
+# only allocates the pages written to, and reads of the rest come back as
+# zeros. ValidRanges records which bytes hold data from the panel, so reads
+# can skip them and decoders can tell real zeros from never-read ones.
+#
+# The same page size is used by memfiles to store regions and by snapshots to
+# share unchanged parts of them between generations.
+PAGE_SIZE = 1024
+
+
+class Region(Protocol):
+    """Bytes that index and take contiguous slices, e.g. bytes or PanelMemory."""
+
+    def __len__(self) -> int: ...
+
+    @overload
+    def __getitem__(self, key: int) -> int: ...
+
+    @overload
+    def __getitem__(self, key: slice) -> bytes: ...
+
+
+class PanelMemory(Region, Protocol):
+    """
+    What panel mem and io can be backed by: a bytearray, a PagedMemory or an
+    mmap of a panel image. A fixed size region that indexes, takes contiguous
+    slices and equal length slice assignment, and nothing more, so take a
+    slice (region[:] for all of it) for anything else.
+    """
+
+    @overload
+    def __setitem__(self, key: int, value: int) -> None: ...
+
+    @overload
+    def __setitem__(self, key: slice, value: bytes) -> None: ...
+
+
+class PagedMemory:
+    """
+    A fixed size, zero initialised byte region allocated a page at a time on
+    write. Indexes, slices and takes equal length slice assignment like the
+    bytearray it replaces.
+
+    Pages may start out as shared, immutable bytes (see snapshot.py), and are
+    copied the first time they are written.
+    """
+
+    def __init__(
+        self, size: int, pages: Optional[dict[int, Union[bytes, bytearray]]] = None
+    ):
+        self.size = size
+        self.pages: dict[int, Union[bytes, bytearray]] = pages or {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def span(self, key: slice) -> Tuple[int, int]:
+        start, stop, step = key.indices(self.size)
+        if step != 1:
+            raise ValueError("PagedMemory slices must be contiguous")
+        return start, max(start, stop)
+
+    @overload
+    def __getitem__(self, key: int) -> int: ...
+
+    @overload
+    def __getitem__(self, key: slice) -> bytes: ...
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[int, bytes]:
+        if isinstance(key, slice):
+            start, stop = self.span(key)
+            first = start // PAGE_SIZE
+            if stop <= (first + 1) * PAGE_SIZE:
+                # within one page, as nearly every field is
+                page = self.pages.get(first)
+                if page is None:
+                    return bytes(stop - start)
+                offset = first * PAGE_SIZE
+                return bytes(page[start - offset : stop - offset])
+            out = bytearray(stop - start)
+            for p in range(first, (stop + PAGE_SIZE - 1) // PAGE_SIZE):
+                page = self.pages.get(p)
+                if page is None:
+                    continue
+                lo = max(start, p * PAGE_SIZE)
+                hi = min(stop, (p + 1) * PAGE_SIZE)
+                offset = p * PAGE_SIZE
+                out[lo - start : hi - start] = page[lo - offset : hi - offset]
+            return bytes(out)
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError("PagedMemory index out of range")
+        page = self.pages.get(key // PAGE_SIZE)
+        return page[key % PAGE_SIZE] if page else 0
+
+    def __setitem__(self, key: Union[int, slice], value: Union[int, bytes]) -> None:
+        if isinstance(key, int):
+            if key < 0:
+                key += self.size
+            if not 0 <= key < self.size:
+                raise IndexError("PagedMemory index out of range")
+            assert isinstance(value, int)
+            self.page(key // PAGE_SIZE)[key % PAGE_SIZE] = value
+            return
+        assert not isinstance(value, int)
+        start, stop = self.span(key)
+        if len(value) != stop - start:
+            raise ValueError("PagedMemory slice assignment can't change the size")
+        for p in range(start // PAGE_SIZE, (stop + PAGE_SIZE - 1) // PAGE_SIZE):
+            lo = max(start, p * PAGE_SIZE)
+            hi = min(stop, (p + 1) * PAGE_SIZE)
+            chunk = value[lo - start : hi - start]
+            # writing zeros to a page never written leaves it unallocated
+            if p in self.pages or any(chunk):
+                offset = p * PAGE_SIZE
+                self.page(p)[lo - offset : hi - offset] = chunk
+
+    def page_size(self, p: int) -> int:
+        # the last page is short if size is not a multiple of PAGE_SIZE
+        return min(PAGE_SIZE, self.size - p * PAGE_SIZE)
+
+    def page(self, p: int) -> bytearray:
+        # page p, writable
+        page = self.pages.get(p)
+        if isinstance(page, bytearray):
+            return page
+        new = self.pages[p] = bytearray(page or self.page_size(p))
+        return new
+
+    def __iter__(self) -> Iterator[int]:
+        for p in range((self.size + PAGE_SIZE - 1) // PAGE_SIZE):
+            page = self.pages.get(p)
+            if page is None:
+                yield from repeat(0, self.page_size(p))
+            else:
+                yield from page
+
+    def __bytes__(self) -> bytes:
+        return self[:]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (PagedMemory, bytes, bytearray, memoryview)):
+            return len(self) == len(other) and bytes(self) == bytes(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def allocated(self) -> int:
+        return len(self.pages) * PAGE_SIZE
+
+
+class ValidRanges:
+    """Sorted, disjoint [start, end) ranges of bytes holding real data."""
+
+    def __init__(self) -> None:
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+
+    def add(self, base: int, sz: int) -> None:
+        if sz <= 0:
+            return
+        end = base + sz
+        # every range touching [base, end) is merged into one
+        lo = bisect_left(self.ends, base)
+        hi = bisect_right(self.starts, end)
+        if lo < hi:
+            base = min(base, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [base]
+        self.ends[lo:hi] = [end]
+
+    def ranges(self) -> list[Tuple[int, int]]:
+        # as (base, sz), like the read plans
+        return [(s, e - s) for s, e in zip(self.starts, self.ends)]
+
+    def covers(self, base: int, sz: int) -> bool:
+        i = bisect_right(self.starts, base) - 1
+        return i >= 0 and self.ends[i] >= base + sz
+
+    def missing(self, wanted: list[Tuple[int, int]]) -> list[Tuple[int, int]]:
+        """The parts of the wanted (base, sz) ranges not yet valid."""
+        gaps = []
+        for base, sz in wanted:
+            pos, end = base, base + sz
+            i = max(0, bisect_right(self.starts, pos) - 1)
+            while pos < end and i < len(self.starts):
+                if self.ends[i] <= pos:
+                    i += 1
+                    continue
+                if self.starts[i] >= end:
+                    break
+                if self.starts[i] > pos:
+                    gaps.append((pos, self.starts[i] - pos))
+                pos = self.ends[i]
+                i += 1
+            if pos < end:
+                gaps.append((pos, end - pos))
+        return gaps
+
+    def __len__(self) -> int:
+        # valid bytes
+        return sum(e - s for s, e in zip(self.starts, self.ends))
+
+    def to_bitmap(self, size: int) -> bytes:
+        # one bit per byte of a size byte region, least significant bit first
+        bits = 0
+        for s, e in zip(self.starts, self.ends):
+            bits |= ((1 << (e - s)) - 1) << s
+        return bits.to_bytes((size + 7) // 8, "little")
+
+    @classmethod
+    def from_bitmap(cls, bitmap: bytes) -> ValidRanges:
+        valid = cls()
+        bits = int.from_bytes(bitmap, "little")
+        pos = 0
+        while bits:
+            # skip to the next run of ones, then measure it
+            skip = (bits & -bits).bit_length() - 1
+            bits >>= skip
+            run = (~bits & (bits + 1)).bit_length() - 1
+            bits >>= run
+            valid.starts.append(pos + skip)
+            valid.ends.append(pos + skip + run)
+            pos += skip + run
+        return valid
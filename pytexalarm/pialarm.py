@@ -1,15 +1,37 @@
 from __future__ import annotations
 
 import inspect
-import io
 import pickle
 from enum import Flag, auto
-from typing import Any, List, Tuple
+from typing import Any, BinaryIO, Callable, List, Optional, Tuple
 
 from prompt_toolkit.patch_stdout import patch_stdout
 from prompt_toolkit.shortcuts import PromptSession
 
-from .udl import UDLClient, uncompact_ranges
+from .journal import ReadJournal
+from .memfile import (
+    FILE_VERSION,
+    LEGACY_VERSION,
+    MemfileHeader,
+    pages_in,
+    read_header,
+    read_memfile,
+    read_version,
+    write_memfile,
+)
+from .paged import PAGE_SIZE, PagedMemory, PanelMemory, Region, ValidRanges
+from .schema import Field, Layout
+from .udl import (
+    DEFAULT_READ_SIZE,
+    WRITE_FRAME_OVERHEAD,
+    UDLClient,
+    diff_ranges,
+    plan_cost,
+    plan_reads,
+    subtract_ranges,
+    uncompact_ranges,
+    union_ranges,
+)
 
 
 # configuraable things that you can read or write somewhat atomicaly
@@ -27,88 +49,365 @@ class UDLTopics(Flag):
     ALL = ZONES | AREAS | GLOBAL | KEYPADS | EXPANDERS | OUTPUTS | COMMS | USERS | LOGS
 
 
-FILE_MAGIC = b"pytexalarm\n"
-FILE_VERSION = b"1"
-
-
 class PanelDecoder:
-    def __init__(self, banner: str, memsz: int, iosz: int):
-        self.mem = bytearray(memsz)
-        self.io = bytearray(iosz)
+    def __init__(self, banner: str, memsz: int, iosz: int, sparse: bool = True):
+        # a panel of unknown layout gets a large address space, allocated a
+        # page at a time as written. Known panels are small enough to hold
+        # whole, and images map them from a file, see image.py.
+        self.mem: PanelMemory
+        self.io: PanelMemory
+        if sparse:
+            self.mem = PagedMemory(memsz)
+            self.io = PagedMemory(iosz)
+        else:
+            self.mem = bytearray(memsz)
+            self.io = bytearray(iosz)
         self.banner: str = banner
         self.serial: str = ""
         self.udlpasswd: str = ""
+        # bytes read from (or written to) the panel, as opposed to zeros
+        # nobody has looked at
+        self.mem_valid = ValidRanges()
+        self.io_valid = ValidRanges()
+        # progress of reads, writes and saves, see BaseUDLClient.log
+        self.log: Callable[[str], None] = print
+
+    def mark_known(self, base: int, sz: int) -> None:
+        self.mem_valid.add(base, sz)
 
-    def save(self, filename: str) -> None:
-        with open(filename, "wb") as f:
-            f.write(FILE_MAGIC)
-            f.write(FILE_VERSION)
-            pickle.dump(self.banner, f, pickle.HIGHEST_PROTOCOL)
-            pickle.dump(self.serial, f, pickle.HIGHEST_PROTOCOL)
-            pickle.dump(self.udlpasswd, f, pickle.HIGHEST_PROTOCOL)
-            pickle.dump(self.mem, f, pickle.HIGHEST_PROTOCOL)
-            pickle.dump(self.io, f, pickle.HIGHEST_PROTOCOL)
-        print(f"wrote to {filename}")
-
-    def load(self, f: io.BufferedReader) -> None:
+    def mark_io_known(self, base: int, sz: int) -> None:
+        self.io_valid.add(base, sz)
+
+    def udl_reads_for(self, topics: UDLTopics) -> List[Tuple[int, int]]:
+        # the mem ranges holding each topic, where the layout is known
+        return []
+
+    def unknown_ranges(self, topics: UDLTopics) -> List[Tuple[int, int]]:
+        """Ranges of the topics never read from the panel."""
+        return self.mem_valid.missing(union_ranges(self.udl_reads_for(topics)))
+
+    def unknown_topics(self) -> list[str]:
+        return [
+            t.name or ""
+            for t in UDLTopics
+            if t != UDLTopics.ALL and self.udl_reads_for(t) and self.unknown_ranges(t)
+        ]
+
+    def save(self, filename: str, compress: bool = False) -> None:
+        write_memfile(
+            filename,
+            MemfileHeader(self.banner, self.serial, self.udlpasswd),
+            (self.mem, self.io),
+            (self.mem_valid.ranges(), self.io_valid.ranges()),
+            compress,
+        )
+        self.log(f"wrote to {filename}")
+
+    def load_pages(
+        self,
+        pages: list[Tuple[int, int, bytes]],
+        known: Tuple[list[Tuple[int, int]], list[Tuple[int, int]]],
+    ) -> None:
+        # stored memfile pages, and the (base, sz) ranges known to be valid
+        regions = (self.mem, self.io)
+        for r, p, data in pages:
+            regions[r][p * PAGE_SIZE : p * PAGE_SIZE + len(data)] = data
+        for valid, ranges in zip((self.mem_valid, self.io_valid), known):
+            for base, sz in ranges:
+                valid.add(base, sz)
+
+    def load_legacy(self, f: BinaryIO) -> None:
+        # the rest of a version 1 (pickle) memfile, after the banner
         self.serial = pickle.load(f)
         self.udlpasswd = pickle.load(f)
-        self.mem = pickle.load(f)
-        self.io = pickle.load(f)
+        mem = populated(pickle.load(f))
+        io = populated(pickle.load(f))
+        # which bytes were read was not recorded, assume any set were
+        self.load_pages(
+            [(0, p, page) for p, page in mem] + [(1, p, page) for p, page in io],
+            (
+                [(p * PAGE_SIZE, len(page)) for p, page in mem],
+                [(p * PAGE_SIZE, len(page)) for p, page in io],
+            ),
+        )
 
     def decode(self) -> dict[str, Any]:
         return {}
 
     def get_mem(self) -> bytes:
-        return self.mem
+        return self.mem[:]
 
     def get_io(self) -> bytes:
-        return self.io
-
-    async def udl_read_with(self, client: UDLClient, topics: UDLTopics) -> None:
+        return self.io[:]
+
+    async def udl_read_with(
+        self,
+        client: UDLClient,
+        topics: UDLTopics,
+        journal: Optional[ReadJournal] = None,
+        done: Optional[List[Tuple[int, int]]] = None,
+        skip_valid: bool = False,
+    ) -> None:
         pass
 
-
-def get_panel_decoder(banner: str) -> PanelDecoder:
+    async def udl_write_with(
+        self,
+        client: UDLClient,
+        target: bytes,
+        verify: bool = False,
+        ranges: Optional[list[Tuple[int, int]]] = None,
+    ) -> list[Tuple[int, int]]:
+        """Write the bytes of target that differ from mem, and any (base, sz)
+        ranges, in as few frames as possible. Unchanged gaps shorter than a
+        frame are rewritten along with them, but only where mem_valid says mem
+        holds what the panel does. Returns the frames written."""
+        changed = union_ranges(diff_ranges(self.mem[:], target, 0) + (ranges or []))
+        gaps = []
+        for (prev, sz), (base, _) in zip(changed, changed[1:]):
+            gap = (prev + sz, base - prev - sz)
+            if gap[1] <= WRITE_FRAME_OVERHEAD and self.mem_valid.covers(*gap):
+                gaps.append(gap)
+        writes = uncompact_ranges(union_ranges(changed + gaps), DEFAULT_READ_SIZE)
+        frames, nbytes = plan_cost(writes)
+        self.log(f"Writing {frames} frames, {nbytes} bytes")
+        for base, sz in writes:
+            await client.write_mem(base, target[base : base + sz])
+            self.mem[base : base + sz] = target[base : base + sz]
+            self.mark_known(base, sz)
+        if verify and writes:
+            readback = await client.read_ranges(writes)
+            for (base, sz), bs in zip(writes, readback):
+                if bs != target[base : base + sz]:
+                    raise ValueError(f"read back of {base:06x} sz={sz} differs")
+                self.mem[base : base + sz] = bs
+        return writes
+
+    async def udl_write_edits(
+        self, client: UDLClient, edits: dict[int, bytes], verify: bool = False
+    ) -> list[Tuple[int, int]]:
+        """As udl_write_with, for {address: new bytes} field edits. Edits to
+        bytes never read are written even if they match the zeros in mem."""
+        target = bytearray(self.mem[:])
+        for base, data in edits.items():
+            target[base : base + len(data)] = data
+        unknown = self.mem_valid.missing([(b, len(d)) for b, d in edits.items()])
+        return await self.udl_write_with(client, target, verify, unknown)
+
+
+def get_panel_decoder(banner: str, log: Callable[[str], None] = print) -> PanelDecoder:
     # Add extra panels here
     if banner.startswith("Elite 24"):
         return WintexEliteDecoder(banner, 24)
     else:
         # guess at something that might work
-        print(f"Unknown panel type {banner} - using large empty default")
+        log(f"Unknown panel type {banner} - using large empty default")
         return PanelDecoder(banner, 0x80000, 0x20000)
 
 
-def panel_from_file(filename: str) -> PanelDecoder:
-    print(f"reading panel from {filename}")
+def panel_from_file(
+    filename: str, migrate: bool = False, log: Callable[[str], None] = print
+) -> PanelDecoder:
+    # with migrate, a version 1 file is rewritten in the current format. log
+    # takes the messages about loading it
+    log(f"reading panel from {filename}")
     with open(filename, "rb") as w:
-        magic = w.read(len(FILE_MAGIC))
-        if magic != FILE_MAGIC:
-            raise Exception("Unsuported file format")
-        version = w.read(len(FILE_VERSION))
-        if version != FILE_VERSION:
-            raise Exception("Unsuported file version")
-        banner: str = pickle.load(w)
-        panel = get_panel_decoder(banner)
-        panel.load(w)
+        version = read_version(w)
+        if version == LEGACY_VERSION:
+            banner: str = pickle.load(w)
+            panel = get_panel_decoder(banner, log)
+            panel.load_legacy(w)
+    if version == LEGACY_VERSION:
+        if migrate:
+            try:
+                panel.save(filename)
+                log(f"migrated {filename} to memfile version {FILE_VERSION!r}")
+            except OSError as e:
+                log(f"could not migrate {filename}: {e}")
+        return panel
+
+    header, sizes, pages, known = read_memfile(filename)
+    panel = get_panel_decoder(header.banner, log)
+    if sizes != (len(panel.mem), len(panel.io)):
+        raise ValueError(f"{filename} regions {sizes} don't fit a '{header.banner}'")
+    panel.serial = header.serial
+    panel.udlpasswd = header.udlpasswd
+    panel.load_pages(pages, known)
     return panel
 
 
-def get_bcd(mem: bytes, start: int, sz: int) -> str:
-    rgn = mem[start : start + sz]
-    return "".join(["{:01x}".format(x) for x in rgn])
+def populated(region: Region) -> list[Tuple[int, bytes]]:
+    # (page, data) for each memfile page of region that is not all zeros
+    pages = [
+        (p, bytes(region[p * PAGE_SIZE : (p + 1) * PAGE_SIZE]))
+        for p in range(pages_in(len(region)))
+    ]
+    return [(p, page) for p, page in pages if any(page)]
 
 
-def get_ascii(mem: bytes, start: int, sz: int) -> str:
-    rgn = mem[start : start + sz].strip(b"\000")
-    return "".join([chr(x) for x in rgn])
+def panel_header_from_file(filename: str) -> Tuple[str, str, str]:
+    # (banner, serial, udlpasswd) without reading the panel memory
+    with open(filename, "rb") as w:
+        if read_version(w) == LEGACY_VERSION:
+            return pickle.load(w), pickle.load(w), pickle.load(w)
+        header, _, _, _, _ = read_header(w)
+        return header.banner, header.serial, header.udlpasswd
+
+
+def get_bcd(mem: Region, start: int, sz: int) -> str:
+    return "".join(map("{:01x}".format, mem[start : start + sz]))
+
+
+def get_ascii(mem: Region, start: int, sz: int) -> str:
+    # latin-1 maps each byte to the code point of the same value
+    return bytes(mem[start : start + sz]).strip(b"\000").decode("latin-1")
+
+
+ZONE_TYPES = (
+    "Entry/Exit 1",
+    "Entry/Exit 2",
+    "Guard",
+    "Guard Access",
+    "24hr Audible",
+    "24hr Silent",
+    "PA Audible",
+    "PA Silent",
+    "Fire",
+    "Medical",
+    "24hr Gas",
+    "Auxilary",
+    "Tamper",
+    "Exit Terminator",
+    "Moment Key",
+    "Latch Key",
+    "Security",
+    "Omit Key",
+    "Custom",
+    "Conf PA Audible",
+    "Conf PA Silent",
+)
+ZONE_WIRING = (
+    "Normally Closed",
+    "Normally Open",
+    "Double Pole/EOL",
+    "Tripple EOL",
+    "1K/1K/(3K)",
+    "4K7/6K8/(12K)",
+    "2K2/4K7/(6K8)",
+    "4K7/4K7",
+    "WD Monitor",
+)
+
+# Premier Elite 24 settings, see schema.Layout
+ELITE_ZONES = Layout(
+    "zones",
+    [
+        Field("name", 0x005400, 32, 16, "ascii"),
+        Field("name2", 0x005410, 32, 16, "ascii"),
+        Field("type", 0x000000, values=ZONE_TYPES, type="lookup", key="int1"),
+        Field("chime", 0x000030),  # 00 off, 01, 02, 03 chime type
+        Field(
+            "area",
+            0x000060,
+            type="bitmask",
+            values=("A", "B"),
+            enum="zones.access_areas",
+        ),
+        Field("wiring", 0x000090, values=ZONE_WIRING, type="lookup", key="int0"),
+        Field("attrib1", 0x0000C0, 2),  # omittable bit 0
+        Field("attrib2", 0x0000C1, 2),  # double-kock bit 0
+    ],
+)
+ELITE_USERS = Layout(
+    "users",
+    [
+        Field("name", 0x004000, 8, 8, "text"),
+        Field("access_areas", 0x0042EE, 2),
+        Field("flags0", 0x0042B6, type="hex"),
+        Field("flags1", 0x0043E8, type="hex"),
+    ],
+)
+# 3 bytes a user, of the two pincode buffers merged
+ELITE_PINCODES = Layout("users", [Field("pincode", 0, 3, 3, "hex")])
+ELITE_AREAS = Layout("areas", [Field("text", 0x0016A0, 16, 16, "ascii")])
+# sounds is a bitmask, aux_input select byte value,
+# net expander area   aux_input sounds speaker_vol
+# 1   1        000f50 000f70    000f80 000f90
+# 1   2.       000f52 000f71    000f81 000f91
+ELITE_EXPANDERS = Layout(
+    "expanders",
+    [
+        Field("location", 0x000E50, 16, 16, "ascii"),
+        Field("area", 0x000F50, 2),
+        Field("aux_input", 0x000F70),
+        Field("sounds", 0x000F80),
+        Field("speaker", 0x000F90),
+    ],
+)
+# zones are literal bytes, volumne is displayed +1 in UI,
+# area are usual bitmask, sounds and options are bitmasks,
+# notes are in the GUI only.
+# net, keypad, zone 1, zone 2, volume, area,   sounds,  options
+#   1.    1.   000fc0, 000fc1, 001000, 000fa0, 001010,  000fe0
+#   1     2.   000fc2, 000fc3, 001001, 000fa2, 001011,  000fe2
+ELITE_KEYPADS = Layout(
+    "keypads",
+    [
+        Field("keypad_z1_zone", 0x000FC0, 2),
+        Field("keypad_z2_zone", 0x000FC1, 2),
+        Field("areas", 0x000FA0, 2),
+        Field("options", 0x000FE0, 2),
+        Field("sounds", 0x001010),
+        Field("volume", 0x001000),
+    ],
+)
+ELITE_CONFIG = Layout(
+    "config",
+    [
+        Field("unique_id", 0x005D04, size=0x10, type="bcd"),
+        Field("engineer_reset", 0x001100, size=32, type="ascii"),
+        Field("anticode_reset", 0x001120, size=32, type="ascii"),
+        Field("service_message", 0x001140, size=32, type="ascii"),
+        Field("panel_location", 0x001160, size=32, type="ascii"),
+        Field("banner_message", 0x001180, size=16, type="ascii"),
+        Field("part_arm_header", 0x001190, size=16, type="ascii"),
+        Field("part_arm1_message", 0x001800, size=16, type="ascii"),
+        Field("part_arm2_message", 0x001810, size=16, type="ascii"),
+        Field("part_arm3_message", 0x001820, size=16, type="ascii"),
+    ],
+)
+ELITE_COMMUNICATIONS = Layout(
+    "communications",
+    [
+        Field("sms_centre1", 0x001A30, size=16, type="ascii"),
+        Field("sms_centre2", 0x001A40, size=16, type="ascii"),
+    ],
+)
+# in io rather than mem
+ELITE_VIRTUALKEYPAD = Layout(
+    "keypad",
+    [
+        Field("screen", 0x001196, size=16, type="ascii"),
+        Field("screen2", 0x0011A6, size=16, type="ascii"),
+        Field("leds", 0x0011B7, type="bitmask", values=("?", "?", "Omit")),
+    ],
+)
+ELITE_LAYOUTS = [
+    ELITE_ZONES,
+    ELITE_USERS,
+    ELITE_AREAS,
+    ELITE_CONFIG,
+    ELITE_EXPANDERS,
+    ELITE_COMMUNICATIONS,
+    ELITE_VIRTUALKEYPAD,
+    ELITE_KEYPADS,
+]
 
 
 class WintexEliteDecoder(PanelDecoder):
     def __init__(self, banner: str, zones: int):
         # Probably these can be determined from the panel type. These work for
         # a Premier Elite 24
-        super().__init__(banner, 0x8000, 0x2000)
+        super().__init__(banner, 0x8000, 0x2000, sparse=False)
         self.zones = zones
         self.users = 25
         self.expanders = 2
@@ -116,189 +415,57 @@ class WintexEliteDecoder(PanelDecoder):
         self.areas = 2
 
     def decode(self) -> dict[str, Any]:
+        # one contiguous copy of each region, rather than a slice of the
+        # backing store per field
+        mem, io = self.mem[:], self.io[:]
         js: dict[str, Any] = {}
-        js["zones"] = self.decode_zones()
-        js["users"] = self.decode_users()
-        js["areas"] = self.decode_areas()
-        js["config"] = {
-            "unique_id": get_bcd(self.mem, 0x005D04, 0x10),
-            "engineer_reset": get_ascii(self.mem, 0x001100, 32),
-            "anticode_reset": get_ascii(self.mem, 0x001120, 32),
-            "service_message": get_ascii(self.mem, 0x001140, 32),
-            "panel_location": get_ascii(self.mem, 0x001160, 32),
-            "banner_message": get_ascii(self.mem, 0x001180, 16),
-            "part_arm_header": get_ascii(self.mem, 0x001190, 16),
-            "part_arm1_message": get_ascii(self.mem, 0x001800, 16),
-            "part_arm2_message": get_ascii(self.mem, 0x001810, 16),
-            "part_arm3_message": get_ascii(self.mem, 0x001820, 16),
-        }
-        js["area_suites"] = self.decode_area_suites()
-        js["expanders"] = self.decode_expanders()
-        js["enums"] = {
-            "zones.type": {
-                "type": "lookup",
-                "key": "int1",
-                "values": [
-                    "Entry/Exit 1",
-                    "Entry/Exit 2",
-                    "Guard",
-                    "Guard Access",
-                    "24hr Audible",
-                    "24hr Silent",
-                    "PA Audible",
-                    "PA Silent",
-                    "Fire",
-                    "Medical",
-                    "24hr Gas",
-                    "Auxilary",
-                    "Tamper",
-                    "Exit Terminator",
-                    "Moment Key",
-                    "Latch Key",
-                    "Security",
-                    "Omit Key",
-                    "Custom",
-                    "Conf PA Audible",
-                    "Conf PA Silent",
-                ],
-            },
-            "zones.wiring": {
-                "type": "lookup",
-                "key": "int0",
-                "values": [
-                    "Normally Closed",
-                    "Normally Open",
-                    "Double Pole/EOL",
-                    "Tripple EOL",
-                    "1K/1K/(3K)",
-                    "4K7/6K8/(12K)",
-                    "2K2/4K7/(6K8)",
-                    "4K7/4K7",
-                    "WD Monitor",
-                ],
-            },
-            "zones.access_areas": {
-                "type": "bitmask",
-                "values": ["A", "B"],
-            },
-            "keypad.leds": {
-                "type": "bitmask",
-                "values": ["?", "?", "Omit"],
-            },
-        }
-        js["communications"] = {
-            "sms_centre1": get_ascii(self.mem, 0x001A30, 16),
-            "sms_centre2": get_ascii(self.mem, 0x001A40, 16),
-        }
-        js["virtualkeypad"] = {
-            "screen": get_ascii(self.io, 0x001196, 16),
-            "screen2": get_ascii(self.io, 0x0011A6, 16),
-            "leds": self.io[0x11B7],
-        }
-        js["keypads"] = self.decode_keypads()
+        js["zones"] = self.decode_zones(mem)
+        js["users"] = self.decode_users(mem)
+        js["areas"] = self.decode_areas(mem)
+        js["config"] = ELITE_CONFIG.decode_one(mem)
+        js["area_suites"] = self.decode_area_suites(mem)
+        js["expanders"] = self.decode_expanders(mem)
+        js["enums"] = {k: v for lt in ELITE_LAYOUTS for k, v in lt.enums().items()}
+        js["communications"] = ELITE_COMMUNICATIONS.decode_one(mem)
+        js["virtualkeypad"] = ELITE_VIRTUALKEYPAD.decode_one(io)
+        js["keypads"] = self.decode_keypads(mem)
         return js
 
-    def decode_users(self) -> list[dict[str, Any]]:
-        users = []
+    def decode_users(self, mem: bytes) -> list[dict[str, Any]]:
+        users = ELITE_USERS.decode(mem, self.users)
         # merge pincode buffers
-        pincode = (
-            self.mem[0x004190 : 0x004190 + 0x4B] + self.mem[0x00630B : 0x00630B + 0x18]
-        )
-        for i in range(self.users):
-            users.append(
-                {
-                    "name": get_ascii(self.mem, 0x004000 + 8 * i, 8).rstrip(),
-                    "pincode": self.get_pincode(pincode, 3 * i),
-                    "access_areas": self.mem[0x0042EE + i * 2],
-                    "flags0": "{:02x}".format(self.mem[0x0042B6 + i]),
-                    "flags1": "{:02x}".format(self.mem[0x0043E8 + i]),
-                }
-            )
+        pincode = mem[0x004190 : 0x004190 + 0x4B] + mem[0x00630B : 0x00630B + 0x18]
+        for user, pin in zip(
+            users, ELITE_PINCODES.column("pincode", pincode, self.users)
+        ):
+            user["pincode"] = pin.strip("def")
         return users
 
-    def decode_zones(self) -> list[dict[str, Any]]:
-        zones = []
-        for i in range(self.zones):
-            zones.append(
-                {
-                    "name": get_ascii(self.mem, 0x005400 + i * 32, 16),
-                    "name2": get_ascii(self.mem, 0x005400 + i * 32 + 16, 16),
-                    "type": self.mem[0 + i],
-                    "chime": self.mem[0x000030 + i],  # 00 off, 01, 02, 03 chime type
-                    "area": self.mem[0x000060 + i],
-                    "wiring": self.mem[0x000090 + i],
-                    "attrib1": self.mem[0x0000C0 + i * 2],  # omittable bit 0
-                    "attrib2": self.mem[0x0000C1 + i * 2],  # double-kock bit 0
-                }
-            )
-        return zones
+    def decode_zones(self, mem: bytes) -> list[dict[str, Any]]:
+        return ELITE_ZONES.decode(mem, self.zones)
 
-    def decode_areas(self) -> list[dict[str, Any]]:
-        areas = []
-        for i in range(self.areas):
-            areas.append(
-                {
-                    "text": get_ascii(self.mem, 0x0016A0 + i * 16, 16),
-                }
-            )
-        return areas
-
-    def decode_expanders(self) -> list[dict[str, Any]]:
-        expanders = []
-        # sounds is a bitmask, aux_input select byte value,
-        # net expander area   aux_input sounds speaker_vol
-        # 1   1        000f50 000f70    000f80 000f90
-        # 1   2.       000f52 000f71    000f81 000f91
-        for i in range(self.expanders):
-            expanders.append(
-                {
-                    "location": get_ascii(self.mem, 0x000E50 + i * 16, 16),
-                    "area": self.mem[0x000F50 + i * 2],
-                    "aux_input": self.mem[0x000F70 + i],
-                    "sounds": self.mem[0x000F80 + i],
-                    "speaker": self.mem[0x000F90 + i],
-                }
-            )
-        return expanders
-
-    def decode_keypads(self) -> list[dict[str, Any]]:
-        expanders = []
-        # zones are literal bytes, volumne is displayed +1 in UI,
-        # area are usual bitmask, sounds and options are bitmasks,
-        # notes are in the GUI only.
-        # net, keypad, zone 1, zone 2, volume, area,   sounds,  options
-        #   1.    1.   000fc0, 000fc1, 001000, 000fa0, 001010,  000fe0
-        #   1     2.   000fc2, 000fc3, 001001, 000fa2, 001011,  000fe2
-        for i in range(self.keypads):
-            expanders.append(
-                {
-                    "keypad_z1_zone": self.mem[0x000FC0 + i * 2],
-                    "keypad_z2_zone": self.mem[0x000FC1 + i * 2],
-                    "areas": self.mem[0x000FA0 + i * 2],
-                    "options": self.mem[0x000FE0 + i * 2],
-                    "sounds": self.mem[0x001010 + i],
-                    "volume": self.mem[0x001000 + i],
-                }
-            )
-        return expanders
+    def decode_areas(self, mem: bytes) -> list[dict[str, Any]]:
+        return ELITE_AREAS.decode(mem, self.areas)
+
+    def decode_expanders(self, mem: bytes) -> list[dict[str, Any]]:
+        return ELITE_EXPANDERS.decode(mem, self.expanders)
 
-    def decode_area_suites(self) -> list[dict[str, Any]]:
+    def decode_keypads(self, mem: bytes) -> list[dict[str, Any]]:
+        return ELITE_KEYPADS.decode(mem, self.keypads)
+
+    def decode_area_suites(self, mem: bytes) -> list[dict[str, Any]]:
         suites = []
         for i in range(2):
             suites.append(
                 {
                     "id": i,
-                    "text": get_ascii(self.mem, 0x0005E8 + i * 16, 16),
+                    "text": get_ascii(mem, 0x0005E8 + i * 16, 16),
                     "arm_mode": "",
                     "areas": "",
                 }
             )
         return suites
 
-    def get_pincode(self, mem: bytes, offset: int) -> str:
-        x = mem[offset : offset + 3]
-        return x.hex().strip("def")
-
     def udl_reads_for(self, topics: UDLTopics) -> List[Tuple[int, int]]:
         # common reads (unique ID)
         reads = [
@@ -414,14 +581,45 @@ class WintexEliteDecoder(PanelDecoder):
 
         return reads
 
-    async def udl_read_with(self, client: UDLClient, topics: UDLTopics) -> None:
+    def udl_read_plan(
+        self,
+        topics: UDLTopics,
+        frame_size: int = DEFAULT_READ_SIZE,
+        done: Optional[List[Tuple[int, int]]] = None,
+    ) -> List[Tuple[int, int]]:
+        # ranges already in done (e.g. replayed from a journal) are not re-read
+        reads = subtract_ranges(self.udl_reads_for(topics), done or [])
+        return plan_reads(reads, frame_size)
+
+    async def udl_read_with(
+        self,
+        client: UDLClient,
+        topics: UDLTopics,
+        journal: Optional[ReadJournal] = None,
+        done: Optional[List[Tuple[int, int]]] = None,
+        skip_valid: bool = False,
+    ) -> None:
         # do the work
-        for base, sz in uncompact_ranges(self.udl_reads_for(topics)):
-            bs = await client.read_mem(base, sz)
-            self.mem[base : base + sz] = bs
-
-
-async def interactive_shell(panel: PanelDecoder, **kwargs: Any) -> None:
+        for base, sz in done or []:
+            self.mark_known(base, sz)
+        if skip_valid:
+            # only fill in what has never been read
+            done = self.mem_valid.ranges()
+        reads = self.udl_read_plan(topics, client.read_size, done)
+        frames, nbytes = plan_cost(reads)
+        self.log(f"Reading {topics} in {frames} frames, {nbytes} bytes")
+
+        def store(base: int, bs: bytes) -> None:
+            self.mem[base : base + len(bs)] = bs
+            self.mark_known(base, len(bs))
+            if journal:
+                # each page as it arrives, so an interrupted download loses none
+                journal.append([(base, bs)])
+
+        await client.read_ranges(reads, store)
+
+
+async def interactive_shell(panel: Optional[PanelDecoder], **kwargs: Any) -> None:
     """
     Provides a simple repl that allows interactive
     modification of the panel memory.
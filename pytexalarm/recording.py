@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import struct
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator, Mapping, Optional, Tuple
+
+from .udl import SerialWintex
+
+# A session recording holds the bytes that crossed a UDL link in each
+# direction, with when they crossed it, so a session can be replayed into the
+# parsers later at its original pace (or faster). Directions are named as in
+# ser2net traces: "tcp" is Wintex to panel, "term" is panel to Wintex.
+#
+# After the header each record is a (microseconds since the previous record,
+# direction, length) triple and then the bytes. A UDL frame fits in one
+# record, so six bytes of overhead per frame against ~70 per 8 bytes of trace.
+# Longer gaps than a delta can hold are bridged with empty records.
+# e.g. $ python -m pytexalarm.recording convert zones.trace zones.udlrec
+#      $ python -m pytexalarm.recording dump zones.udlrec
+RECORDING_MAGIC = b"pytexalarm-rec"
+RECORDING_VERSION = 1
+RECORDING_HEADER = struct.Struct("<16sId")
+RECORD = struct.Struct("<IBB")
+DIRECTIONS = ("tcp", "term")
+MAX_DELTA = 0xFFFFFFFF
+
+Record = Tuple[float, str, bytes]
+
+
+class SessionRecorder:
+    """
+    Appends the bytes sent and received on a link to a recording file.
+    Times are taken from clock, relative to when the recorder was opened,
+    unless given to record.
+    """
+
+    def __init__(
+        self, filename: str, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.filename = filename
+        self.clock = clock
+        self.start = clock()
+        # time of the last record in whole microseconds, so deltas never drift
+        self.last_us = 0
+        self.f: BinaryIO = open(filename, "wb")
+        self.f.write(
+            RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, time.time())
+        )
+
+    def record(self, direction: str, data: bytes, t: Optional[float] = None) -> None:
+        if t is None:
+            t = self.clock() - self.start
+        d = DIRECTIONS.index(direction)
+        delta = max(0, int(t * 1e6) - self.last_us)
+        self.last_us += delta
+        while delta > MAX_DELTA:
+            self.f.write(RECORD.pack(MAX_DELTA, d, 0))
+            delta -= MAX_DELTA
+        for p in range(0, len(data), 255):
+            chunk = data[p : p + 255]
+            self.f.write(RECORD.pack(delta, d, len(chunk)))
+            self.f.write(chunk)
+            delta = 0
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def write_recording(filename: str, records: Iterable[Record]) -> int:
+    recorder = SessionRecorder(filename)
+    count = 0
+    try:
+        for t, direction, data in records:
+            recorder.record(direction, data, t)
+            count += 1
+    finally:
+        recorder.close()
+    return count
+
+
+def read_recording(filename: str) -> Iterator[Record]:
+    """(seconds since start, direction, bytes) for each record in a recording"""
+    with open(filename, "rb") as f:
+        header = f.read(RECORDING_HEADER.size)
+        if len(header) != RECORDING_HEADER.size:
+            raise ValueError(f"{filename} is not a session recording")
+        magic, version, _ = RECORDING_HEADER.unpack(header)
+        if magic.rstrip(b"\0") != RECORDING_MAGIC:
+            raise ValueError(f"{filename} is not a session recording")
+        if version != RECORDING_VERSION:
+            raise ValueError(f"Unsupported session recording version {version}")
+        us = 0
+        while head := f.read(RECORD.size):
+            if len(head) != RECORD.size:
+                raise ValueError(f"{filename} truncated")
+            delta, d, sz = RECORD.unpack(head)
+            data = f.read(sz)
+            if len(data) != sz:
+                raise ValueError(f"{filename} truncated")
+            us += delta
+            if sz:
+                yield us / 1e6, DIRECTIONS[d], data
+
+
+def records_from_ser2net(stream: Iterable[str]) -> Iterator[Record]:
+    # 2018/07/31 08:30:59 tcp  03 5a a2                 |.Z.|
+    # ser2net only logs whole seconds, so many records share a time
+    start = None
+    for line in stream:
+        direction = line[20:25].strip()
+        if direction not in DIRECTIONS:
+            continue
+        when = datetime.datetime.strptime(line[0:19], "%Y/%m/%d %H:%M:%S")
+        if start is None:
+            start = when
+        hexbytes = line[25:50].strip().split(" ")
+        yield (
+            (when - start).total_seconds(),
+            direction,
+            bytes.fromhex("".join(hexbytes)),
+        )
+
+
+def feed(records: Iterable[Record], sinks: Mapping[str, SerialWintex]) -> None:
+    # replay as fast as the parsers go, ignoring the recorded times
+    for _, direction, data in records:
+        sink = sinks.get(direction)
+        if sink:
+            sink.on_bytes(data)
+
+
+async def replay(
+    records: Iterable[Record], sinks: Mapping[str, SerialWintex], speed: float = 1.0
+) -> None:
+    """
+    Feed records to the parser for their direction at the recorded times,
+    scaled by speed (2.0 is twice as fast). A speed of 0 does not wait at all.
+    """
+    if speed <= 0:
+        feed(records, sinks)
+        return
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for t, direction, data in records:
+        # against the start, not the previous record, so sleeps do not add up
+        delay = start + t / speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sink = sinks.get(direction)
+        if sink:
+            sink.on_bytes(data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="convert a ser2net trace")
+    convert.add_argument("trace", help="ser2net trace file")
+    convert.add_argument("out", help="recording to write")
+    dump = commands.add_parser("dump", help="print the records in a recording")
+    dump.add_argument("recording", help="recording to read")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        with open(args.trace, "r") as r:
+            count = write_recording(args.out, records_from_ser2net(r))
+        print(f"wrote {count} records to {args.out}")
+    else:
+        for t, direction, data in read_recording(args.recording):
+            print(f"{t:12.6f} {direction:4s} {data.hex(' ')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+from .livestate import ChangeEvent
+from .pialarm import ELITE_VIRTUALKEYPAD, PanelDecoder
+from .schema import Field, Layout
+from .snapshot import PanelSnapshots
+
+# Changes the emulator's live state (io) by itself, so pollers and push UIs
+# have something to watch without a client writing 'W' frames. Every change
+# is logged as a ChangeEvent, the same shape LivePoller reports, so what a
+# client saw can be matched against what actually happened.
+# e.g. $ python -m pytexalarm.udlserver --events 5 --events-seed 1
+
+# One state byte per zone. Where the panel keeps these is not yet known from
+# traces, so this is the emulator's own layout.
+ZONE_STATE_BASE = 0x000000
+ZONE_CLEAR = 0x00
+ZONE_ACTIVE = 0x01
+ZONE_TAMPER = 0x02
+
+SCREENS = [
+    "System Alerts!  ",
+    "Zone 001 Tamper ",
+    "Zone 003 Active ",
+    "Mon 12:00       ",
+    "Area A Armed    ",
+    "Ready To Arm    ",
+]
+
+
+def zone_fields(zones: int) -> list[Field]:
+    return [
+        Field(f"zone{i + 1}", ZONE_STATE_BASE + i, type="hex") for i in range(zones)
+    ]
+
+
+def encode(field: Field, value: Any) -> bytes:
+    # the bytes that decode back to value, see Layout.value
+    if field.type == "ascii":
+        return str(value).encode("ascii")[: field.size].ljust(field.size, b" ")
+    if field.type != "hex" or isinstance(value, int):
+        return int(value).to_bytes(field.size, "little")
+    return bytes.fromhex(value)
+
+
+class ScriptStep(NamedTuple):
+    after: float  # seconds after the previous step
+    field: str
+    value: Any
+
+
+def load_script(filename: str) -> list[ScriptStep]:
+    # [{"after": 0.5, "field": "screen", "value": "Zone 001 Tamper"}, ...]
+    with open(filename, "r") as f:
+        return [ScriptStep(s["after"], s["field"], s["value"]) for s in json.load(f)]
+
+
+class EventGenerator:
+    """
+    Writes changes to zone states and the virtual keypad (screen lines and
+    LEDs) into panel.io, either from a script or picked at random at an
+    average of 'rate' changes a second. Random changes come from seed, so a
+    run repeats. Each change is kept in events, and published to snapshot
+    readers straight away.
+    """
+
+    def __init__(
+        self,
+        panel: PanelDecoder,
+        zones: int = 0,
+        rate: float = 1.0,
+        script: Optional[list[ScriptStep]] = None,
+        seed: Optional[int] = None,
+        snapshots: Optional[PanelSnapshots] = None,
+        callback: Optional[Callable[[ChangeEvent], None]] = None,
+    ):
+        self.panel = panel
+        self.layout = Layout("live", zone_fields(zones) + ELITE_VIRTUALKEYPAD.fields)
+        self.fields = {f.name: f for f in self.layout.fields}
+        self.zones = zones
+        self.rate = rate
+        self.script = script
+        self.rng = random.Random(seed)
+        self.snapshots = snapshots
+        self.callback = callback
+        # ground truth, every change in the order it was made
+        self.events: list[ChangeEvent] = []
+
+    def apply(self, name: str, value: Any) -> Optional[ChangeEvent]:
+        f = self.fields[name]
+        data = encode(f, value)
+        old = self.layout.value(name, self.panel.io)
+        self.panel.io[f.base : f.base + f.size] = data
+        new = self.layout.value(name, self.panel.io)
+        if old == new:
+            return None
+        if self.snapshots:
+            # only this change, not a Wintex batch still being written
+            self.snapshots.commit_io(f.base, f.size)
+        event = ChangeEvent(name, old, new, time.monotonic())
+        self.events.append(event)
+        if self.callback:
+            self.callback(event)
+        return event
+
+    def random_change(self) -> Tuple[str, Any]:
+        r = self.rng.random()
+        if self.zones and r < 0.6:
+            zone = self.rng.randrange(self.zones)
+            state = self.rng.choice([ZONE_CLEAR, ZONE_ACTIVE, ZONE_ACTIVE, ZONE_TAMPER])
+            return f"zone{zone + 1}", state
+        if r < 0.85:
+            line = self.rng.choice(["screen", "screen2"])
+            return line, self.rng.choice(SCREENS)
+        return "leds", self.rng.randrange(8)
+
+    async def run(self, count: Optional[int] = None) -> None:
+        """Make count changes (or run the script through), or until cancelled."""
+        if self.script is not None:
+            for step in self.script:
+                await asyncio.sleep(step.after)
+                self.apply(step.field, step.value)
+            return
+        made = 0
+        while count is None or made < count:
+            # a Poisson process, evenly random arrivals at the average rate
+            await asyncio.sleep(self.rng.expovariate(self.rate))
+            if self.apply(*self.random_change()):
+                made += 1
+
+
+def match_events(
+    truth: list[ChangeEvent], seen: list[ChangeEvent]
+) -> Tuple[list[float], list[ChangeEvent]]:
+    """
+    Latencies of the true changes a client saw, and the ones it missed. A
+    change counts as seen by the first reported change of the same field to
+    the same value, made before that field changed again.
+    """
+    latencies = []
+    missed = []
+    for i, event in enumerate(truth):
+        superseded = next(
+            (e.time for e in truth[i + 1 :] if e.field == event.field), float("inf")
+        )
+        report = next(
+            (
+                s
+                for s in seen
+                if s.field == event.field
+                and s.new == event.new
+                and event.time <= s.time < superseded
+            ),
+            None,
+        )
+        if report:
+            latencies.append(report.time - event.time)
+        else:
+            missed.append(event)
+    return latencies, missed
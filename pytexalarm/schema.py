@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Any, Callable, NamedTuple, Tuple
+
+from .paged import Region
+
+# Panel settings are arrays of records: field n of record i is at
+# base + i * stride. A Layout lists the fields of one kind of record and
+# decodes every record of it in one pass, a column per field. Layouts decode
+# from one contiguous bytes copy of a region, see WintexEliteDecoder.decode,
+# never a slice of the backing store per field. The same fields give the
+# 'enums' the templates use to show lookup and bitmask values.
+
+Column = Callable[[bytes, int], list[Any]]
+
+
+class Field(NamedTuple):
+    name: str
+    base: int
+    stride: int = 1
+    size: int = 1
+    # int, ascii, text (ascii less trailing spaces), bcd, hex, bitmask or lookup
+    type: str = "int"
+    values: Tuple[str, ...] = ()  # names of lookup values or bitmask bits
+    key: str = ""  # how templates index a lookup
+    enum: str = ""  # enums entry, if not <layout>.<name>
+
+    @property
+    def step(self) -> int:
+        # from one record to the next, at least the field itself
+        return max(self.stride, self.size)
+
+
+def compile_field(f: Field) -> Column:
+    base, size, step = f.base, f.size, f.step
+
+    def window(region: bytes, count: int) -> Tuple[bytes, int]:
+        # region and the offset of the first record in it, cut out and padded
+        # with zeros if the last record runs off the end
+        end = base + step * count
+        if end <= len(region):
+            return region, base
+        return region[base:end].ljust(step * count, b"\0"), 0
+
+    def ints(region: bytes, count: int) -> list[int]:
+        # every step'th byte, already ints
+        region, start = window(region, count)
+        return list(region[start : start + step * count : step])
+
+    if f.type in ("int", "bitmask", "lookup") and size == 1:
+        return ints
+    if f.type == "hex" and size == 1:
+        return lambda region, count: [f"{b:02x}" for b in ints(region, count)]
+
+    def raw(region: bytes, count: int) -> list[bytes]:
+        region, start = window(region, count)
+        return [region[o : o + size] for o in range(start, start + step * count, step)]
+
+    if f.type == "ascii":
+        return lambda region, count: [
+            r.strip(b"\0").decode("latin-1") for r in raw(region, count)
+        ]
+    if f.type == "text":
+        return lambda region, count: [
+            r.strip(b"\0").decode("latin-1").rstrip() for r in raw(region, count)
+        ]
+    if f.type == "bcd":
+        return lambda region, count: [
+            "".join(map("{:01x}".format, r)) for r in raw(region, count)
+        ]
+    if f.type == "hex":
+        return lambda region, count: [r.hex() for r in raw(region, count)]
+    if f.type in ("int", "bitmask", "lookup"):
+        return lambda region, count: [
+            int.from_bytes(r, "little") for r in raw(region, count)
+        ]
+    raise ValueError(f"unknown field type {f.type}")
+
+
+class Layout:
+    """The fields of one kind of record, compiled once to column decoders."""
+
+    def __init__(self, name: str, fields: list[Field]):
+        self.name = name
+        self.fields = fields
+        self.names = [f.name for f in fields]
+        self.columns = [compile_field(f) for f in fields]
+        # the same, decoding a slice of just the field, see value
+        self.local = [compile_field(f._replace(base=0)) for f in fields]
+
+    def decode(self, region: bytes, count: int) -> list[dict[str, Any]]:
+        columns = [column(region, count) for column in self.columns]
+        return [dict(zip(self.names, row)) for row in zip(*columns)]
+
+    def decode_one(self, region: bytes) -> dict[str, Any]:
+        return self.decode(region, 1)[0]
+
+    def column(self, name: str, region: bytes, count: int) -> list[Any]:
+        # just one field of every record
+        return self.columns[self.names.index(name)](region, count)
+
+    def value(self, name: str, region: Region) -> Any:
+        # one field of the first record, from a slice of its own bytes, so
+        # region can be panel.mem or panel.io themselves
+        i = self.names.index(name)
+        f = self.fields[i]
+        return self.local[i](region[f.base : f.base + f.step], 1)[0]
+
+    def enums(self) -> dict[str, dict[str, Any]]:
+        enums = {}
+        for f in self.fields:
+            if f.type not in ("bitmask", "lookup"):
+                continue
+            enum: dict[str, Any] = {"type": f.type}
+            if f.key:
+                enum["key"] = f.key
+            enum["values"] = list(f.values)
+            enums[f.enum or f"{self.name}.{f.name}"] = enum
+        return enums
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import copy
+from typing import Optional, Protocol, Tuple, Union
+
+from .image import PanelImage
+from .paged import PAGE_SIZE, PagedMemory, Region
+from .pialarm import PanelDecoder
+
+# every page never written shares this one
+ZERO_PAGE = bytes(PAGE_SIZE)
+
+
+def sparse_page(region: PagedMemory, p: int) -> bytes:
+    # page p as it stands, copied only if writable
+    page = region.pages.get(p)
+    if page is not None:
+        return bytes(page)
+    size = region.page_size(p)
+    return ZERO_PAGE if size == PAGE_SIZE else bytes(size)
+
+
+def paginate(region: Region) -> Tuple[bytes, ...]:
+    if isinstance(region, PagedMemory):
+        pages = pages_of(0, len(region))
+        return tuple(sparse_page(region, p) for p in pages)
+    return tuple(
+        bytes(region[p : p + PAGE_SIZE]) for p in range(0, len(region), PAGE_SIZE)
+    )
+
+
+def sparse(pages: Tuple[bytes, ...]) -> dict[int, Union[bytes, bytearray]]:
+    # pages for a PagedMemory, leaving out the shared zero page
+    return {p: page for p, page in enumerate(pages) if page is not ZERO_PAGE}
+
+
+def pages_of(base: int, sz: int) -> range:
+    return range(base // PAGE_SIZE, (base + sz + PAGE_SIZE - 1) // PAGE_SIZE)
+
+
+def page_ranges(region: Region, pages: set[int]) -> list[Tuple[int, int]]:
+    # (base, sz) of each page, the last one cut short at the end of region
+    return [
+        (p * PAGE_SIZE, min(PAGE_SIZE, len(region) - p * PAGE_SIZE))
+        for p in sorted(pages)
+    ]
+
+
+class SnapshotSource(Protocol):
+    """Where readers such as the webapp get a consistent panel to decode."""
+
+    def snapshot(self) -> PanelDecoder: ...
+
+
+class PanelSnapshots:
+    """
+    Committed generations of a panel, for readers such as the webapp.
+
+    The emulator keeps writing straight into panel.mem and panel.io, so
+    Wintex reads back its own writes, and marks what it wrote. Readers get
+    the last committed generation instead, so a Wintex "send all" is never
+    decoded half applied. A commit (the panel's 'U' 01, a hang up, or the
+    connection closing) copies just the written pages. Every other page is
+    shared with the generation before. Generations are immutable tuples of
+    pages, swapped in whole, so readers take no locks and never hold up
+    the write path. A snapshot decodes straight from the shared pages, it
+    copies none of them.
+
+    With an image, each commit also publishes the written pages to it, for
+    readers in other processes, see PanelImage.snapshot.
+    """
+
+    def __init__(self, panel: PanelDecoder, image: Optional[PanelImage] = None):
+        self.panel = panel
+        self.image = image
+        # (generation, mem pages, io pages), replaced as one on commit
+        self.committed = (0, paginate(panel.mem), paginate(panel.io))
+        self.dirty_mem: set[int] = set()
+        self.dirty_io: set[int] = set()
+        # commit_io writes newer than the committed io pages, (base, data)
+        self.io_writes: list[Tuple[int, bytes]] = []
+        self.cached: Optional[Tuple[int, PanelDecoder]] = None
+
+    def mark_mem(self, base: int, sz: int) -> None:
+        self.dirty_mem.update(pages_of(base, sz))
+
+    def mark_io(self, base: int, sz: int) -> None:
+        self.dirty_io.update(pages_of(base, sz))
+
+    @property
+    def generation(self) -> int:
+        return self.committed[0]
+
+    def pending(self) -> bool:
+        return bool(self.dirty_mem or self.dirty_io)
+
+    def commit(self) -> int:
+        """Publish the writes made since the last commit as a new generation."""
+        if not self.pending():
+            return self.generation
+        self.apply_io_writes()
+        generation, mem_pages, io_pages = self.committed
+        if self.image:
+            self.image.publish(
+                page_ranges(self.panel.mem, self.dirty_mem),
+                page_ranges(self.panel.io, self.dirty_io),
+            )
+        self.committed = (
+            generation + 1,
+            self.copy_pages(self.panel.mem, mem_pages, self.dirty_mem),
+            self.copy_pages(self.panel.io, io_pages, self.dirty_io),
+        )
+        self.dirty_mem = set()
+        self.dirty_io = set()
+        return generation + 1
+
+    def commit_io(self, base: int, sz: int) -> int:
+        """Publish just io[base:base + sz] as a new generation, for changes
+        made outside Wintex. Pending writes, even in the same page, are left
+        for their own commit.
+
+        This runs for every simulated event, so it only keeps the bytes
+        written. The pages they land in are copied once, when the next
+        snapshot or commit needs them."""
+        generation, mem_pages, io_pages = self.committed
+        self.io_writes.append((base, self.panel.io[base : base + sz]))
+        self.committed = (generation + 1, mem_pages, io_pages)
+        if self.image:
+            self.image.publish([], [(base, sz)])
+        return generation + 1
+
+    def apply_io_writes(self) -> None:
+        # bring the committed io pages up to date with commit_io
+        if not self.io_writes:
+            return
+        generation, mem_pages, io_pages = self.committed
+        pages: dict[int, bytearray] = {}
+        for base, data in self.io_writes:
+            for p in pages_of(base, len(data)):
+                if p not in pages:
+                    pages[p] = bytearray(io_pages[p])
+                lo = max(base, p * PAGE_SIZE)
+                hi = min(base + len(data), (p + 1) * PAGE_SIZE)
+                pages[p][lo - p * PAGE_SIZE : hi - p * PAGE_SIZE] = data[
+                    lo - base : hi - base
+                ]
+        new = list(io_pages)
+        for p, page in pages.items():
+            new[p] = bytes(page)
+        self.committed = (generation, mem_pages, tuple(new))
+        self.io_writes = []
+
+    @staticmethod
+    def copy_pages(
+        region: Region, pages: Tuple[bytes, ...], dirty: set[int]
+    ) -> Tuple[bytes, ...]:
+        if not dirty:
+            return pages
+        new = list(pages)
+        for p in dirty:
+            new[p] = bytes(region[p * PAGE_SIZE : (p + 1) * PAGE_SIZE])
+        return tuple(new)
+
+    def snapshot(self) -> PanelDecoder:
+        """A decoder over the last committed generation. Treat as read only,
+        it is shared by every reader until the next commit."""
+        cached = self.cached
+        if cached and cached[0] == self.generation:
+            return cached[1]
+        self.apply_io_writes()
+        generation, mem_pages, io_pages = self.committed
+        # the panel's settings and decode methods, over the committed pages.
+        # PagedMemory copies a page only if written, which readers don't.
+        snap = copy.copy(self.panel)
+        snap.mem = PagedMemory(len(self.panel.mem), sparse(mem_pages))
+        snap.io = PagedMemory(len(self.panel.io), sparse(io_pages))
+        self.cached = (generation, snap)
+        return snap
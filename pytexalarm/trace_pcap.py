@@ -10,7 +10,7 @@ from scapy.layers.inet import IP, TCP
 from . import DEFAULT_MEMFILE
 from .pialarm import PanelDecoder
 from .trace_uart import SerialWintexIgnore, SerialWintexPanel
-from .udl import compact_ranges
+from .udl import union_ranges
 
 
 def extract_tcp_udl_streams(
@@ -58,8 +58,8 @@ def extract_tcp_udl_streams(
     if verbose:
         print("Raw read ranges:")
         print(term.mem_ranges)
-        print("Compacted read ranges:")
-        print(compact_ranges(term.mem_ranges))
+        print("Union of read ranges:")
+        print(union_ranges(term.mem_ranges))
 
     return term.panel
 
@@ -11,6 +11,7 @@ from .pialarm import (
     get_bcd,
     get_panel_decoder,
 )
+from .recording import feed, read_recording, records_from_ser2net
 from .udl import SerialWintex
 
 # reads a ser2net trace files from stdin and prints the high-level operations.
@@ -29,14 +30,14 @@ class SerialWintexPanel(SerialWintex):
 
     def handle_msg(self, body: bytes) -> None:
         # commands we will store and destination region
-        mtype: str = body[0:1].decode()  # first char should be printable
+        mtype: str = chr(body[0])  # first char should be printable
 
         if mtype == "Z" and self.serial is None:
             # bytes are 8 characters of BCD serial number
             self.serial = get_bcd(body, 1, len(body) - 1)
             print(f"detected serial {self.serial}")
         elif mtype == "Z" and self.panel is None:
-            banner = body[1:].decode()
+            banner = bytes(body[1:]).decode()
             print(f"detected panel banner '{banner}'")
             self.panel = get_panel_decoder(banner)
             if self.serial:
@@ -50,19 +51,25 @@ class SerialWintexPanel(SerialWintex):
                 payload = body[5:]
                 if sz + 5 != len(body):
                     raise Exception("IO length byte does not match msg payload sz")
+                # some traces touch addresses past the regions we size
+                sz = len(c[base : base + sz])
+                payload = payload[:sz]
                 c[base : base + sz] = payload
                 if mtype == "I":
                     self.mem_ranges.append((base, sz))
+                    self.panel.mark_known(base, sz)
+                else:
+                    self.panel.mark_io_known(base, sz)
                 # print(f"storing msg {mtype} payload={payload!r} to {base:02x}")
             elif mtype == "P":  # heartbeat
                 pass
             elif body[0] == 6:  # hangup non-printable
                 pass
             else:
-                print(f"ignoring msg {self.direction}/{mtype} {body!r}")
+                print(f"ignoring msg {self.direction}/{mtype} {bytes(body)!r}")
             return None
         else:
-            print(f"panel not identified at {self.direction}/{mtype} {body!r}")
+            print(f"panel not identified at {self.direction}/{mtype} {bytes(body)!r}")
 
 
 class SerialWintexIgnore(SerialWintex):
@@ -71,33 +78,34 @@ class SerialWintexIgnore(SerialWintex):
         self.udlpasswd: str | None = None
 
     def handle_msg(self, body: bytes) -> None:
-        mtype: str = body[0:1].decode()  # first char should be printable
+        mtype: str = chr(body[0])  # first char should be printable
 
         if mtype == "Z" and len(body) > 1:
-            self.udlpasswd = body[1:].rstrip(b"\00").decode()
+            self.udlpasswd = bytes(body[1:]).rstrip(b"\00").decode()
             print(f"detected UDL password {self.udlpasswd}")
 
 
+def trace_parsers(
+    debug: bool = False, verbose: bool = False
+) -> Tuple[SerialWintexPanel, SerialWintexIgnore]:
+    term = SerialWintexPanel(direction="term", debug=debug, verbose=verbose)
+    tcp = SerialWintexIgnore(direction="tcp", debug=debug, verbose=verbose)
+    return term, tcp
+
+
 def panel_from_ser2net_trace(
     stream: Iterable[str], debug: bool = False, verbose: bool = False
 ) -> PanelDecoder | None:
-    term = SerialWintexPanel(direction="term", debug=debug, verbose=verbose)
-    tcp = SerialWintexIgnore(direction="tcp", debug=debug, verbose=verbose)
+    term, tcp = trace_parsers(debug, verbose)
+    feed(records_from_ser2net(stream), {"tcp": tcp, "term": term})
+    return term.panel
 
-    buffers = {"tcp": tcp, "term": term}
-    for line in stream:
-        # 2018/07/31 08:30:59 tcp  03 5a a2                 |.Z.|
-        # datetime = line[0:19]
-        direction = line[20:25].strip()
-        if direction not in buffers:
-            continue
-        hexbytes = line[25:50].strip().split(" ")
-        # if args.debug:
-        #    print(f"in: {datetime}' '{direction}' {hexbytes}")
-        # decode bytes from hexbytes and push to buffer
-        buf = buffers[direction]
-        buf.on_bytes(bytes.fromhex("".join(hexbytes)))
 
+def panel_from_recording(
+    filename: str, debug: bool = False, verbose: bool = False
+) -> PanelDecoder | None:
+    term, tcp = trace_parsers(debug, verbose)
+    feed(read_recording(filename), {"tcp": tcp, "term": term})
     return term.panel
 
 
@@ -119,18 +127,28 @@ if __name__ == "__main__":
     parser.add_argument(
         "--json", help="dump json extracted data", default=False, action="store_true"
     )
-    parser.add_argument("trace", help="Read from ser2net trace files", default="-")
+    parser.add_argument(
+        "trace",
+        help="Read from ser2net trace file, or a .udlrec session recording",
+        default="-",
+    )
 
     args = parser.parse_args()
 
-    stream = sys.stdin if args.trace == "-" else open(args.trace, "r")
-
-    panel = panel_from_ser2net_trace(stream)
+    if args.trace.endswith(".udlrec"):
+        panel = panel_from_recording(args.trace)
+    else:
+        stream = sys.stdin if args.trace == "-" else open(args.trace, "r")
+        panel = panel_from_ser2net_trace(stream)
 
     if not panel:
         print("error: panel type not determined -- incomplete trace?")
         exit(-1)
 
+    unknown = panel.unknown_topics()
+    if unknown:
+        print(f"trace never read: {', '.join(unknown)}")
+
     if args.json:
         print(json.dumps(panel.decode(), indent=4))
 
@@ -1,4 +1,4 @@
-from typing import Optional, Protocol, Tuple
+from typing import Any, Callable, ClassVar, Optional, Protocol, Tuple, TypeVar
 
 from .hexdump import printable
 
@@ -11,10 +11,7 @@ def udl_checksum(data: bytes) -> int:
     if sz != len(data):
         raise ValueError("length does not match framing!")
     # subtract each byte from 0xff
-    v = 255
-    for b in data:
-        v -= b
-    return v % 256
+    return (255 - sum(data)) % 256
 
 
 def udl_frame(msg: bytes) -> bytes:
@@ -29,23 +26,71 @@ def udl_frame(msg: bytes) -> bytes:
     return data
 
 
+def udl_frame_into(buf: bytearray, pos: int, msg: bytes) -> int:
+    # as udl_frame, but into a buffer the caller has already allocated, e.g.
+    # one for a whole batch of requests. Returns the offset after the frame.
+    msglen = len(msg)
+    if msglen > 253:
+        raise ValueError("Cannot frame overlong message")
+    end = pos + msglen + 2
+    buf[pos] = msglen + 2
+    buf[pos + 1 : end - 1] = msg
+    buf[end - 1] = (255 - (msglen + 2) - sum(msg)) % 256
+    return end
+
+
 def udl_verify(data: bytes) -> bool:
     return udl_checksum(data) == 0
 
 
+# Wintex reads in 64-byte pages, which every panel accepts. The largest read that
+# can be framed is limited by the 'I' reply: 253 bytes less 'I', address and size.
+DEFAULT_READ_SIZE = 64
+MAX_READ_SIZE = 248
+
+
+# called with (base, data) for each page as its reply arrives
+PageCallback = Callable[[int, bytes], None]
+
+
 class UDLClient(Protocol):
+    # largest read the connected panel accepts, used to plan reads
+    read_size: int
+
     async def read_mem(self, base: int, sz: int) -> bytes: ...
+    async def read_ranges(
+        self, ranges: list[Tuple[int, int]], on_page: Optional[PageCallback] = None
+    ) -> list[bytes]: ...
+    async def write_mem(self, base: int, data: bytes) -> None: ...
+    async def read_io(self, base: int, sz: int) -> bytes: ...
     async def read_identification(self) -> str: ...
 
 
 class SerialWintex:
-    def __init__(self, direction: str = "", verbose: bool = False, debug: bool = False):
+    def __init__(
+        self,
+        direction: str = "",
+        verbose: bool = False,
+        debug: bool = False,
+        zerocopy: bool = False,
+    ):
         self.buf = bytearray()
         self.verbose = verbose
         self.debug = debug
         self.direction = direction
+        # zerocopy hands handle_msg memoryview slices of self.buf, which are only
+        # valid for the duration of the call - copy anything that is retained.
+        # It only pays when many frames arrive at once, see
+        # benchmarks/frame_parser.py, so copying is the default.
+        self.zerocopy = zerocopy
 
     def on_bytes(self, bytes_message: bytes) -> None:
+        if self.zerocopy:
+            self.on_bytes_cursor(bytes_message)
+        else:
+            self.on_bytes_copy(bytes_message)
+
+    def on_bytes_copy(self, bytes_message: bytes) -> None:
         self.buf.extend(bytes_message)
         if self.debug:
             print(f" buffer: {self.direction:4s} {self.buf}")
@@ -54,6 +99,8 @@ class SerialWintex:
             sz = self.buf[0]
             msg = self.buf[0:sz]
             if udl_verify(msg):
+                # consumed even if handle_msg raises, so it isn't handled twice
+                del self.buf[0:sz]
                 self.log_msg(msg)
                 # handle_msg does not need (or return) length and checksum
                 reply = self.handle_msg(msg[1 : sz - 1])
@@ -61,24 +108,70 @@ class SerialWintex:
                     omsg = udl_frame(reply)
                     self.log_msg(reply)
                     self.send_bytes(omsg)
-                del self.buf[0:sz]
             else:
-                print(f"Warning: bad UDL checksum for {self.direction} at {self.buf}")
-                # recover from 'ATZ\r' if found
+                del self.buf[: self.bad_checksum(self.buf, 0)]
+
+    def on_bytes_cursor(self, bytes_message: bytes) -> None:
+        # As on_bytes_copy, but walk the buffer with a read offset and view each
+        # frame in place, so consumed bytes are discarded once per call rather
+        # than shifting the buffer down once per frame.
+        buf = self.buf
+        buf.extend(bytes_message)
+        if self.debug:
+            print(f" buffer: {self.direction:4s} {buf}")
+        end = len(buf)
+        if end == 0 or end < buf[0]:
+            return  # no complete frame yet
+        pos = 0
+        view = memoryview(buf)
+        msg = view[0:0]
+        try:
+            while pos < end:
+                sz = buf[pos]
+                nxt = pos + sz
+                if nxt > end:
+                    break
+                msg = view[pos:nxt]
+                # equivalent to udl_verify, the length byte is known to match
+                if sz > 0 and sum(msg) % 256 == 255:
+                    # consumed even if handle_msg raises, so it isn't handled twice
+                    pos = nxt
+                    self.log_msg(msg)
+                    # handle_msg does not need (or return) length and checksum
+                    reply = self.handle_msg(msg[1 : sz - 1])
+                    if reply:
+                        omsg = udl_frame(reply)
+                        self.log_msg(reply)
+                        self.send_bytes(omsg)
+                    continue
+                pos = self.bad_checksum(buf, pos)
+        finally:
+            msg.release()
+            view.release()
+            if pos:
                 try:
-                    rpos = self.buf.index(b"ATZ\r")
-                    print(f"removing before index {rpos}")
-                    del self.buf[: rpos + 4]
-                except ValueError:
-                    print("emptying buffer")
-                    del self.buf[:]
+                    del buf[:pos]
+                except BufferError:
+                    # a handler kept a view of the buffer, leave that one alone
+                    self.buf = buf[pos:]
+
+    def bad_checksum(self, buf: bytearray, pos: int) -> int:
+        # the frame at buf[pos] failed its checksum, returns where in buf to
+        # carry on from: after an 'ATZ\r' if there is one, else the end
+        print(f"Warning: bad UDL checksum for {self.direction} at {buf[pos:]}")
+        try:
+            rpos = buf.index(b"ATZ\r", pos)
+            print(f"removing before index {rpos - pos}")
+            return rpos + 4
+        except ValueError:
+            print("emptying buffer")
+            return len(buf)
 
     def log_msg(self, msg: bytes) -> None:
-        mtype = msg[0]
-        printable_type = printable(mtype)
-        msg_hex = " ".join("{:02x}".format(m) for m in msg[1:])
-        msg_ascii = "".join(printable(c) for c in msg[1:])
         if self.verbose:
+            printable_type = printable(msg[0])
+            msg_hex = " ".join("{:02x}".format(m) for m in msg[1:])
+            msg_ascii = "".join(printable(c) for c in msg[1:])
             print(f"  {self.direction:4s} {printable_type} {msg_hex} | {msg_ascii} ")
 
     def handle_msg(self, body: bytes) -> Optional[bytes]:
@@ -90,6 +183,69 @@ class SerialWintex:
         pass
 
 
+# handler for one command, given the body after the command byte
+Handler = Callable[[Any, bytes], Optional[bytes]]
+H = TypeVar("H", bound=Handler)
+
+
+def handles(cmd: bytes) -> Callable[[H], H]:
+    # mark a SerialWintexDispatch method as the handler for command cmd
+    def mark(fn: H) -> H:
+        setattr(fn, "udl_command", cmd[0])
+        return fn
+
+    return mark
+
+
+class SerialWintexDispatch(SerialWintex):
+    """
+    SerialWintex that looks up each frame's command byte in a table of
+    handlers, built from the methods marked with @handles. Subclasses
+    inherit their parent's table, picking up any overrides of those methods,
+    and can add or replace entries. Handlers can also be registered from
+    outside the class.
+    """
+
+    handlers: ClassVar[dict[int, Handler]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.handlers = {
+            cmd: vars(cls).get(fn.__name__, fn) for cmd, fn in cls.handlers.items()
+        }
+        for fn in vars(cls).values():
+            cmd = getattr(fn, "udl_command", None)
+            if cmd is not None:
+                cls.handlers[cmd] = fn
+
+    @classmethod
+    def register(cls, cmd: bytes, fn: Handler) -> None:
+        cls.handlers[cmd[0]] = fn
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        # frames received, indexed by command byte
+        self.frame_counts = [0] * 256
+
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        if not body:
+            # a valid frame, if an odd one
+            return self.unknown_command(body)
+        cmd = body[0]
+        self.frame_counts[cmd] += 1
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            return self.unknown_command(body)
+        return handler(self, body[1:])
+
+    def unknown_command(self, body: bytes) -> Optional[bytes]:
+        print(f"Unknown command {bytes(body[0:1])!r} with args {bytes(body[1:])!r}")
+        return None
+
+    def command_counts(self) -> dict[str, int]:
+        return {chr(c): n for c, n in enumerate(self.frame_counts) if n}
+
+
 # UDL memory/io read and writes over 64 bytes are split into 64-byte ranges.
 # to reduce the boilerplate storing the smaller ranges, we can compact/uncompact
 # them into equivelent larger ranges.
@@ -115,12 +271,106 @@ def compact_ranges(mem_ranges: list[Tuple[int, int]]) -> list[Tuple[int, int]]:
     return compacted
 
 
-def uncompact_ranges(mem_ranges: list[Tuple[int, int]]) -> list[Tuple[int, int]]:
+def uncompact_ranges(
+    mem_ranges: list[Tuple[int, int]], frame_size: int = DEFAULT_READ_SIZE
+) -> list[Tuple[int, int]]:
     uncompacted = []
     for base, sz in mem_ranges:
-        while sz > 64:
-            uncompacted.append((base, 64))
-            sz = sz - 64
-            base = base + 64
+        while sz > frame_size:
+            uncompacted.append((base, frame_size))
+            sz = sz - frame_size
+            base = base + frame_size
         uncompacted.append((base, sz))
     return uncompacted
+
+
+# Each read costs a 7-byte 'O' request plus 7 bytes of 'I' reply framing, and a
+# round trip. Reading through a gap shorter than this is cheaper than a new frame.
+READ_FRAME_OVERHEAD = 14
+
+
+def union_ranges(
+    mem_ranges: list[Tuple[int, int]], merge_gap: int = 0
+) -> list[Tuple[int, int]]:
+    # sorted, non-overlapping cover of mem_ranges. Ranges separated by no more
+    # than merge_gap bytes are joined, reading the gap along with them.
+    merged: list[Tuple[int, int]] = []
+    for base, sz in sorted(r for r in mem_ranges if r[1] > 0):
+        if merged:
+            last_base, last_sz = merged[-1]
+            if base <= last_base + last_sz + merge_gap:
+                end = max(last_base + last_sz, base + sz)
+                merged[-1] = (last_base, end - last_base)
+                continue
+        merged.append((base, sz))
+    return merged
+
+
+def subtract_ranges(
+    mem_ranges: list[Tuple[int, int]], done: list[Tuple[int, int]]
+) -> list[Tuple[int, int]]:
+    # the parts of mem_ranges not covered by any of the done ranges
+    todo = []
+    covered = union_ranges(done)
+    for base, sz in union_ranges(mem_ranges):
+        end = base + sz
+        for cbase, csz in covered:
+            if cbase + csz <= base or cbase >= end:
+                continue
+            if cbase > base:
+                todo.append((base, cbase - base))
+            base = max(base, cbase + csz)
+        if base < end:
+            todo.append((base, end - base))
+    return todo
+
+
+def plan_reads(
+    mem_ranges: list[Tuple[int, int]],
+    frame_size: int = DEFAULT_READ_SIZE,
+    merge_gap: int = READ_FRAME_OVERHEAD,
+) -> list[Tuple[int, int]]:
+    # dedupe the requested ranges, join neighbours where reading the gap saves
+    # a frame, then split into maximal frames
+    def frames(sz: int) -> int:
+        return (sz + frame_size - 1) // frame_size
+
+    planned: list[Tuple[int, int]] = []
+    for base, sz in union_ranges(mem_ranges):
+        if planned:
+            last_base, last_sz = planned[-1]
+            gap = base - (last_base + last_sz)
+            joined = base + sz - last_base
+            saves = frames(joined) < frames(last_sz) + frames(sz)
+            if gap <= merge_gap and saves:
+                planned[-1] = (last_base, joined)
+                continue
+        planned.append((base, sz))
+    return uncompact_ranges(planned, frame_size)
+
+
+# A write is a 7-byte 'I' frame header plus the 3-byte ACK.
+WRITE_FRAME_OVERHEAD = 10
+
+
+def diff_ranges(
+    old: bytes, new: bytes, merge_gap: int = WRITE_FRAME_OVERHEAD
+) -> list[Tuple[int, int]]:
+    # (base, sz) runs where new differs from old, with runs separated by no
+    # more than merge_gap unchanged bytes joined
+    if len(old) != len(new):
+        raise ValueError("images differ in size")
+    changed = []
+    step = 64
+    for page in range(0, len(new), step):
+        if old[page : page + step] == new[page : page + step]:
+            continue
+        for i in range(page, min(page + step, len(new))):
+            if old[i] != new[i]:
+                changed.append((i, 1))
+    return union_ranges(changed, merge_gap)
+
+
+def plan_cost(plan: list[Tuple[int, int]]) -> Tuple[int, int]:
+    # (frames, bytes) transferred by a read plan
+    return len(plan), sum(sz for _, sz in plan)
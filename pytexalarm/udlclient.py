@@ -1,17 +1,485 @@
 import argparse
 import asyncio
 import json
-from typing import Optional
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
+from .eventlog import LogStore, fetch_log
+from .journal import ReadJournal
+from .livestate import LivePoller
 from .pialarm import UDLTopics, get_bcd, get_panel_decoder, interactive_shell
-from .udl import UDLClient, udl_frame, udl_verify
+from .recording import SessionRecorder
+from .udl import (
+    DEFAULT_READ_SIZE,
+    MAX_READ_SIZE,
+    PageCallback,
+    SerialWintex,
+    UDLClient,
+    udl_frame,
+    udl_frame_into,
+    udl_verify,
+    uncompact_ranges,
+)
 
 CMD_LOGIN = 0x5A  # Z
 CMD_READ = 0x4F  # 'O'
 CMD_RESP = 0x49  # 'I'
+CMD_WRITE = 0x49  # 'I'
+CMD_IO_READ = 0x52  # 'R'
+CMD_IO_RESP = 0x57  # 'W'
+ACK = b"\x06"
 
 
-class AsyncioUDLClient(UDLClient):
+class UDLFrameError(ValueError):
+    """A reply that is garbled, cut short or doesn't answer the request."""
+
+
+@dataclass
+class ReadStats:
+    """Throughput of the last pipelined read, for tuning the window per site."""
+
+    frames: int = 0
+    nbytes: int = 0
+    elapsed: float = 0.0
+    window: int = 1
+    retries: int = 0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.nbytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.frames} frames {self.nbytes} bytes in {self.elapsed:.2f}s"
+            f" ({self.bytes_per_sec:.0f} bytes/sec, window {self.window},"
+            f" {self.retries} retries)"
+        )
+
+
+@dataclass
+class LinkCounters:
+    """Request outcomes over the life of a client."""
+
+    requests: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    bad_replies: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} requests, {self.retries} retries,"
+            f" {self.timeouts} timeouts, {self.bad_replies} bad replies"
+        )
+
+
+class RttEstimator:
+    """
+    Round trip times of recent requests. Deadlines are the p99 times a safety
+    factor, kept above a floor so a fast local link doesn't make them brittle.
+    Until enough samples arrive the initial deadline is used.
+    """
+
+    def __init__(
+        self, initial: float, factor: float = 3.0, floor: float = 0.5, samples: int = 64
+    ):
+        self.initial = initial
+        self.factor = factor
+        self.floor = floor
+        self.samples: deque[float] = deque(maxlen=samples)
+
+    def add(self, rtt: float) -> None:
+        self.samples.append(rtt)
+
+    def p99(self) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def deadline(self) -> float:
+        if len(self.samples) < 8:
+            return self.initial
+        return max(self.floor, self.p99() * self.factor)
+
+
+class BaseUDLClient(UDLClient):
+    """
+    Request/reply logic shared by the UDL client transports: retries, read
+    pipelining and login. Subclasses move frames on and off the link with
+    send_frames, read_frame and discard_input.
+    """
+
+    def __init__(
+        self,
+        udlpasswd: str,
+        serial: Optional[str],
+        window: int = 4,
+        max_window: int = 16,
+        timeout: float = 5.0,
+        retries: int = 3,
+    ):
+        self.udlpasswd = udlpasswd
+        self.serial = serial
+        # read_ranges keeps up to 'window' reads outstanding, growing towards
+        # max_window while replies keep up and halving when one goes missing.
+        self.window: float = window
+        self.max_window = max_window
+        # each request gets a deadline from measured round trips, and is sent
+        # up to 'retries' more times if it times out or the reply is garbled
+        self.rtt = RttEstimator(timeout)
+        self.retries = retries
+        self.counters = LinkCounters()
+        self.last_read_stats = ReadStats()
+        self.read_size = DEFAULT_READ_SIZE
+        # largest read size found by probe_read_size, by panel banner. Give
+        # clients of the same panels one dict to probe each model only once.
+        self.read_size_cache: dict[str, int] = {}
+        self.banner: Optional[str] = None
+        # monotonic time of the last frame sent or received
+        self.last_activity = time.monotonic()
+        # set to a SessionRecorder to log every frame on the link
+        self.recorder: Optional[SessionRecorder] = None
+        # progress messages, e.g. tagged by panel when many sessions run at once
+        self.log: Callable[[str], None] = print
+
+    def record(self, direction: str, frame: bytes) -> None:
+        if self.recorder:
+            self.recorder.record(direction, frame)
+
+    async def close(self) -> None:
+        raise NotImplementedError()
+
+    def abort(self) -> None:
+        # drop the link now, e.g. when a request is cancelled mid-exchange
+        raise NotImplementedError()
+
+    def is_closing(self) -> bool:
+        raise NotImplementedError()
+
+    async def send_frames(self, msgs: list[bytes]) -> None:
+        # frame and send each message, in order
+        raise NotImplementedError()
+
+    async def read_frame(self) -> bytes:
+        # the next verified frame, without length and checksum
+        raise NotImplementedError()
+
+    async def discard_input(self, quiet: float = 0.25) -> None:
+        """Drop buffered and arriving bytes until the link is quiet for a while."""
+        raise NotImplementedError()
+
+    async def read_reply(self, deadline: float) -> bytes:
+        # read_frame, giving up with TimeoutError after deadline seconds
+        return await asyncio.wait_for(self.read_frame(), deadline)
+
+    async def do_command(
+        self, msg: bytes, check: Optional[Callable[[bytes], bool]] = None
+    ) -> bytes:
+        """Send msg and return the reply, retrying until one passes check."""
+        for attempt in range(self.retries + 1):
+            self.counters.requests += 1
+            # back off the deadline on each retry, in case the link has slowed
+            deadline = self.rtt.deadline() * 2**attempt
+            try:
+                start = time.monotonic()
+                await self.send_frame(msg)
+                resp = await self.read_reply(deadline)
+                if check and not check(resp):
+                    raise UDLFrameError(f"unexpected reply {resp[0:5]!r}")
+                self.rtt.add(time.monotonic() - start)
+                return resp
+            except asyncio.CancelledError:
+                # its reply would be taken for the answer to the next request
+                self.abort()
+                raise
+            except asyncio.TimeoutError as e:
+                self.counters.timeouts += 1
+                error: Exception = e
+            except UDLFrameError as e:
+                self.counters.bad_replies += 1
+                error = e
+            if attempt < self.retries:
+                self.log(f" UDL {chr(msg[0])} request failed ({error!r}), retrying")
+                self.counters.retries += 1
+                await self.discard_input()
+        raise error
+
+    async def send_frame(self, msg: bytes) -> None:
+        await self.send_frames([msg])
+
+    def _build_mem_io_frame(
+        self, cmd: int, addr: int, sz: int = 0, data: bytes = b""
+    ) -> bytes:
+        # Address is 24-bit
+        addr_b1 = (addr >> 16) & 0xFF
+        addr_b2 = (addr >> 8) & 0xFF
+        addr_b3 = addr & 0xFF
+        return bytes([cmd, addr_b1, addr_b2, addr_b3, sz]) + data
+
+    async def read_mem(self, base: int, sz: int) -> bytes:
+        """Send a read request and return the data bytes."""
+        # split range into 64-byte pages
+
+        self.log(f" UDL reading base={base} count={sz}")
+        frame = self._build_mem_io_frame(CMD_READ, base, sz)
+        resp = await self.do_command(frame, partial(self._is_reply, CMD_RESP, frame))
+        return resp[5:]
+
+    @staticmethod
+    def _is_reply(code: int, frame: bytes, resp: bytes) -> bool:
+        # reply echoes the address and size, and carries that many bytes
+        return resp[0] == code and resp[1:5] == frame[1:5] and len(resp) == 5 + frame[4]
+
+    async def read_io(self, base: int, sz: int) -> bytes:
+        """Read live state (keypad screen, LEDs, zone state) with 'R'."""
+        frame = self._build_mem_io_frame(CMD_IO_READ, base, sz)
+        resp = await self.do_command(frame, partial(self._is_reply, CMD_IO_RESP, frame))
+        return resp[5:]
+
+    async def read_ranges(
+        self, ranges: list[Tuple[int, int]], on_page: Optional[PageCallback] = None
+    ) -> list[bytes]:
+        """Read each (base, sz) range, keeping several requests in flight.
+
+        Replies are matched to requests by the echoed address/size header, and
+        come back in the order asked. So when one is garbled, it is the oldest
+        request that failed: the window is halved and just that page is asked
+        for again. A second garbled reply in a row, or none arriving in time,
+        means the stream is out of step or replies were lost with it, so
+        whatever is left on it is discarded and everything outstanding is
+        requested again. Each page is tried at most retries times more.
+
+        A short reply to a read larger than DEFAULT_READ_SIZE means the panel
+        doesn't take that size after all: read_size drops back to the default
+        and that range is read again in default sized pages. A short default
+        sized page is asked for again. on_page is called with each page as it
+        arrives, in whatever order that is."""
+        loop = asyncio.get_running_loop()
+        stats = ReadStats()
+        start = loop.time()
+        results: list[Optional[bytes]] = [None] * len(ranges)
+        todo = deque(range(len(ranges)))
+        inflight: dict[bytes, deque[int]] = {}
+        # outstanding requests and when each was sent, oldest first
+        pending: dict[int, float] = {}
+        # when the last reply arrived, replies queue behind each other
+        last_reply = 0.0
+        failures = 0  # consecutive, without a good reply in between
+        garbled = False  # the last failure was a bad reply
+        split: list[int] = []  # ranges to read again in smaller pages
+        tries: dict[int, int] = {}  # retries of each range
+
+        def again(i: int, error: Exception) -> None:
+            # read range i again, unless it has had all its retries
+            tries[i] = tries.get(i, 0) + 1
+            if tries[i] > self.retries:
+                raise error
+            todo.appendleft(i)
+            stats.retries += 1
+            self.counters.retries += 1
+
+        def retry(i: int, error: Exception) -> None:
+            header = self._build_mem_io_frame(CMD_READ, *ranges[i])[1:5]
+            inflight[header].remove(i)
+            if not inflight[header]:
+                del inflight[header]
+            del pending[i]
+            again(i, error)
+
+        try:
+            while todo or pending:
+                batch: list[bytes] = []
+                indexes = []
+                while todo and len(pending) + len(batch) < int(self.window):
+                    i = todo.popleft()
+                    base, sz = ranges[i]
+                    self.log(f" UDL reading base={base} count={sz}")
+                    frame = self._build_mem_io_frame(CMD_READ, base, sz)
+                    inflight.setdefault(frame[1:5], deque()).append(i)
+                    batch.append(frame)
+                    indexes.append(i)
+                    self.counters.requests += 1
+                if batch:
+                    await self.send_frames(batch)
+                    now = time.monotonic()
+                    pending.update((i, now) for i in indexes)
+
+                try:
+                    deadline = self.rtt.deadline() * 2 ** min(failures, self.retries)
+                    resp = await self.read_reply(deadline)
+                    if resp[0] != CMD_RESP or len(resp) < 5:
+                        raise UDLFrameError(f"Unexpected response code: {resp[0]:02X}")
+                except (asyncio.TimeoutError, UDLFrameError) as e:
+                    was_garbled = garbled
+                    garbled = isinstance(e, UDLFrameError)
+                    if garbled:
+                        self.counters.bad_replies += 1
+                    else:
+                        self.counters.timeouts += 1
+                    failures += 1
+                    self.log(f" UDL pipelined read failed ({e!r}), backing off")
+                    self.window = max(1, self.window / 2)
+                    if not pending:
+                        continue  # the late or garbled reply had no request
+                    if garbled and not was_garbled:
+                        retry(next(iter(pending)), e)
+                        continue
+                    # out of step, or the bytes that were lost took more than
+                    # one reply with them: start over from a quiet link
+                    await self.discard_input()
+                    for i in reversed(list(pending)):
+                        retry(i, e)
+                    continue
+
+                header = resp[1:5]
+                if header not in inflight:
+                    # a panel cutting a read short may echo the size it sent
+                    header = next((h for h in inflight if h[0:3] == resp[1:4]), header)
+                idxs = inflight.get(header)
+                if not idxs:
+                    continue  # late reply to a request we already gave up on
+                i = idxs.popleft()
+                if not idxs:
+                    del inflight[header]
+                now = time.monotonic()
+                # from when the request was sent, or the reply before it arrived,
+                # so time spent queued behind the window isn't counted
+                self.rtt.add(now - max(pending.pop(i), last_reply))
+                last_reply = now
+                garbled = False
+                data = resp[5:]
+                if len(data) != ranges[i][1]:
+                    if ranges[i][1] > DEFAULT_READ_SIZE:
+                        self.log(f" UDL short read at {ranges[i]}, reading it in pages")
+                        self.fall_back_read_size()
+                        split.append(i)
+                        continue
+                    # a default sized page should always fit, ask for it again
+                    self.counters.bad_replies += 1
+                    failures += 1
+                    again(
+                        i,
+                        UDLFrameError(
+                            f"Short read at {ranges[i]}: got {len(data)} bytes"
+                        ),
+                    )
+                    continue
+                failures = 0
+                results[i] = data
+                if on_page:
+                    on_page(ranges[i][0], data)
+                stats.frames += 1
+                stats.nbytes += len(data)
+                # additive increase, about one frame per window of good replies
+                self.window = min(self.max_window, self.window + 1 / self.window)
+        except asyncio.CancelledError:
+            if inflight:
+                # replies still to come would answer the next caller's requests
+                self.abort()
+            raise
+
+        if split:
+            pages = uncompact_ranges([ranges[i] for i in split], DEFAULT_READ_SIZE)
+            smaller = iter(await self.read_ranges(pages, on_page))
+            for i in split:
+                n = len(uncompact_ranges([ranges[i]], DEFAULT_READ_SIZE))
+                results[i] = b"".join(next(smaller) for _ in range(n))
+            stats.frames += self.last_read_stats.frames
+            stats.nbytes += self.last_read_stats.nbytes
+            stats.retries += self.last_read_stats.retries
+
+        stats.elapsed = loop.time() - start
+        stats.window = int(self.window)
+        self.last_read_stats = stats
+        return [r for r in results if r is not None]
+
+    def fall_back_read_size(self) -> None:
+        # the probed read size turned out not to work, forget it
+        self.read_size = DEFAULT_READ_SIZE
+        if self.banner is not None:
+            self.read_size_cache.pop(self.banner, None)
+
+    async def write_mem(self, base: int, data: bytes) -> None:
+        """Write data to configuration memory, checking the panel ACKs it."""
+        self.log(f" UDL writing base={base} count={len(data)}")
+        frame = self._build_mem_io_frame(CMD_WRITE, base, len(data), data)
+        await self.do_command(frame, lambda resp: resp == ACK)
+
+    async def read_identification(self) -> str:
+        """After connection, read initial identification text from panel."""
+        c = await self.do_command(bytes([CMD_LOGIN]))
+        self.log(f"got serial {get_bcd(c, 1, len(c) - 1)}")
+        banner = await self.do_command(bytes([CMD_LOGIN]) + self.udlpasswd.encode())
+        panel = banner[1:].decode()
+        self.banner = panel
+        await self.probe_read_size(panel)
+        return panel
+
+    async def probe_read_size(
+        self,
+        banner: str,
+        sizes: Tuple[int, ...] = (MAX_READ_SIZE, 128),
+        addresses: Tuple[int, ...] = (0, 0x5400),
+        deadline: float = 1.0,
+    ) -> int:
+        """Find the largest read the panel answers in full at each of the
+        addresses (by default the start of memory and the zone names, the
+        largest block Wintex reads), falling back to 64.
+
+        A panel that doesn't take a size usually just ignores the read, so
+        each probe waits at most deadline seconds, and a size is given up on
+        at its first unanswered address."""
+        if banner in self.read_size_cache:
+            self.read_size = self.read_size_cache[banner]
+            return self.read_size
+        self.read_size = DEFAULT_READ_SIZE
+        deadline = min(deadline, self.rtt.deadline())
+        for sz in sizes:
+            for base in addresses:
+                if not await self.probe_read(base, sz, deadline):
+                    break
+            else:
+                self.read_size = sz
+                break
+        self.log(f" UDL read size for '{banner}' is {self.read_size}")
+        self.read_size_cache[banner] = self.read_size
+        return self.read_size
+
+    async def probe_read(self, base: int, sz: int, deadline: float) -> bool:
+        # does the panel answer a read of sz bytes at base in full
+        frame = self._build_mem_io_frame(CMD_READ, base, sz)
+        try:
+            await self.send_frame(frame)
+            resp = await self.read_reply(deadline)
+        except asyncio.CancelledError:
+            self.abort()
+            raise
+        except (asyncio.TimeoutError, UDLFrameError) as e:
+            self.log(f" UDL read size {sz} not answered at {base:06x} ({e!r})")
+            await self.discard_input()
+            return False
+        if not self._is_reply(CMD_RESP, frame, resp):
+            self.log(f" UDL read size {sz} gave a malformed reply at {base:06x}")
+            await self.discard_input()
+            return False
+        return True
+
+    async def send_heartbeat(self) -> None:
+        await self.do_command(b"P", lambda hb: hb == b"P\xff\xff")
+        return None
+
+
+class AsyncioUDLClient(BaseUDLClient):
     """
     Asyncio client for Texecom alarm panel protocol.
 
@@ -30,11 +498,16 @@ class AsyncioUDLClient(UDLClient):
         writer: asyncio.StreamWriter,
         udlpasswd: str,
         serial: Optional[str],
+        window: int = 4,
+        max_window: int = 16,
+        timeout: float = 5.0,
+        retries: int = 3,
     ):
+        super().__init__(udlpasswd, serial, window, max_window, timeout, retries)
         self.reader = reader
         self.writer = writer
-        self.udlpasswd = udlpasswd
-        self.serial = serial
+        # length byte of a frame whose body hasn't arrived yet
+        self.frame_length: Optional[bytes] = None
 
     @classmethod
     async def create(
@@ -44,6 +517,8 @@ class AsyncioUDLClient(UDLClient):
         port: int = 10001,
         serial: Optional[str] = None,
         stupid_delay: float = 2.0,
+        window: int = 4,
+        max_window: int = 16,
     ) -> "AsyncioUDLClient":
         # reader, writer = await asyncio.open_connection(host, port, local_addr=('0.0.0.0', 41525))
         reader, writer = await asyncio.open_connection(host, port)
@@ -57,62 +532,489 @@ class AsyncioUDLClient(UDLClient):
         # embarrased how long this took to figure out...
         await asyncio.sleep(stupid_delay)
 
-        return cls(reader, writer, udlpasswd, serial)
+        return cls(reader, writer, udlpasswd, serial, window, max_window)
 
     async def close(self) -> None:
         self.writer.close()
         await self.writer.wait_closed()
 
-    async def do_command(self, msg: bytes) -> bytes:
-        await self.send_frame(msg)
-        return await self.read_frame()
+    def abort(self) -> None:
+        self.writer.transport.abort()
 
-    async def send_frame(self, msg: bytes) -> None:
-        self.writer.write(udl_frame(msg))
+    def is_closing(self) -> bool:
+        return self.writer.is_closing()
+
+    async def send_frames(self, msgs: list[bytes]) -> None:
+        frames = [udl_frame(msg) for msg in msgs]
+        for frame in frames:
+            self.record("tcp", frame)
+        self.writer.writelines(frames)
         await self.writer.drain()
+        self.last_activity = time.monotonic()
 
     async def read_frame(self) -> bytes:
-        sz = await self.reader.readexactly(1)
+        # the length byte is kept if we are cancelled waiting for the rest,
+        # e.g. by a deadline, so the next call picks up the same frame
+        if self.frame_length is None:
+            self.frame_length = await self.reader.readexactly(1)
+        sz = self.frame_length
+        if sz[0] < 2:
+            self.frame_length = None
+            raise UDLFrameError(f"bad frame length {sz[0]}")
         reply = await self.reader.readexactly(sz[0] - 1)
-        if not udl_verify(b"".join([sz, reply])):
-            raise ValueError("command reply failed CRC verification")
+        self.frame_length = None
+        self.last_activity = time.monotonic()
+        frame = b"".join([sz, reply])
+        self.record("term", frame)
+        if not udl_verify(frame):
+            raise UDLFrameError("command reply failed CRC verification")
         return reply[0:-1]
 
-    def _build_mem_io_frame(
-        self, cmd: int, addr: int, sz: int = 0, data: bytes = b""
-    ) -> bytes:
-        # Address is 24-bit
-        addr_b1 = (addr >> 16) & 0xFF
-        addr_b2 = (addr >> 8) & 0xFF
-        addr_b3 = addr & 0xFF
-        return bytes([cmd, addr_b1, addr_b2, addr_b3, sz]) + data
+    async def discard_input(self, quiet: float = 0.25) -> None:
+        self.frame_length = None
+        while True:
+            try:
+                data = await asyncio.wait_for(self.reader.read(4096), quiet)
+            except asyncio.TimeoutError:
+                return
+            if not data:
+                raise ConnectionError("connection closed while resynchronising")
+
+
+class UDLFrameProtocol(SerialWintex, asyncio.Protocol):
+    """
+    Client end of a UDL link as an asyncio.Protocol. Incoming bytes go
+    straight from data_received through the SerialWintex framing shared with
+    the server and trace tools, and verified frames queue up for next_frame,
+    so a reply costs no awaits until someone wants it. A frame that fails its
+    checksum queues a UDLFrameError in its place, and only its own bytes are
+    skipped, so the replies behind it are kept.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(direction="udl")
+        self.transport: Optional[asyncio.Transport] = None
+        self.frames: deque[Union[bytes, UDLFrameError]] = deque()
+        # see BaseUDLClient.log, ProtocolUDLClient passes its own on
+        self.log: Callable[[str], None] = print
+        self.error: Optional[BaseException] = None
+        self.waiter: Optional[asyncio.Future[None]] = None
+        self.writable: Optional[asyncio.Future[None]] = None
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        self.on_bytes(data)
+
+    def handle_msg(self, body: bytes) -> None:
+        # body is a view of the receive buffer, keep a copy
+        self.frames.append(bytes(body))
+        self.wake()
+
+    def bad_checksum(self, buf: bytearray, pos: int) -> int:
+        self.log(f" UDL reply failed CRC verification: {bytes(buf[pos:])!r}")
+        self.frames.append(UDLFrameError("command reply failed CRC verification"))
+        self.wake()
+        # the length byte may be the damaged one, at worst the next frame
+        # fails too and the reader resynchronises
+        return pos + max(1, buf[pos])
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.error = exc or ConnectionError("connection closed")
+        self.wake()
+        self.resume_writing()
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+    def pause_writing(self) -> None:
+        if self.writable is None:
+            self.writable = asyncio.get_running_loop().create_future()
+
+    def resume_writing(self) -> None:
+        if self.writable is not None and not self.writable.done():
+            self.writable.set_result(None)
+        self.writable = None
+
+    def wake(self) -> None:
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def next_frame(self) -> bytes:
+        while not self.frames:
+            if self.error:
+                raise self.error
+            self.waiter = asyncio.get_running_loop().create_future()
+            await self.waiter
+        frame = self.frames.popleft()
+        if isinstance(frame, UDLFrameError):
+            raise frame
+        return frame
+
+    async def drain(self) -> None:
+        if self.error:
+            raise self.error
+        if self.writable is not None:
+            await self.writable
+
+
+class ProtocolUDLClient(BaseUDLClient):
+    """
+    As AsyncioUDLClient, on a UDLFrameProtocol rather than stream reader and
+    writer. A batch of requests is framed into one buffer and handed to the
+    transport with a single write.
+
+    Usage:
+        client = await ProtocolUDLClient.create('192.168.1.50', '1234')
+        model = await client.read_identification()
+    """
+
+    def __init__(
+        self,
+        protocol: UDLFrameProtocol,
+        udlpasswd: str,
+        serial: Optional[str],
+        window: int = 4,
+        max_window: int = 16,
+        timeout: float = 5.0,
+        retries: int = 3,
+    ):
+        super().__init__(udlpasswd, serial, window, max_window, timeout, retries)
+        self.protocol = protocol
+        # whatever self.log is at the time
+        protocol.log = lambda msg: self.log(msg)
+        # requests are framed into this, and it is reused batch to batch
+        self.send_buf = bytearray(16 * 256)
+
+    @classmethod
+    async def create(
+        cls,
+        host: str,
+        udlpasswd: str,
+        port: int = 10001,
+        serial: Optional[str] = None,
+        stupid_delay: float = 2.0,
+        window: int = 4,
+        max_window: int = 16,
+    ) -> "ProtocolUDLClient":
+        loop = asyncio.get_running_loop()
+        _, protocol = await loop.create_connection(UDLFrameProtocol, host, port)
+        # see AsyncioUDLClient.create
+        await asyncio.sleep(stupid_delay)
+        return cls(protocol, udlpasswd, serial, window, max_window)
+
+    async def close(self) -> None:
+        if self.protocol.transport:
+            self.protocol.transport.close()
+        await self.protocol.closed
+
+    def abort(self) -> None:
+        if self.protocol.transport:
+            self.protocol.transport.abort()
+
+    def is_closing(self) -> bool:
+        return self.protocol.closed.done() or (
+            self.protocol.transport is None or self.protocol.transport.is_closing()
+        )
+
+    async def send_frames(self, msgs: list[bytes]) -> None:
+        transport = self.protocol.transport
+        assert transport
+        size = sum(len(msg) + 2 for msg in msgs)
+        if len(self.send_buf) < size:
+            self.send_buf = bytearray(max(size, 2 * len(self.send_buf)))
+        buf = self.send_buf
+        pos = 0
+        for msg in msgs:
+            end = udl_frame_into(buf, pos, msg)
+            if self.recorder:
+                self.record("tcp", bytes(buf[pos:end]))
+            pos = end
+        with memoryview(buf) as view:
+            transport.write(view[:pos])
+        if transport.get_write_buffer_size():
+            # the transport kept a view of what it couldn't send yet, so the
+            # next batch gets a buffer of its own
+            self.send_buf = bytearray(len(buf))
+        await self.protocol.drain()
+        self.last_activity = time.monotonic()
+
+    async def read_reply(self, deadline: float) -> bytes:
+        if self.protocol.frames:
+            # already here, skip the timer and task wait_for would cost
+            return await self.read_frame()
+        return await super().read_reply(deadline)
+
+    async def read_frame(self) -> bytes:
+        frame = await self.protocol.next_frame()
+        self.last_activity = time.monotonic()
+        if self.recorder:
+            self.record("term", udl_frame(frame))
+        return frame
+
+    async def discard_input(self, quiet: float = 0.25) -> None:
+        self.protocol.frames.clear()
+        while True:
+            try:
+                await asyncio.wait_for(self.protocol.next_frame(), quiet)
+            except asyncio.TimeoutError:
+                # along with any partial frame left by lost bytes
+                del self.protocol.buf[:]
+                return
+            except UDLFrameError:
+                continue
+            except Exception as e:
+                raise ConnectionError("connection closed while resynchronising") from e
+
+
+class SerialUDLClient(AsyncioUDLClient):
+    """
+    UDL client for a panel wired directly to a local UART, e.g. the Raspberry
+    Pi header described in hardware/.
+
+    There is no IPCom in the way, so no connect delay, and deadlines are
+    derived from the baud rate rather than network round trips. Bytes of one
+    reply arrive back to back, so a pause mid-frame longer than the
+    inter-frame gap means bytes were lost and the partial frame is dropped.
+
+    Usage:
+        client = await SerialUDLClient.create_serial('/dev/serial0', '1234')
+        model = await client.read_identification()
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        udlpasswd: str,
+        serial: Optional[str],
+        baudrate: int = 19200,
+        window: int = 1,
+        max_window: int = 4,
+        retries: int = 3,
+    ):
+        self.baudrate = baudrate
+        # 8N1, ten bit times per byte
+        self.byte_time = 10 / baudrate
+        # worst case request and reply on the wire, plus panel processing
+        timeout = 2 * 256 * self.byte_time + 0.25
+        super().__init__(
+            reader, writer, udlpasswd, serial, window, max_window, timeout, retries
+        )
+        self.rtt = RttEstimator(timeout, floor=timeout / 2)
+        # allow for USB adapters that deliver bytes in 16ms bursts
+        self.frame_gap = max(0.05, 20 * self.byte_time)
+
+    @classmethod
+    async def create_serial(
+        cls,
+        device: str,
+        udlpasswd: str,
+        baudrate: int = 19200,
+        serial: Optional[str] = None,
+        window: int = 1,
+        max_window: int = 4,
+    ) -> "SerialUDLClient":
+        # only needed for a local UART, so TCP users don't have to install it
+        import serial_asyncio_fast
+
+        reader, writer = await serial_asyncio_fast.open_serial_connection(
+            url=device, baudrate=baudrate
+        )
+        return cls(reader, writer, udlpasswd, serial, baudrate, window, max_window)
+
+    async def read_frame(self) -> bytes:
+        sz = await self.reader.readexactly(1)
+        if sz[0] < 2:
+            raise UDLFrameError(f"bad frame length {sz[0]}")
+        need = sz[0] - 1
+        chunks = [sz]
+        while need:
+            try:
+                chunk = await asyncio.wait_for(self.reader.read(need), self.frame_gap)
+            except asyncio.TimeoutError:
+                raise UDLFrameError(f"frame stalled with {need} bytes outstanding")
+            if not chunk:
+                raise EOFError("serial port closed mid-frame")
+            chunks.append(chunk)
+            need -= len(chunk)
+        self.last_activity = time.monotonic()
+        frame = b"".join(chunks)
+        self.record("term", frame)
+        if not udl_verify(frame):
+            raise UDLFrameError("command reply failed CRC verification")
+        return frame[1:-1]
+
+
+T = TypeVar("T")
+
+# failures that leave the link in an unknown state, so we start a fresh one
+LINK_ERRORS = (
+    ConnectionError,
+    OSError,
+    EOFError,
+    asyncio.IncompleteReadError,
+    asyncio.TimeoutError,
+    UDLFrameError,
+)
+
+
+class UDLSession:
+    """
+    Long-lived, logged in connection to a panel shared between callers.
+
+    Logs in once, then sends the 'P' heartbeat whenever the link has been idle
+    for 'heartbeat' seconds (Wintex uses 10s), so the IPCom keeps it open and
+    later callers skip the connect delay and login exchange. A failed link is
+    dropped and transparently re-established on next use, with a new client
+    from connect_client, e.g. ProtocolUDLClient.create with its arguments.
+
+    A session is a UDLClient itself, each request taking its turn on the one
+    link, so it can be handed to LivePoller and the like.
+
+    Usage:
+        session = UDLSession(partial(ProtocolUDLClient.create, host, '1234'))
+        async with session.borrow() as client:
+            value = await client.read_mem(0x005D04, 16)
+        value = await session.call(lambda c: c.read_mem(0x005D04, 16))
+        await session.close()
+    """
+
+    def __init__(
+        self,
+        connect_client: Callable[[], Awaitable[BaseUDLClient]],
+        heartbeat: float = 10.0,
+        client: Optional[BaseUDLClient] = None,
+    ):
+        self.connect_client = connect_client
+        self.heartbeat = heartbeat
+        # an already logged in client to start with, if there is one
+        self.client = client
+        self.banner = client.banner if client else None
+        self.connects = 0
+        # so a reconnect doesn't probe the read size again
+        self.read_size_cache: dict[str, int] = client.read_size_cache if client else {}
+        self.lock = asyncio.Lock()
+        self.heartbeat_task: Optional[asyncio.Task[None]] = None
+        # passed on to each client, as their log
+        self.log: Callable[[str], None] = client.log if client else print
+        if client:
+            self.heartbeat_task = asyncio.create_task(self.keepalive())
+
+    async def connect(self) -> BaseUDLClient:
+        client = await self.connect_client()
+        client.log = self.log
+        client.read_size_cache = self.read_size_cache
+        try:
+            self.banner = await client.read_identification()
+        except BaseException:
+            await client.close()
+            raise
+        self.client = client
+        self.connects += 1
+        if self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.create_task(self.keepalive())
+        return client
+
+    async def disconnect(self) -> None:
+        client, self.client = self.client, None
+        if client:
+            try:
+                await client.close()
+            except LINK_ERRORS:
+                pass
+
+    @asynccontextmanager
+    async def borrow(self) -> AsyncIterator[BaseUDLClient]:
+        """Exclusive use of the logged-in client, connecting if needed."""
+        async with self.lock:
+            if self.client and self.client.is_closing():
+                # aborted by a cancelled request
+                self.client = None
+            client = self.client or await self.connect()
+            try:
+                yield client
+            except LINK_ERRORS:
+                await self.disconnect()
+                raise
+
+    async def call(
+        self, fn: Callable[[BaseUDLClient], Awaitable[T]], retries: int = 1
+    ) -> T:
+        """Run fn with the client, reconnecting and retrying if the link fails."""
+        while True:
+            try:
+                async with self.borrow() as client:
+                    return await fn(client)
+            except LINK_ERRORS as e:
+                if retries <= 0:
+                    raise
+                retries -= 1
+                self.log(f"UDL session failed ({e!r}), reconnecting")
+
+    async def keepalive(self) -> None:
+        while True:
+            idle = time.monotonic() - self.client.last_activity if self.client else 0
+            await asyncio.sleep(max(self.heartbeat - idle, 0.1))
+            if self.client is None or self.lock.locked():
+                continue  # not connected, or real traffic is flowing
+            async with self.lock:
+                # traffic may have gone through while we waited for the lock
+                client = self.client
+                if client is None or client.is_closing():
+                    continue
+                if time.monotonic() - client.last_activity < self.heartbeat:
+                    continue
+                try:
+                    await client.send_heartbeat()
+                except LINK_ERRORS as e:
+                    self.log(f"UDL session heartbeat failed ({e!r})")
+                    await self.disconnect()
+
+    async def close(self) -> None:
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+            try:
+                await self.heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self.heartbeat_task = None
+        async with self.lock:
+            await self.disconnect()
+
+    # UDLClient, a request at a time through call
+
+    @property
+    def read_size(self) -> int:
+        if self.client:
+            return self.client.read_size
+        return self.read_size_cache.get(self.banner or "", DEFAULT_READ_SIZE)
+
+    @read_size.setter
+    def read_size(self, size: int) -> None:
+        if self.client:
+            self.client.read_size = size
 
     async def read_mem(self, base: int, sz: int) -> bytes:
-        """Send a read request and return the data bytes."""
-        # split range into 64-byte pages
+        return await self.call(lambda c: c.read_mem(base, sz))
 
-        print(f" UDL reading base={base} count={sz}")
-        frame = self._build_mem_io_frame(CMD_READ, base, sz)
-        await self.send_frame(frame)
-        resp = await self.read_frame()
-        if resp[0] != CMD_RESP:
-            raise ValueError(f"Unexpected response code: {resp[0]:02X}")
-        assert frame[1:5] == resp[1:5]
-        data = resp[5:]
-        assert len(data) == sz
-        return data
+    async def read_ranges(
+        self, ranges: list[Tuple[int, int]], on_page: Optional[PageCallback] = None
+    ) -> list[bytes]:
+        return await self.call(lambda c: c.read_ranges(ranges, on_page))
 
-    async def read_identification(self) -> str:
-        """After connection, read initial identification text from panel."""
-        c = await self.do_command(bytes([CMD_LOGIN]))
-        print(f"got serial {get_bcd(c, 1, len(c) - 1)}")
-        banner = await self.do_command(bytes([CMD_LOGIN]) + self.udlpasswd.encode())
-        return banner[1:].decode()
+    async def write_mem(self, base: int, data: bytes) -> None:
+        await self.call(lambda c: c.write_mem(base, data))
 
-    async def send_heartbeat(self) -> None:
-        hb = await self.do_command(b"P")
-        assert hb == b"P\xff\xff"
-        return None
+    async def read_io(self, base: int, sz: int) -> bytes:
+        return await self.call(lambda c: c.read_io(base, sz))
+
+    async def read_identification(self) -> str:
+        async with self.borrow():
+            assert self.banner is not None
+            return self.banner
 
 
 async def main() -> None:
@@ -122,6 +1024,10 @@ async def main() -> None:
     parser.add_argument("--host", help="UDL host/ip", default="localhost")
     parser.add_argument("--password", help="UDL password", default="")
     parser.add_argument("--port", help="UDL port", default=10001, type=int)
+    parser.add_argument(
+        "--device", help="serial device wired to the panel, instead of --host"
+    )
+    parser.add_argument("--baud", help="serial baud rate", default=19200, type=int)
     parser.add_argument(
         "--serial", help="expected pannel seral challenge", default=None
     )
@@ -132,12 +1038,69 @@ async def main() -> None:
     parser.add_argument(
         "--json", help="dump json extracted data", default=False, action="store_true"
     )
+    parser.add_argument(
+        "--log", help="append new event log records to LOGFILE", default=None
+    )
+    parser.add_argument(
+        "--watch",
+        help="poll the virtual keypad and print changes",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--resume",
+        help="continue an interrupted download into MEMFILE from its journal",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--record", help="record every frame on the link to FILE", default=None
+    )
+    parser.add_argument(
+        "--window",
+        help="initial reads kept in flight (4 over TCP, 1 on a serial device)",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--max-window",
+        help="upper bound on reads in flight (16 over TCP, 4 on a serial device)",
+        default=None,
+        type=int,
+    )
     args = parser.parse_args()
+    if args.resume and not args.mem:
+        parser.error("--resume needs --mem")
 
-    client = await AsyncioUDLClient.create(
-        args.host, port=args.port, udlpasswd=args.password
-    )
-    print(f"connected to {args.host}")
+    # each transport has its own defaults, only override those given
+    windows = {
+        k: v
+        for k, v in (("window", args.window), ("max_window", args.max_window))
+        if v is not None
+    }
+
+    async def connect() -> BaseUDLClient:
+        if args.device:
+            serial = await SerialUDLClient.create_serial(
+                args.device,
+                args.password,
+                baudrate=args.baud,
+                **windows,
+            )
+            print(f"opened {args.device}")
+            return serial
+        tcp = await ProtocolUDLClient.create(
+            args.host,
+            port=args.port,
+            udlpasswd=args.password,
+            **windows,
+        )
+        print(f"connected to {args.host}")
+        return tcp
+
+    client = await connect()
+    if args.record:
+        client.recorder = SessionRecorder(args.record)
     try:
         banner = await client.read_identification()
         print("Banner:", banner)
@@ -147,19 +1110,44 @@ async def main() -> None:
 
         panel = get_panel_decoder(banner)
 
+        # pages are journalled beside the memfile as they arrive
+        journal = ReadJournal(args.mem + ".journal") if args.mem else None
+        done: list[Tuple[int, int]] = []
+        if journal and args.resume:
+            done = journal.replay(banner, panel.mem)
+            print(f"resuming, {len(done)} pages from {journal.filename}")
+        if journal and not done:
+            journal.start(banner)
+
         # Example: read firmware version register
         await panel.udl_read_with(
             client,
             UDLTopics.ZONES | UDLTopics.AREAS | UDLTopics.USERS | UDLTopics.KEYPADS,
+            journal,
+            done,
         )
-        print("done reads")
+        print(f"done reads: {client.last_read_stats}")
+        print(f"link: {client.counters}")
 
-        if args.mem:
+        if args.log:
+            await fetch_log(panel, client, LogStore(args.log))
+
+        if args.mem and journal:
             panel.save(args.mem)
+            journal.remove()
 
         if args.json:
             print(json.dumps(panel.decode(), indent=4))
 
+        if args.watch:
+            # the same client, kept alive between polls and reconnected if
+            # the link drops
+            session = UDLSession(connect, client=client)
+            try:
+                await LivePoller(panel, session, print).run()
+            finally:
+                await session.close()
+
         if args.cli:
             try:
                 await interactive_shell(panel, client=client, UDLTopics=UDLTopics)
@@ -168,6 +1156,8 @@ async def main() -> None:
 
     finally:
         await client.close()
+        if client.recorder:
+            client.recorder.close()
 
 
 if __name__ == "__main__":
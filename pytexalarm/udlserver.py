@@ -3,19 +3,31 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import glob
+import os
+import random
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, replace
 from functools import partial
 from itertools import count
-from typing import Any
+from typing import Any, Callable, Optional, Union
 
 from . import DEFAULT_MEMFILE
+from .image import PanelImage, create_image
+from .paged import Region
 from .pialarm import (
     PanelDecoder,
+    WintexEliteDecoder,
     get_bcd,
     get_panel_decoder,
     interactive_shell,
     panel_from_file,
+    panel_header_from_file,
 )
-from .udl import SerialWintex
+from .recording import SessionRecorder
+from .scenario import EventGenerator, load_script
+from .snapshot import PanelSnapshots
+from .udl import SerialWintexDispatch, handles
 from .webapp import start_server
 
 PORT = 10001
@@ -36,13 +48,92 @@ parser.add_argument(
 parser.add_argument(
     "--mem", help="read/write panel config from MEMFILE", default=DEFAULT_MEMFILE
 )
+parser.add_argument(
+    "--image",
+    help="map panel memory from IMAGE, writes persist immediately. Created from"
+    " --mem or --banner if missing",
+    default=None,
+)
+parser.add_argument(
+    "--record",
+    help="record each connection to PREFIX.<n>.udlrec, see pytexalarm.recording",
+    default=None,
+)
+# each --link option takes a value per connection, in the order they
+# connect, the last repeating for any after
+parser.add_argument(
+    "--link-baud",
+    help="simulate a panel UART at BAUD",
+    default=[0],
+    type=int,
+    nargs="+",
+)
+parser.add_argument(
+    "--link-delay",
+    help="simulated panel seconds per request",
+    default=[0.0],
+    type=float,
+    nargs="+",
+)
+parser.add_argument(
+    "--link-buffer",
+    help="simulated IPCom seconds holding each reply",
+    default=[0.0],
+    type=float,
+    nargs="+",
+)
+parser.add_argument(
+    "--link-jitter",
+    help="simulated random extra seconds",
+    default=[0.0],
+    type=float,
+    nargs="+",
+)
+parser.add_argument(
+    "--link-drop",
+    help="simulated chance a byte is lost",
+    default=[0.0],
+    type=float,
+    nargs="+",
+)
+parser.add_argument(
+    "--link-corrupt",
+    help="simulated chance a byte is garbled",
+    default=[0.0],
+    type=float,
+    nargs="+",
+)
+parser.add_argument(
+    "--link-seed", help="repeat simulated faults from SEED", default=None, type=int
+)
+parser.add_argument(
+    "--events",
+    help="change zone states and the virtual keypad at RATE a second",
+    default=0.0,
+    type=float,
+)
+parser.add_argument(
+    "--events-script", help="make the io changes listed in FILE instead", default=None
+)
+parser.add_argument(
+    "--events-seed", help="repeat random changes from SEED", default=None, type=int
+)
 parser.add_argument("--udl-port", help="UDL port", default=PORT, type=int)
 parser.add_argument("--udl-password", help="UDL password", default="1234")
 parser.add_argument("--web-port", help="web port", default=WEBPORT, type=int)
+parser.add_argument(
+    "--mem-dir", help="serve every memfile in DIR, chosen by UDL password", default=None
+)
+parser.add_argument(
+    "--port-per-panel",
+    help="with --mem-dir, serve each panel on its own port from --udl-port",
+    action="store_true",
+    default=False,
+)
+parser.add_argument(
+    "--max-resident", help="with --mem-dir, panels kept in memory", default=32, type=int
+)
 
-# How much memory to spend (at most) on each call to recv. Pretty arbitrary,
-# but shouldn't be too big or too small.
-BUFSIZE = 16384
 CONNECTION_COUNTER = count()
 
 ACK_MSG = b"\06"
@@ -71,7 +162,7 @@ KEY_MAP = {
 }
 
 
-def unpack_mem_proto(region: bytes, msg_body: bytes) -> tuple[int, int, bytes, bytes]:
+def unpack_mem_proto(region: Region, msg_body: bytes) -> tuple[int, int, bytes, bytes]:
     base = (msg_body[0] << 16) + (msg_body[1] << 8) + msg_body[2]
     sz = msg_body[3]
     if len(msg_body) not in [4, sz + 4]:
@@ -80,6 +171,12 @@ def unpack_mem_proto(region: bytes, msg_body: bytes) -> tuple[int, int, bytes, b
         )
     old_data = region[base : base + sz]
     wr_data = msg_body[4:]
+    if len(old_data) < sz:
+        # Wintex touches addresses past the regions we size, e.g. 'W' at 0x3069
+        # on an Elite 24. Keep what fits rather than drop the connection
+        print(f"Clipping addr={base:06x} sz={sz:01x} to region size {len(region):06x}")
+        sz = len(old_data)
+        wr_data = wr_data[:sz]
     return (base, sz, wr_data, old_data)
 
 
@@ -87,98 +184,128 @@ def hexbytes(data: bytes) -> str:
     return ",".join(hex(x) for x in data)
 
 
-class SerialWintexPanel(SerialWintex):
-    def __init__(self, panel: PanelDecoder, **kwargs: Any) -> None:
+class SerialWintexPanel(SerialWintexDispatch):
+    def __init__(
+        self,
+        panel: PanelDecoder,
+        snapshots: PanelSnapshots | None = None,
+        **kwargs: Any,
+    ) -> None:
         super().__init__(**kwargs)
         self.serial: bytes = b"\x01\x00\x07\x09\x04\x07\x01"
         self.panel: PanelDecoder = panel
+        # writes are published to snapshot readers in batches, see commit
+        self.snapshots = snapshots
         self.outbound: list[bytes] = []
 
-    def handle_msg(self, body: bytes) -> bytes | None:
-        mtype = body[0:1].decode()
-        body = body[1:]
-
-        # commands we will store and destination region
-        if mtype == "Z" and len(body) == 0:
+    def commit(self) -> None:
+        if self.snapshots and self.snapshots.pending():
+            generation = self.snapshots.commit()
+            print(f"Committed writes as generation {generation}")
+
+    # live state polling, the busiest commands while Wintex is connected
+    @handles(b"R")
+    def live_state_read(self, body: bytes) -> bytes | None:
+        base, sz, wr_data, old_data = unpack_mem_proto(self.panel.io, body)
+        print(f"Live state read addr={base:06x} sz={sz:01x} data={hexbytes(old_data)}")
+        return b"W" + body[0:4] + old_data
+
+    @handles(b"W")
+    def live_state_write(self, body: bytes) -> bytes | None:
+        base, sz, wr_data, old_data = unpack_mem_proto(self.panel.io, body)
+        print(f"Live state write addr={base:06x} sz={sz:01x}")
+        self.print_deltas(base, old_data, wr_data)
+        self.panel.io[base : base + sz] = wr_data
+        self.panel.mark_io_known(base, sz)
+        if self.snapshots:
+            self.snapshots.mark_io(base, sz)
+        return ACK_MSG
+
+    @handles(b"P")
+    def heartbeat(self, body: bytes) -> bytes | None:
+        return b"P\xff\xff"
+
+    # wintex shows 'Reading UDL options'
+    @handles(b"O")
+    def config_read(self, body: bytes) -> bytes | None:
+        base, sz, wr_data, old_data = unpack_mem_proto(self.panel.mem, body)
+        print(f"Configuration read addr={base:06x} sz={sz:01x} data={old_data.hex()}")
+        return b"I" + body[0:4] + old_data  # echo back addr and sz
+
+    @handles(b"I")
+    def config_write(self, body: bytes) -> bytes | None:
+        base, sz, wr_data, old_data = unpack_mem_proto(self.panel.mem, body)
+        print(f"Configuration write addr={base:06x} sz={sz:01x} data={wr_data.hex()}")
+        self.print_deltas(base, old_data, wr_data)
+        self.panel.mem[base : base + sz] = wr_data
+        self.panel.mark_known(base, sz)
+        if self.snapshots:
+            self.snapshots.mark_mem(base, sz)
+        return ACK_MSG
+
+    @handles(b"Z")
+    def login(self, body: bytes) -> bytes | None:
+        if len(body) == 0:
             print(f"Sending login prompt for serial '{get_bcd(self.serial, 0, 7)}'")
             # unsure of the significance of this 0x05
             return b"Z\x05" + self.serial
-        elif mtype == "Z":
-            login = body.decode()
-            print(f"Recieved UDL login '{login}'.")
-            self.check_udl_login(login)
-            print(f"Sending panel identification '{self.panel.banner}'")
-            assert len(self.panel.banner) == 20
-            return ("Z" + self.panel.banner).encode()
-        elif mtype == "H":
-            print("Wintex hang up")
-            return b"\03\06\xf6"
-        # wintex shows 'Reading UDL options'
-        elif mtype == "O":  # configuration read
-            base, sz, wr_data, old_data = unpack_mem_proto(self.panel.mem, body)
-            print(
-                f"Configuration read addr={base:06x} sz={sz:01x} data={old_data.hex()}"
-            )
-            return b"I" + body[0:4] + old_data  # echo back addr and sz
-        elif mtype == "I":  # configuration write
-            base, sz, wr_data, old_data = unpack_mem_proto(self.panel.mem, body)
-            print(
-                f"Configuration write addr={base:06x} sz={sz:01x} data={wr_data.hex()}"
-            )
-            self.print_deltas(base, old_data, wr_data)
-            self.panel.mem[base : base + sz] = wr_data
-            return ACK_MSG
-        elif mtype == "R":  # live state read
-            base, sz, wr_data, old_data = unpack_mem_proto(self.panel.io, body)
-            print(
-                f"Live state read addr={base:06x} sz={sz:01x} data={hexbytes(old_data)}"
-            )
-            return b"W" + body[0:4] + old_data
-        elif mtype == "W":  # live state write
-            base, sz, wr_data, old_data = unpack_mem_proto(self.panel.io, body)
-            print(f"Live state write addr={base:06x} sz={sz:01x}")
-            self.print_deltas(base, old_data, wr_data)
-            self.panel.io[base : base + sz] = wr_data
-            return ACK_MSG
-        elif mtype == "P":  # Heartbeat
-            return b"P\xff\xff"
-        elif mtype == "K":  # Keypad press
-            print(f"Keypad {body[0]} pressed 0x{body[1]:02x} - {KEY_MAP.get(body[1])}")
+        login = bytes(body).decode()
+        print(f"Recieved UDL login '{login}'.")
+        self.check_udl_login(login)
+        print(f"Sending panel identification '{self.panel.banner}'")
+        assert len(self.panel.banner) == 20
+        return ("Z" + self.panel.banner).encode()
+
+    @handles(b"H")
+    def hang_up(self, body: bytes) -> bytes | None:
+        print("Wintex hang up")
+        self.commit()
+        return b"\03\06\xf6"
+
+    @handles(b"K")
+    def keypad_press(self, body: bytes) -> bytes | None:
+        print(f"Keypad {body[0]} pressed 0x{body[1]:02x} - {KEY_MAP.get(body[1])}")
+        return ACK_MSG
+
+    @handles(b"U")
+    def special_action(self, body: bytes) -> bytes | None:
+        # U 01 - commit zone, expander changes
+        if body[0] == 1:
+            print("Committing zone changes?")
+            self.commit()
             return ACK_MSG
-        elif mtype == "U":  # Special action?
-            # U 01 - commit zone, expander changes
-            if body[0] == 1:
-                print("Committing zone changes?")
-                return ACK_MSG
-            elif body[0] == 64:
-                print("Sending message to keypads")
-                return ACK_MSG
-            else:
-                print(f"Unknown U special action {mtype} with args {body!r}")
-        elif mtype == "A":
-            print(f"Arming area {body[0]}")
-            return ACK_MSG
-        elif mtype == "C":
-            print(f"Resetting area {body[0]}")
+        elif body[0] == 64:
+            print("Sending message to keypads")
             return ACK_MSG
-        elif mtype == "S":
-            print(f"Part arming area {body[0]} type={body[1]}")
-            return ACK_MSG
-        elif mtype == "B":
-            # RTC programming done via. B with args [56, 9, 29, 1, 0]
-            if body == b"\56\00\29\01\00":
-                print("RTC initialise special op 1")
-                return ACK_MSG
-            elif body == b"\57\09\29\01\00":
-                print("RTC initialise special op 2")
-                return ACK_MSG
-            else:
-                print(f"Unknown B special RTC action {mtype} with args {body!r}")
-                return ACK_MSG
-        else:
-            print(f"Unknown command {mtype} with args {body!r}")
+        print(f"Unknown U special action U with args {bytes(body)!r}")
         return None
 
+    @handles(b"A")
+    def arm(self, body: bytes) -> bytes | None:
+        print(f"Arming area {body[0]}")
+        return ACK_MSG
+
+    @handles(b"C")
+    def reset(self, body: bytes) -> bytes | None:
+        print(f"Resetting area {body[0]}")
+        return ACK_MSG
+
+    @handles(b"S")
+    def part_arm(self, body: bytes) -> bytes | None:
+        print(f"Part arming area {body[0]} type={body[1]}")
+        return ACK_MSG
+
+    @handles(b"B")
+    def rtc_action(self, body: bytes) -> bytes | None:
+        # RTC programming done via. B with args [56, 9, 29, 1, 0]
+        if body == b"\56\00\29\01\00":
+            print("RTC initialise special op 1")
+        elif body == b"\57\09\29\01\00":
+            print("RTC initialise special op 2")
+        else:
+            print(f"Unknown B special RTC action B with args {bytes(body)!r}")
+        return ACK_MSG
+
     def send_bytes(self, message: bytes) -> None:
         self.outbound.append(message)
 
@@ -192,47 +319,423 @@ class SerialWintexPanel(SerialWintex):
         pass
 
 
-async def udl_server(
-    panel: PanelDecoder,
-    debug: bool,
-    reader: asyncio.StreamReader,
-    writer: asyncio.StreamWriter,
-) -> None:
-    # Assign each connection a unique number to make our debug prints easier
-    # to understand when there are multiple simultaneous connections.
-    ser = SerialWintexPanel(panel, direction="tcp")
-    ident = next(CONNECTION_COUNTER)
-    print(f"udl_server {ident}: connected")
-    try:
-        while True:
-            data = await reader.read(BUFSIZE)
-            if debug:
-                print(f"udl_server {ident}: received data {data!r}")
+@dataclass
+class LinkModel:
+    """
+    Timing and faults of the link to a real panel, so clients can be run
+    against the emulator as if through a UART or an IPCom. Everything is
+    off by default and the emulator answers as fast as loopback allows.
+    With a seed, faults repeat exactly from run to run.
+
+    Each connection gets a model of its own, see start_udl_server.
+    """
+
+    baudrate: int = 0  # panel UART, 0 for unlimited
+    frame_delay: float = 0.0  # panel processing per request
+    buffer_delay: float = 0.0  # IPCom holding serial bytes before sending on
+    jitter: float = 0.0  # up to this much more per reply
+    drop_rate: float = 0.0  # chance each byte is lost
+    corrupt_rate: float = 0.0  # chance each byte has a bit flipped
+    seed: int | None = None
+
+    @property
+    def active(self) -> bool:
+        return any(
+            (
+                self.baudrate,
+                self.frame_delay,
+                self.buffer_delay,
+                self.jitter,
+                self.drop_rate,
+                self.corrupt_rate,
+            )
+        )
 
-            if not data:
-                print(f"udl_server {ident}: connection closed")
-                return
+    def for_connection(self, index: int) -> LinkModel:
+        # the same link for connection index, drawing faults of its own
+        return replace(self, seed=None if self.seed is None else self.seed + index)
+
+    def connect(self, transport: asyncio.WriteTransport) -> SimulatedLink:
+        return SimulatedLink(self, transport, random.Random(self.seed))
+
+
+# the link model for each connection to a server, by the order they connect
+LinkFactory = Callable[[int], Optional[LinkModel]]
+
+
+def link_factory(args: argparse.Namespace) -> LinkFactory:
+    # a model per connection from the --link options, the last value of
+    # each repeating
+    def model(index: int) -> LinkModel:
+        def pick(values: list[Any]) -> Any:
+            return values[min(index, len(values) - 1)]
+
+        return LinkModel(
+            pick(args.link_baud),
+            pick(args.link_delay),
+            pick(args.link_buffer),
+            pick(args.link_jitter),
+            pick(args.link_drop),
+            pick(args.link_corrupt),
+            args.link_seed,
+        ).for_connection(index)
+
+    return model
+
+
+class SimulatedLink:
+    """One connection through a LinkModel. Replies queue behind each other on
+    the panel UART and are written out when they would have arrived."""
+
+    def __init__(
+        self, model: LinkModel, transport: asyncio.WriteTransport, rng: random.Random
+    ) -> None:
+        self.model = model
+        self.transport = transport
+        self.rng = rng
+        # 8N1, ten bit times per byte
+        self.byte_time = 10 / model.baudrate if model.baudrate else 0.0
+        # loop time the UART finishes sending the last reply
+        self.line_free = 0.0
+        # and the last request
+        self.request_free = 0.0
+        self.pending: asyncio.Queue[tuple[float, bytes]] = asyncio.Queue()
+        self.sender = asyncio.create_task(self.deliver())
+
+    def damage(self, data: bytes) -> bytes:
+        drop, corrupt = self.model.drop_rate, self.model.corrupt_rate
+        if not (drop or corrupt):
+            return data
+        out = bytearray()
+        for b in data:
+            r = self.rng.random()
+            if r < drop:
+                continue
+            if r < drop + corrupt:
+                b ^= 1 << self.rng.randrange(8)
+            out.append(b)
+        return bytes(out)
+
+    def receive(self, data: bytes, handle: Callable[[bytes], None]) -> None:
+        # requests cross the UART before the panel sees them
+        if not self.byte_time:
+            handle(self.damage(data))
+            return
+        loop = asyncio.get_running_loop()
+        start = max(loop.time(), self.request_free)
+        self.request_free = start + len(data) * self.byte_time
+        loop.call_at(self.request_free, lambda: handle(self.damage(data)))
+
+    def send(self, frames: list[bytes]) -> None:
+        m = self.model
+        now = asyncio.get_running_loop().time()
+        for frame in frames:
+            # the panel handles one request at a time, then sends the reply
+            start = max(now, self.line_free) + m.frame_delay
+            start += self.rng.uniform(0, m.jitter)
+            self.line_free = start + len(frame) * self.byte_time
+            self.pending.put_nowait(
+                (self.line_free + m.buffer_delay, self.damage(frame))
+            )
 
+    async def deliver(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            at, frame = await self.pending.get()
+            delay = at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.transport.write(frame)
+
+    def close(self) -> None:
+        self.sender.cancel()
+
+
+class UDLServerProtocol(asyncio.Protocol):
+    """
+    One UDL connection to a SerialWintexPanel. Bytes go from data_received
+    straight through its SerialWintex framing, the same the client and trace
+    tools use, and the replies to them out in one writelines, so a request
+    costs no awaits.
+    """
+
+    def __init__(
+        self,
+        ser: SerialWintexPanel,
+        debug: bool,
+        record: str | None = None,
+        link: LinkModel | None = None,
+        on_close: Callable[[], None] | None = None,
+    ) -> None:
+        self.ser = ser
+        self.debug = debug
+        self.record = record
+        self.link = link
+        self.on_close = on_close
+        # Assign each connection a unique number to make our debug prints easier
+        # to understand when there are multiple simultaneous connections.
+        self.ident = next(CONNECTION_COUNTER)
+        self.transport: asyncio.Transport | None = None
+        self.recorder: SessionRecorder | None = None
+        self.simulated: SimulatedLink | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self.transport = transport
+        print(f"udl_server {self.ident}: connected")
+        # one recording per connection, named after the connection number
+        if self.record:
+            self.recorder = SessionRecorder(f"{self.record}.{self.ident}.udlrec")
+        if self.link and self.link.active:
+            self.simulated = self.link.connect(transport)
+
+    def data_received(self, data: bytes) -> None:
+        if self.debug:
+            print(f"udl_server {self.ident}: received data {data!r}")
+        if self.simulated:
+            self.simulated.receive(data, self.handle)
+        else:
+            self.handle(data)
+
+    def handle(self, data: bytes) -> None:
+        assert self.transport
+        if self.transport.is_closing():
+            return  # a simulated request still on the wire at hangup
+        ser = self.ser
+        try:
+            if self.recorder:
+                self.recorder.record("tcp", data)
             ser.on_bytes(data)
-            for out in ser.outbound:
-                if debug:
-                    print(f" udl_server {ident}: sending {out!r}")
-                writer.write(out)
+            if self.debug:
+                for out in ser.outbound:
+                    print(f" udl_server {self.ident}: sending {out!r}")
+            if self.recorder:
+                for out in ser.outbound:
+                    self.recorder.record("term", out)
+            if self.simulated:
+                self.simulated.send(ser.outbound)
+            else:
+                self.transport.writelines(ser.outbound)
             del ser.outbound[:]
-
-    except Exception as exc:
-        # Unhandled exceptions will propagate into our parent and take
-        # down the whole program. If the exception is KeyboardInterrupt,
-        # that's what we want, but otherwise maybe not...
-        print(f"udl_server {ident}: crashed: {exc!r}")
-        raise
+        except Exception as exc:
+            # the transport drops just this connection, not the whole server
+            print(f"udl_server {self.ident}: crashed: {exc!r}")
+            raise
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        print(f"udl_server {self.ident}: connection closed")
+        print(f"udl_server {self.ident}: frames {self.ser.command_counts()}")
+        self.ser.commit()
+        if self.recorder:
+            self.recorder.close()
+        if self.simulated:
+            self.simulated.close()
+        if self.on_close:
+            self.on_close()
+
+
+async def start_udl_server(
+    panel: PanelDecoder,
+    debug: bool,
+    host: str | None,
+    port: int,
+    snapshots: PanelSnapshots | None = None,
+    record: str | None = None,
+    link: Union[LinkModel, LinkFactory, None] = None,
+) -> asyncio.Server:
+    """Serve panel over UDL on host:port until the returned server is closed.
+    Connections go through link, either one LinkModel each connection gets a
+    copy of (with its own faults) or a factory giving the model for each."""
+    connections = count()
+
+    def connection() -> UDLServerProtocol:
+        ser = SerialWintexPanel(panel, snapshots, direction="tcp")
+        index = next(connections)
+        model: LinkModel | None
+        if isinstance(link, LinkModel):
+            model = link.for_connection(index)
+        else:
+            model = link(index) if link else None
+        return UDLServerProtocol(ser, debug, record, model)
+
+    loop = asyncio.get_running_loop()
+    return await loop.create_server(connection, host, port)
+
+
+class PanelDirectory:
+    """
+    The memfiles in a directory, served as many virtual panels.
+
+    Only the small header of each file is read up front, to index panels by
+    UDL password (or the file name, if the panel has none stored). Panels
+    are loaded on first connect and at most max_resident idle panels are
+    kept in memory, least recently used going first. A panel that has been
+    written to is saved back to its file when it is evicted.
+    """
+
+    def __init__(self, path: str, max_resident: int = 32):
+        self.max_resident = max_resident
+        self.files: dict[str, str] = {}
+        self.passwords: dict[str, str] = {}
+        for fn in sorted(glob.glob(os.path.join(path, "*"))):
+            try:
+                banner, serial, udlpasswd = panel_header_from_file(fn)
+            except Exception:
+                continue  # not a memfile
+            name = os.path.splitext(os.path.basename(fn))[0]
+            self.files[name] = fn
+            login = udlpasswd or name
+            if login in self.passwords:
+                print(
+                    f"Warning: {name} has the same UDL login as"
+                    f" {self.passwords[login]}, only reachable with --port-per-panel"
+                )
+                continue
+            self.passwords[login] = name
+        self.resident: OrderedDict[str, PanelDecoder] = OrderedDict()
+        self.users: Counter[str] = Counter()
+        self.dirty: set[str] = set()
+        self.loads = 0
+
+    def by_password(self, login: str) -> str | None:
+        return self.passwords.get(login)
+
+    def acquire(self, name: str) -> PanelDecoder:
+        if name not in self.resident:
+            # quietly, a lazy load is routine for a directory of panels
+            self.resident[name] = panel_from_file(
+                self.files[name], log=lambda msg: None
+            )
+            self.loads += 1
+        self.resident.move_to_end(name)
+        self.users[name] += 1
+        self.evict()
+        return self.resident[name]
+
+    def release(self, name: str) -> None:
+        self.users[name] -= 1
+        self.evict()
+
+    def evict(self) -> None:
+        # panels with a connection open stay, so never two copies of one panel
+        idle = [n for n in self.resident if self.users[n] <= 0]
+        while idle and len(self.resident) > self.max_resident:
+            name = idle.pop(0)
+            self.save(name)
+            del self.resident[name]
+
+    def save(self, name: str) -> None:
+        if name in self.dirty:
+            self.resident[name].save(self.files[name])
+            self.dirty.discard(name)
+
+    def save_all(self) -> None:
+        for name in list(self.dirty):
+            self.save(name)
+
+
+class DirectoryWintexPanel(SerialWintexPanel):
+    """
+    SerialWintexPanel for one connection to a PanelDirectory. With a name
+    the panel is fixed, as when each panel has its own port. Otherwise the
+    panel is chosen by the UDL password at login, and unknown passwords go
+    unanswered, like a real panel.
+    """
+
+    def __init__(
+        self, directory: PanelDirectory, name: str | None = None, **kwargs: Any
+    ) -> None:
+        # stands in until a panel is chosen at login
+        super().__init__(PanelDecoder(" " * 20, 0, 0), **kwargs)
+        self.directory = directory
+        self.name: str | None = None
+        if name:
+            self.select(name)
+
+    def select(self, name: str) -> None:
+        self.release()
+        self.panel = self.directory.acquire(name)
+        self.name = name
+
+    def release(self) -> None:
+        if self.name:
+            self.directory.release(self.name)
+            self.name = None
+
+    def login(self, body: bytes) -> bytes | None:
+        if len(body) and not self.name:
+            name = self.directory.by_password(bytes(body).decode())
+            if name is None:
+                print(f"No panel with UDL login '{bytes(body).decode()}'")
+                return None
+            self.select(name)
+        return super().login(body)
+
+    def config_write(self, body: bytes) -> bytes | None:
+        if self.name:
+            self.directory.dirty.add(self.name)
+        return super().config_write(body)
+
+    def live_state_write(self, body: bytes) -> bytes | None:
+        if self.name:
+            self.directory.dirty.add(self.name)
+        return super().live_state_write(body)
+
+
+def directory_connection(
+    directory: PanelDirectory, name: str | None, debug: bool
+) -> UDLServerProtocol:
+    ser = DirectoryWintexPanel(directory, name, direction="tcp")
+    return UDLServerProtocol(ser, debug, on_close=ser.release)
+
+
+async def serve_directory(
+    directory: PanelDirectory,
+    port: int,
+    per_port: bool,
+    debug: bool,
+    host: str | None = None,
+) -> list[asyncio.Server]:
+    # one port choosing the panel by password, or one port per panel from 'port'
+    loop = asyncio.get_running_loop()
+    if not per_port:
+        server = await loop.create_server(
+            partial(directory_connection, directory, None, debug), host, port
+        )
+        return [server]
+    servers = []
+    for i, name in enumerate(directory.files):
+        server = await loop.create_server(
+            partial(directory_connection, directory, name, debug), host, port + i
+        )
+        servers.append(server)
+    return servers
 
 
 async def main() -> None:
     args = parser.parse_args()
 
+    if args.mem_dir:
+        directory = PanelDirectory(args.mem_dir, args.max_resident)
+        servers = await serve_directory(
+            directory, args.udl_port, args.port_per_panel, args.debug
+        )
+        print(f"Serving {len(directory.files)} panels from {args.mem_dir}")
+        for name, fn in directory.files.items():
+            print(f"  {name}: {fn}")
+        try:
+            await interactive_shell(None, directory=directory, servers=servers)
+        finally:
+            directory.save_all()
+        return
+
     panel: PanelDecoder
-    if args.mem:
+    image = None
+    if args.image and os.path.exists(args.image):
+        print(f"Mapping {args.image}")
+        image = PanelImage(args.image)
+        panel = image.panel
+    elif args.mem:
         print(f"Reading from {args.mem}")
         panel = panel_from_file(args.mem)
     elif args.banner:
@@ -240,24 +743,55 @@ async def main() -> None:
         panel = get_panel_decoder(args.banner)
     else:
         raise ValueError("Supply panel banner or file!")
+    if args.image and image is None:
+        create_image(panel, args.image)
+        image = PanelImage(args.image)
+        panel = image.panel
 
     print(
         f"Panel type '{panel}' with UDL password {args.udl_password} backed by file {args.mem}"
     )
 
-    server = await asyncio.start_server(
-        partial(udl_server, panel, args.debug), None, args.udl_port
+    # the web interface decodes committed generations, never a half applied batch
+    snapshots = PanelSnapshots(panel, image)
+    server = await start_udl_server(
+        panel,
+        args.debug,
+        None,
+        args.udl_port,
+        snapshots=snapshots,
+        record=args.record,
+        link=link_factory(args),
     )
     addrs = ", ".join(str(sock.getsockname()) for sock in server.sockets)
     print(f"Serving UDL on {addrs}")
 
     if args.web_port > 0:
-        await start_server(panel, args.web_port)
+        await start_server(panel, args.web_port, snapshots)
+
+    generator = None
+    if args.events > 0 or args.events_script:
+        generator = EventGenerator(
+            panel,
+            zones=panel.zones if isinstance(panel, WintexEliteDecoder) else 0,
+            rate=args.events,
+            script=load_script(args.events_script) if args.events_script else None,
+            seed=args.events_seed,
+            snapshots=snapshots,
+            callback=print if args.debug else None,
+        )
+        events = asyncio.create_task(generator.run())
 
     try:
-        await interactive_shell(panel, server=server)
+        await interactive_shell(panel, server=server, generator=generator)
     except Exception as e:
         print(e)
+    finally:
+        if generator:
+            events.cancel()
+        if image:
+            image.close()
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,43 +1,74 @@
 import argparse
 import json
 import os
-from typing import Any
+from typing import Any, Optional
 
 import aiohttp_jinja2
 import jinja2
 from aiohttp import web
 
 from . import DEFAULT_MEMFILE
+from .eventlog import EventQuery, LogIndex, LogStore, decode_log, query_events
 from .hexdump import hexdump
+from .image import PanelImage
 from .pialarm import PanelDecoder, get_panel_decoder, panel_from_file
+from .snapshot import SnapshotSource
+
+
+def current_panel(request: web.Request) -> PanelDecoder:
+    # the last committed generation when the emulator is publishing snapshots
+    snapshots: Optional[SnapshotSource] = request.app["snapshots"]
+    if snapshots:
+        return snapshots.snapshot()
+    panel: PanelDecoder = request.app["panel"]
+    return panel
 
 
 @aiohttp_jinja2.template("config.jinja2")
 async def handle_config(request: web.Request) -> Any:
-    panel = request.app["panel"]
+    panel = current_panel(request)
     return {"panel": panel.decode()}
 
 
 async def handle_json_raw(request: web.Request) -> Any:
-    panel = request.app["panel"]
+    panel = current_panel(request)
     text = json.dumps(panel.decode(), indent=4)
     return web.Response(text=text)
 
 
 @aiohttp_jinja2.template("json.jinja2")
 async def handle_json(request: web.Request) -> Any:
-    panel = request.app["panel"]
+    panel = current_panel(request)
     text = json.dumps(panel.decode(), indent=4)
     return {"json": text}
 
 
+async def handle_log(request: web.Request) -> Any:
+    # events from the log store if there is one, else the ring in panel memory
+    try:
+        query = EventQuery.from_params(request.query)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    index: Optional[LogIndex] = request.app["logindex"]
+    if index:
+        events = index.refresh().query(query)
+    else:
+        events = query_events(decode_log(current_panel(request).get_mem()), query)
+    text = json.dumps([e.as_dict() for e in events], indent=4)
+    return web.Response(text=text)
+
+
 @aiohttp_jinja2.template("memory.jinja2")
 async def handle_memory(request: web.Request) -> Any:
-    panel = request.app["panel"]
+    panel = current_panel(request)
     return {"memory": hexdump(panel.get_mem()), "io": hexdump(panel.get_io())}
 
 
-def get_web_app(panel: PanelDecoder) -> web.Application:
+def get_web_app(
+    panel: PanelDecoder,
+    log_store: Optional[LogStore] = None,
+    snapshots: Optional[SnapshotSource] = None,
+) -> web.Application:
     app = web.Application()
     loader = jinja2.PackageLoader("pytexalarm")
     aiohttp_jinja2.setup(app, loader=loader)
@@ -50,16 +81,21 @@ def get_web_app(panel: PanelDecoder) -> web.Application:
             web.get("/", handle_config),
             web.get("/json", handle_json),
             web.get("/memory", handle_memory),
+            web.get("/log", handle_log),
             web.static("/static", static_dir, show_index=True),
         ]
     )
 
     app["panel"] = panel
+    app["snapshots"] = snapshots
+    app["logindex"] = LogIndex(log_store).load() if log_store else None
     return app
 
 
-async def start_server(panel: PanelDecoder, web_port: int) -> web.AppRunner:
-    app = get_web_app(panel)
+async def start_server(
+    panel: PanelDecoder, web_port: int, snapshots: Optional[SnapshotSource] = None
+) -> web.AppRunner:
+    app = get_web_app(panel, snapshots=snapshots)
 
     runner = web.AppRunner(app)
     await runner.setup()
@@ -75,14 +111,25 @@ if __name__ == "__main__":
     )
     parser.add_argument("--mem", help="read saved panel file", default=DEFAULT_MEMFILE)
     parser.add_argument("--banner", help="empty panel from banner")
+    parser.add_argument("--log", help="event log store from udlclient --log")
+    parser.add_argument(
+        "--image", help="live view of a panel image served by udlserver --image"
+    )
     args = parser.parse_args()
 
     panel: PanelDecoder
-    if args.mem:
+    snapshots: Optional[SnapshotSource] = None
+    if args.image:
+        # decode what udlserver last committed, not the live mapping
+        image = PanelImage(args.image, readonly=True)
+        panel = image.panel
+        snapshots = image
+    elif args.mem:
         panel = panel_from_file(args.mem)
     elif args.banner:
         panel = get_panel_decoder(args.banner)
     else:
         panel = get_panel_decoder("Elite 24")
 
-    web.run_app(get_web_app(panel))
+    log_store = LogStore(args.log) if args.log else None
+    web.run_app(get_web_app(panel, log_store, snapshots))
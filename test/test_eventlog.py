@@ -0,0 +1,204 @@
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import pytest
+
+from pytexalarm.eventlog import (
+    INDEX_BLOCK,
+    LOG_BASE,
+    LOG_POINTER,
+    LOG_SLOTS,
+    EventQuery,
+    LogIndex,
+    LogStore,
+    decode_log,
+    fetch_log,
+    pack_log_time,
+    query_events,
+    unpack_log_time,
+)
+from pytexalarm.paged import PanelMemory
+from pytexalarm.pialarm import PanelDecoder, get_panel_decoder
+from pytexalarm.trace_uart import panel_from_ser2net_trace
+from pytexalarm.udl import PageCallback
+
+
+class MemClient:
+    # serves reads from a panel image and counts the bytes asked for
+    def __init__(self, mem: PanelMemory):
+        self.mem = mem
+        self.read_size = 64
+        self.nbytes = 0
+
+    async def read_mem(self, base: int, sz: int) -> bytes:
+        self.nbytes += sz
+        return bytes(self.mem[base : base + sz])
+
+    async def write_mem(self, base: int, data: bytes) -> None:
+        self.mem[base : base + len(data)] = data
+
+    async def read_io(self, base: int, sz: int) -> bytes:
+        return bytes(sz)
+
+    async def read_identification(self) -> str:
+        return "Elite 24    V4.02.01"
+
+    async def read_ranges(
+        self, ranges: list[Tuple[int, int]], on_page: Optional[PageCallback] = None
+    ) -> list[bytes]:
+        pages = [await self.read_mem(base, sz) for base, sz in ranges]
+        for (base, _), bs in zip(ranges, pages):
+            if on_page:
+                on_page(base, bs)
+        return pages
+
+
+def write_events(mem: PanelMemory, first: int, count: int) -> None:
+    ptr = int.from_bytes(mem[LOG_POINTER : LOG_POINTER + 2], "little")
+    for n in range(first, first + count):
+        base = LOG_BASE + ptr * 8
+        mem[base : base + 8] = bytes([0x44, 0x8B, n % 256, 0]) + n.to_bytes(4, "little")
+        ptr = (ptr + 1) % LOG_SLOTS
+    mem[LOG_POINTER : LOG_POINTER + 2] = ptr.to_bytes(2, "little")
+
+
+@pytest.mark.asyncio
+async def test_fetch_log(tmp_path: str) -> None:
+    source: PanelDecoder = get_panel_decoder("Elite 24")
+    panel = get_panel_decoder("Elite 24")
+    client = MemClient(source.mem)
+    store = LogStore(f"{tmp_path}/panel.log")
+
+    write_events(source.mem, 0, 490)
+    assert await fetch_log(panel, client, store) == 490
+    assert client.nbytes == 2 + LOG_SLOTS * 8
+
+    # steady state only reads the pointer
+    client.nbytes = 0
+    assert await fetch_log(panel, client, store) == 0
+    assert client.nbytes == 2
+
+    # new records wrap around the end of the ring, read along with the last
+    # one stored to check it is still there
+    write_events(source.mem, 490, 15)
+    client.nbytes = 0
+    assert await fetch_log(panel, client, store) == 15
+    assert client.nbytes == 2 + 16 * 8
+    assert store.next_slot() == 5
+
+    stored = list(store)
+    assert len(stored) == 505
+    assert [int.from_bytes(r[4:], "little") for _, r in stored] == list(range(505))
+    assert (
+        panel.mem[LOG_BASE : LOG_BASE + 4000] == source.mem[LOG_BASE : LOG_BASE + 4000]
+    )
+
+
+@pytest.mark.asyncio
+async def test_fetch_empty_log(tmp_path: str) -> None:
+    source: PanelDecoder = get_panel_decoder("Elite 24")
+    panel = get_panel_decoder("Elite 24")
+    client = MemClient(source.mem)
+    store = LogStore(f"{tmp_path}/panel.log")
+    source.mem[LOG_POINTER : LOG_POINTER + 2] = (7).to_bytes(2, "little")
+    assert await fetch_log(panel, client, store) == 0
+    assert client.nbytes == 2 + LOG_SLOTS * 8
+
+    # no records stored, yet the ring isn't read again
+    client.nbytes = 0
+    assert await fetch_log(panel, client, store) == 0
+    assert client.nbytes == 2
+    write_events(source.mem, 0, 3)
+    assert await fetch_log(panel, client, store) == 3
+    assert [slot for slot, _ in store] == [7, 8, 9]
+    assert store.next_slot() == 10
+
+
+@pytest.mark.asyncio
+async def test_fetch_log_lost(tmp_path: str) -> None:
+    source: PanelDecoder = get_panel_decoder("Elite 24")
+    panel = get_panel_decoder("Elite 24")
+    logged: list[str] = []
+    panel.log = logged.append
+    client = MemClient(source.mem)
+    store = LogStore(f"{tmp_path}/panel.log")
+    write_events(source.mem, 0, 10)
+    assert await fetch_log(panel, client, store) == 10
+
+    # more than a ring written since, what is left of them is stored
+    write_events(source.mem, 10, LOG_SLOTS + 20)
+    assert await fetch_log(panel, client, store) == LOG_SLOTS
+    assert "Records may be missing" in logged[-2]
+    numbers = [int.from_bytes(r[4:], "little") for _, r in store]
+    assert numbers == list(range(10)) + list(range(30, LOG_SLOTS + 30))
+
+    # cleared, with the pointer back at the start
+    source.mem[LOG_BASE : LOG_BASE + LOG_SLOTS * 8] = bytes(LOG_SLOTS * 8)
+    source.mem[LOG_POINTER : LOG_POINTER + 2] = bytes(2)
+    write_events(source.mem, 1000, 3)
+    assert await fetch_log(panel, client, store) == 3
+    assert [slot for slot, _ in store][-3:] == [0, 1, 2]
+
+    # and cleared again, leaving nothing to store, is only warned about once
+    source.mem[LOG_BASE : LOG_BASE + LOG_SLOTS * 8] = bytes(LOG_SLOTS * 8)
+    source.mem[LOG_POINTER : LOG_POINTER + 2] = (7).to_bytes(2, "little")
+    warnings = len([m for m in logged if "missing" in m])
+    assert await fetch_log(panel, client, store) == 0
+    write_events(source.mem, 2000, 2)
+    assert await fetch_log(panel, client, store) == 2
+    assert [slot for slot, _ in store][-2:] == [7, 8]
+    assert len([m for m in logged if "missing" in m]) == warnings + 1
+
+
+def test_decode_log() -> None:
+    with open("protocol/wintex-ser2net/log-recv.trace", "r") as r:
+        panel = panel_from_ser2net_trace(r)
+    assert panel is not None
+    events = decode_log(panel.mem)
+    assert len(events) == LOG_SLOTS
+    # oldest record is the one the pointer (0xf9) will overwrite next
+    assert events[0].slot == 249
+    assert events[-1].slot == 248
+    assert events[-1].as_dict()["parameter"] == 1
+
+    t = datetime(2018, 7, 31, 10, 38, 8)
+    assert unpack_log_time(pack_log_time(t)) == t
+    assert pack_log_time(t) < pack_log_time(t + timedelta(seconds=1))
+
+
+def test_log_index(tmp_path: str) -> None:
+    rnd = random.Random(0)
+    store = LogStore(f"{tmp_path}/panel.log")
+    t = datetime(2025, 1, 1)
+    entries = []
+    for n in range(1000):
+        t += timedelta(minutes=rnd.randrange(1, 120))
+        record = bytes(
+            [rnd.choice([1, 2, 31, 37]), 0, rnd.randrange(1, 25), 1 << rnd.randrange(2)]
+        )
+        entries.append((n % LOG_SLOTS, record + pack_log_time(t).to_bytes(4, "little")))
+    store.append(entries)
+
+    index = LogIndex(store).load()
+    assert len(index.blocks) == 1000 // INDEX_BLOCK
+    assert os.path.getsize(index.filename) > 0
+    everything = index.decode_range(0, index.count)
+
+    week = pack_log_time(t - timedelta(days=7))
+    queries = [
+        EventQuery(),
+        EventQuery(start=week, events=frozenset([1, 2]), parameter=5),
+        EventQuery.from_params(
+            {"start": "2025-01-10", "end": "2025-01-20", "areas": "2"}
+        ),
+    ]
+    for q in queries:
+        assert index.query(q) == query_events(everything, q)
+
+    # reopening uses the saved summaries, and picks up appended records
+    store.append(entries[0:100])
+    again = LogIndex(store).load()
+    assert again.blocks[:15] == index.blocks
+    assert len(again.query(EventQuery())) == 1100
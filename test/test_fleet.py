@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+from typing import Any
+
+import pytest
+
+from pytexalarm.fleet import load_inventory, sync_fleet
+from pytexalarm.pialarm import (
+    UDLTopics,
+    WintexEliteDecoder,
+    get_panel_decoder,
+    panel_from_file,
+)
+from pytexalarm.udlserver import start_udl_server
+
+
+@pytest.mark.asyncio
+async def test_sync_fleet(tmp_path: str, capsys: Any) -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    assert isinstance(panel, WintexEliteDecoder)
+    panel.mem[:] = bytes(i % 251 for i in range(len(panel.mem)))
+    server = await start_udl_server(panel, False, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        # a closed port stands in for an unreachable panel
+        refused = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        dead = refused.sockets[0].getsockname()[1]
+        refused.close()
+        await refused.wait_closed()
+
+        inventory = os.path.join(tmp_path, "inventory.json")
+        panels = [
+            {"name": f"p{i}", "host": "127.0.0.1", "port": port, "password": "1234"}
+            for i in range(3)
+        ]
+        panels[0]["topics"] = ["ZONES", "USERS"]
+        panels.append({"name": "gone", "host": "127.0.0.1", "port": dead})
+        panels[3]["password"] = "1234"
+        for p in panels:
+            p["delay"] = 0
+        with open(inventory, "w") as f:
+            json.dump(panels, f)
+
+        specs = load_inventory(inventory)
+        assert specs[0].topics == UDLTopics.ZONES | UDLTopics.USERS
+        results = await sync_fleet(specs, str(tmp_path), concurrency=2)
+        # concurrent sessions print no progress of their own by default
+        out = capsys.readouterr().out
+        assert "UDL reading" not in out and "wrote to" not in out
+        # or tag each line with its panel
+        await sync_fleet(specs[1:3], str(tmp_path), verbose=True)
+        lines = capsys.readouterr().out.splitlines()
+        progress = [ln for ln in lines if "UDL reading" in ln or "wrote to" in ln]
+        assert progress
+        assert all(ln.startswith(("[p1] ", "[p2] ")) for ln in progress)
+    finally:
+        server.close()
+
+    assert [r.name for r in results] == ["p0", "p1", "p2", "gone"]
+    assert [r.ok for r in results] == [True, True, True, False]
+    assert "ConnectionRefusedError" in results[3].error
+    assert results[0].frames < results[1].frames
+    saved = panel_from_file(results[1].mem)
+    assert saved.banner == panel.banner
+    for base, sz in panel.udl_read_plan(UDLTopics.ALL):
+        assert saved.mem[base : base + sz] == panel.mem[base : base + sz]
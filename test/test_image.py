@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from pytexalarm.image import PanelImage, create_image
+from pytexalarm.pialarm import get_panel_decoder, panel_from_file
+from pytexalarm.snapshot import PanelSnapshots
+from pytexalarm.udl import udl_frame
+from pytexalarm.udlserver import SerialWintexPanel
+
+
+def test_image(tmp_path: str) -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.udlpasswd = "1234"
+    panel.mem[0x5400:0x5408] = b"Kitchen "
+    panel.io[0x1196:0x11A6] = b"Hello world     "
+    filename = os.path.join(tmp_path, "panel.img")
+    create_image(panel, filename)
+
+    image = PanelImage(filename)
+    viewer = PanelImage(filename, readonly=True)
+    try:
+        assert image.panel.banner == panel.banner
+        assert image.panel.udlpasswd == "1234"
+        assert image.panel.decode() == panel.decode()
+
+        # emulator writes are visible to another mapping straight away, but
+        # snapshot readers only see them once committed
+        ser = SerialWintexPanel(image.panel, PanelSnapshots(image.panel, image))
+        ser.on_bytes(udl_frame(b"I\x00\x54\x00\x04Hall"))
+        assert ser.outbound == [udl_frame(b"\x06")]
+        assert viewer.panel.decode()["zones"][0]["name"] == "Hallhen "
+        before = viewer.snapshot()
+        assert before.decode()["zones"][0]["name"] == "Kitchen "
+        assert viewer.snapshot() is before
+        ser.commit()
+        after = viewer.snapshot()
+        assert after.decode()["zones"][0]["name"] == "Hallhen "
+        assert after.decode()["virtualkeypad"]["screen"] == "Hello world     "
+        with pytest.raises(TypeError):
+            viewer.panel.mem[0:1] = b"\x01"
+
+        # Wintex writes past the end of io, what fits is kept
+        ser.on_bytes(udl_frame(b"W\x00\x30\x69\x02ab"))
+        ser.on_bytes(udl_frame(b"W\x00\x1f\xfe\x04abcd"))
+        assert ser.outbound[1:] == [udl_frame(b"\x06")] * 2
+        assert viewer.panel.io[0x1FFE:] == b"ab"
+
+        # and still save to a memfile
+        image.panel.save(os.path.join(tmp_path, "panel.cfg"))
+        saved = panel_from_file(os.path.join(tmp_path, "panel.cfg"))
+        assert saved.mem[0x5400:0x5408] == b"Hallhen "
+    finally:
+        image.close()
+        viewer.close()
+
+    # the writes are in the file without any save, along with which bytes
+    # the emulator has seen written
+    reopened = PanelImage(filename)
+    assert reopened.panel.mem[0x5400:0x5408] == b"Hallhen "
+    assert reopened.panel.mem_valid.ranges() == [(0x5400, 4)]
+    assert reopened.panel.io_valid.ranges() == [(0x1FFE, 2)]
+    reopened.close()
+
+
+def test_image_fields(tmp_path: str) -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.udlpasswd = "x" * 33
+    with pytest.raises(ValueError):
+        create_image(panel, os.path.join(tmp_path, "panel.img"))
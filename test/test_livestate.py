@@ -0,0 +1,47 @@
+import pytest
+
+from pytexalarm.livestate import ChangeEvent, LivePoller
+from pytexalarm.pialarm import get_panel_decoder
+from pytexalarm.schema import Field
+from pytexalarm.udlclient import AsyncioUDLClient
+from pytexalarm.udlserver import start_udl_server
+
+
+@pytest.mark.asyncio
+async def test_live_poller() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.io[0x1196 : 0x1196 + 16] = b"System Alerts!  "
+    server = await start_udl_server(panel, False, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = await AsyncioUDLClient.create("127.0.0.1", "1234", port, stupid_delay=0)
+
+    local = get_panel_decoder(panel.banner)
+    events: list[ChangeEvent] = []
+    zone = Field("zone1", 0x0300, type="hex")
+    poller = LivePoller(local, client, events.append, fields=[zone], max_interval=2)
+    try:
+        # the keypad fields are read together, as Wintex reads 0x22 bytes
+        assert [(r.base, r.sz) for r in poller.ranges] == [(0x0300, 1)]
+        poller = LivePoller(local, client, events.append, max_interval=2)
+        assert [(r.base, r.sz) for r in poller.ranges] == [(0x1196, 0x22)]
+        keypad = poller.ranges[0]
+
+        assert await poller.poll(keypad) == []
+        assert local.io[0x1196:0x11A6] == b"System Alerts!  "
+        for _ in range(5):
+            assert await poller.poll(keypad) == []
+        quiet = keypad.interval
+        assert quiet > poller.min_interval
+
+        panel.io[0x1196 : 0x1196 + 16] = b"Zone 001 Tamper "
+        panel.io[0x11B7] = 0x04
+        changes = await poller.poll(keypad)
+        assert [(e.field, e.old, e.new) for e in changes] == [
+            ("screen", "System Alerts!  ", "Zone 001 Tamper "),
+            ("leds", 0, 4),
+        ]
+        assert events == changes
+        assert keypad.interval < quiet
+    finally:
+        await client.close()
+        server.close()
@@ -0,0 +1,130 @@
+import os
+import pickle
+import struct
+import zlib
+
+import pytest
+
+from pytexalarm.memfile import ENTRY, FILE_MAGIC, HEADER, LEGACY_VERSION, RANGE
+from pytexalarm.paged import PAGE_SIZE
+from pytexalarm.pialarm import (
+    UDLTopics,
+    get_panel_decoder,
+    panel_from_file,
+    panel_header_from_file,
+)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(tmp_path: str, compress: bool) -> None:
+    fn = os.path.join(tmp_path, "panel.cfg")
+    panel = get_panel_decoder("Unknown 640")
+    panel.serial = "1079471"
+    panel.udlpasswd = "1234"
+    panel.mem[0x5400:0x5410] = b"ZOME001abcdefghi"
+    panel.mark_known(0x5400, 0x300)
+    panel.io[0x1196:0x11A6] = b"System Alerts!  "
+    panel.save(fn, compress=compress)
+
+    # only the two populated pages are stored, of 0x80000 + 0x20000 bytes
+    assert os.path.getsize(fn) < 3 * PAGE_SIZE
+    assert panel_header_from_file(fn) == ("Unknown 640", "1079471", "1234")
+    loaded = panel_from_file(fn)
+    assert loaded.mem == panel.mem
+    assert loaded.io == panel.io
+    # validity is kept to the byte
+    assert loaded.mem_valid.ranges() == [(0x5400, 0x300)]
+    assert loaded.io_valid.ranges() == []
+
+
+def test_unknown_ranges_saved(tmp_path: str) -> None:
+    fn = os.path.join(tmp_path, "panel.cfg")
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    for base, sz in panel.udl_reads_for(UDLTopics.ZONES):
+        panel.mem[base : base + sz] = bytes([1]) * sz
+        panel.mark_known(base, sz)
+    unknown = panel.unknown_ranges(UDLTopics.ALL)
+    assert unknown
+    panel.save(fn)
+    loaded = panel_from_file(fn)
+    # what was never read is still to be read, though it shares pages
+    assert loaded.unknown_ranges(UDLTopics.ALL) == unknown
+    assert loaded.unknown_ranges(UDLTopics.ZONES) == []
+
+
+def test_migrate_version1(tmp_path: str) -> None:
+    fn = os.path.join(tmp_path, "old.cfg")
+    mem = bytearray(0x8000)
+    mem[0x5400:0x5410] = b"ZOME001abcdefghi"
+    with open(fn, "wb") as f:
+        f.write(FILE_MAGIC)
+        f.write(LEGACY_VERSION)
+        for v in ("Elite 24    V4.02.01", "1079471", "1234", mem, bytearray(0x2000)):
+            pickle.dump(v, f, pickle.HIGHEST_PROTOCOL)
+
+    assert panel_header_from_file(fn) == ("Elite 24    V4.02.01", "1079471", "1234")
+    loaded = panel_from_file(fn)
+    assert loaded.mem == mem
+    # what was read isn't recorded in version 1, so populated pages stand in
+    assert loaded.mem_valid.ranges() == [(0x5400, 0x400)]
+    # loading leaves the file alone, unless asked to migrate it
+    with open(fn, "rb") as f:
+        assert f.read(len(FILE_MAGIC) + 1) == FILE_MAGIC + LEGACY_VERSION
+    panel_from_file(fn, migrate=True)
+    with open(fn, "rb") as f:
+        assert f.read(len(FILE_MAGIC) + 1) == FILE_MAGIC + b"2"
+    assert panel_from_file(fn).mem == mem
+
+
+def test_header_fields_checked(tmp_path: str) -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.udlpasswd = "x" * 33
+    with pytest.raises(ValueError, match="udlpasswd"):
+        panel.save(os.path.join(tmp_path, "panel.cfg"))
+
+
+def corrupt(fn: str, offset: int, s: struct.Struct, *values: int) -> None:
+    with open(fn, "r+b") as f:
+        f.seek(offset)
+        f.write(s.pack(*values))
+
+
+def test_read_memfile_checked(tmp_path: str) -> None:
+    fn = os.path.join(tmp_path, "panel.cfg")
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.mem[0x5400:0x5410] = b"ZOME001abcdefghi"
+    panel.mark_known(0x5400, 0x10)
+    panel.save(fn, compress=True)
+    size = os.path.getsize(fn)
+    entry = len(FILE_MAGIC) + 1 + HEADER.size
+    _, flags, p, offset, length = read_entry(fn, entry)
+    ranges = entry + ENTRY.size
+    mem_size = len(panel.mem)
+
+    bad: dict[str, tuple[int, struct.Struct, tuple[int, ...]]] = {
+        "outside region": (entry, ENTRY, (2, flags, p, offset, length)),
+        "page 9999 outside": (entry, ENTRY, (0, flags, 9999, offset, length)),
+        "truncated": (entry, ENTRY, (0, flags, p, size, length)),
+        "corrupt": (entry, ENTRY, (0, flags, p, offset + 1, length - 1)),
+        "range": (ranges, RANGE, (0, mem_size - 4, 0x10)),
+    }
+    for match, (at, s, values) in bad.items():
+        panel.save(fn, compress=True)
+        corrupt(fn, at, s, *values)
+        with pytest.raises(ValueError, match=match):
+            panel_from_file(fn)
+
+    # a page that inflates past its size is refused, not decompressed
+    panel.save(fn, compress=True)
+    bomb = zlib.compress(bytes(64 * PAGE_SIZE))
+    with open(fn, "ab") as f:
+        f.write(bomb)
+    corrupt(fn, entry, ENTRY, 0, flags, p, size, len(bomb))
+    with pytest.raises(ValueError, match="corrupt"):
+        panel_from_file(fn)
+
+
+def read_entry(fn: str, at: int) -> tuple[int, ...]:
+    with open(fn, "rb") as f:
+        f.seek(at)
+        return tuple(ENTRY.unpack(f.read(ENTRY.size)))
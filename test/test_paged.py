@@ -0,0 +1,110 @@
+import pytest
+
+from pytexalarm.paged import PAGE_SIZE, PagedMemory, ValidRanges
+from pytexalarm.pialarm import UDLTopics, WintexEliteDecoder, get_panel_decoder
+from pytexalarm.udl import udl_frame
+from pytexalarm.udlclient import AsyncioUDLClient
+from pytexalarm.udlserver import SerialWintexPanel, start_udl_server
+
+
+def test_paged_memory() -> None:
+    mem = PagedMemory(0x80000)
+    assert len(mem) == 0x80000
+    assert mem[0x1000:0x1004] == b"\0\0\0\0"
+    mem[0x10000:0x10000] = b""
+    mem[PAGE_SIZE - 2 : PAGE_SIZE + 2] = b"abcd"
+    mem[0x7FFFF] = 7
+    assert mem.allocated() == 3 * PAGE_SIZE
+    assert mem[PAGE_SIZE - 3 : PAGE_SIZE + 3] == b"\0abcd\0"
+    assert mem[PAGE_SIZE] == ord("c")
+    assert mem[-1] == 7
+    # zeros written over untouched pages need no page
+    mem[0x20000:0x20400] = bytes(0x400)
+    assert mem.allocated() == 3 * PAGE_SIZE
+    assert bytes(mem)[PAGE_SIZE - 2 : PAGE_SIZE + 2] == b"abcd"
+    with pytest.raises(ValueError):
+        mem[0:4] = b"ab"
+    with pytest.raises(IndexError):
+        mem[0x80000]
+    assert list(mem)[PAGE_SIZE - 1 : PAGE_SIZE + 1] == [ord("b"), ord("c")]
+
+
+def test_paged_memory_shared_pages() -> None:
+    # pages handed in as bytes are copied on first write, not changed
+    shared = bytes(PAGE_SIZE)
+    mem = PagedMemory(PAGE_SIZE + 10, {0: shared})
+    assert mem.page_size(1) == 10
+    mem[2] = 9
+    assert mem[0:4] == b"\0\0\t\0"
+    assert shared == bytes(PAGE_SIZE)
+    mem[PAGE_SIZE + 8 :] = b"xy"
+    assert bytes(mem)[-3:] == b"\0xy"
+
+
+def test_valid_ranges() -> None:
+    valid = ValidRanges()
+    valid.add(100, 10)
+    valid.add(200, 10)
+    valid.add(110, 5)  # adjacent, joins the first
+    assert valid.ranges() == [(100, 15), (200, 10)]
+    assert valid.missing([(90, 130)]) == [(90, 10), (115, 85), (210, 10)]
+    assert valid.missing([(102, 5), (205, 2)]) == []
+    assert valid.covers(100, 15) and not valid.covers(100, 16)
+    valid.add(105, 100)  # spans both
+    assert valid.ranges() == [(100, 110)]
+    assert len(valid) == 110
+
+
+def test_valid_bitmap() -> None:
+    valid = ValidRanges()
+    valid.add(0, 3)
+    valid.add(9, 8)
+    valid.add(30, 2)
+    bitmap = valid.to_bitmap(32)
+    assert bitmap == b"\x07\xfe\x01\xc0"
+    assert ValidRanges.from_bitmap(bitmap).ranges() == valid.ranges()
+    assert ValidRanges.from_bitmap(ValidRanges().to_bitmap(32)).ranges() == []
+
+
+def test_write_past_end() -> None:
+    # Wintex writes io at 0x3069, past the 0x2000 of an Elite 24
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    ser = SerialWintexPanel(panel)
+    ser.on_bytes(udl_frame(b"W\x00\x30\x69\x02ab"))
+    ser.on_bytes(udl_frame(b"W\x00\x1f\xfe\x04abcd"))
+    ser.on_bytes(udl_frame(b"R\x00\x1f\xfe\x04"))
+    assert ser.outbound == [
+        udl_frame(b"\x06"),
+        udl_frame(b"\x06"),
+        udl_frame(b"W\x00\x1f\xfe\x04ab"),
+    ]
+    assert panel.io_valid.ranges() == [(0x1FFE, 2)]
+
+
+@pytest.mark.asyncio
+async def test_read_unknown() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.mem[:] = bytes(i % 251 for i in range(len(panel.mem)))
+    server = await start_udl_server(panel, False, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = await AsyncioUDLClient.create("127.0.0.1", "1234", port, stupid_delay=0)
+    local = get_panel_decoder(panel.banner)
+    assert isinstance(local, WintexEliteDecoder)
+    assert "ZONES" in local.unknown_topics()
+    try:
+        await local.udl_read_with(client, UDLTopics.ZONES)
+        assert local.unknown_ranges(UDLTopics.ZONES) == []
+        assert "ZONES" not in local.unknown_topics()
+        assert "USERS" in local.unknown_topics()
+
+        # a second pass reads only what the first left out
+        topics = UDLTopics.ZONES | UDLTopics.USERS
+        plan = local.udl_read_plan(topics, client.read_size, local.mem_valid.ranges())
+        assert len(plan) < len(local.udl_read_plan(topics, client.read_size))
+        requests = client.counters.requests
+        await local.udl_read_with(client, topics, skip_valid=True)
+        assert client.counters.requests - requests == len(plan)
+        assert local.unknown_ranges(topics) == []
+    finally:
+        await client.close()
+        server.close()
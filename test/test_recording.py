@@ -0,0 +1,95 @@
+import asyncio
+import contextlib
+import glob
+import io
+import os
+import time
+from typing import Any
+
+import pytest
+
+from pytexalarm.pialarm import get_panel_decoder
+from pytexalarm.recording import (
+    SessionRecorder,
+    read_recording,
+    records_from_ser2net,
+    replay,
+    write_recording,
+)
+from pytexalarm.trace_uart import panel_from_recording
+from pytexalarm.udl import SerialWintex
+from pytexalarm.udlclient import ProtocolUDLClient
+from pytexalarm.udlserver import start_udl_server
+
+
+class FrameLog(SerialWintex):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.msgs: list[bytes] = []
+
+    def handle_msg(self, body: bytes) -> None:
+        self.msgs.append(bytes(body))
+
+
+def test_convert_trace(tmp_path: str) -> None:
+    fn = os.path.join(tmp_path, "zones.udlrec")
+    with open("protocol/wintex-ser2net/zones.trace", "r") as r:
+        write_recording(fn, records_from_ser2net(r))
+    panel = panel_from_recording(fn)
+    assert panel is not None
+    data = panel.decode()
+    assert data["zones"][0]["name"] == "ZOME001abcdefghi"
+    assert data["zones"][1]["name"] == "zome002abcdefghi"
+    assert data["zones"][2]["name"] == "ZOME003"
+
+
+def test_corpus_round_trip(tmp_path: str) -> None:
+    # every trace survives conversion, then replays the same frames
+    for trace in sorted(glob.glob("protocol/wintex-ser2net/*.trace")):
+        with open(trace, "r") as r:
+            records = list(records_from_ser2net(r))
+        fn = os.path.join(tmp_path, os.path.basename(trace) + ".udlrec")
+        write_recording(fn, records)
+        assert list(read_recording(fn)) == records, trace
+
+        sinks = {"tcp": FrameLog(), "term": FrameLog()}
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(replay(read_recording(fn), sinks, speed=0))
+        assert sinks["tcp"].msgs or sinks["term"].msgs, trace
+
+
+def test_replay_speed(tmp_path: str) -> None:
+    fn = os.path.join(tmp_path, "timed.udlrec")
+    write_recording(fn, [(0.0, "tcp", b"\x03P\xac"), (0.2, "term", b"\x03P\xac")])
+    sinks = {"tcp": FrameLog(), "term": FrameLog()}
+    start = time.monotonic()
+    asyncio.run(replay(read_recording(fn), sinks, speed=2.0))
+    assert time.monotonic() - start >= 0.09
+    assert sinks["tcp"].msgs == [b"P"]
+    assert sinks["term"].msgs == [b"P"]
+
+
+@pytest.mark.asyncio
+async def test_record_session(tmp_path: str) -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    prefix = os.path.join(tmp_path, "server")
+    server = await start_udl_server(panel, False, "127.0.0.1", 0, record=prefix)
+    port = server.sockets[0].getsockname()[1]
+    client = await ProtocolUDLClient.create("127.0.0.1", "", port=port, stupid_delay=0)
+    client.recorder = SessionRecorder(os.path.join(tmp_path, "client.udlrec"))
+    await client.send_heartbeat()
+    await client.read_mem(0x5400, 16)
+    await client.close()
+    client.recorder.close()
+    # let the server see the close and finish its recording
+    await asyncio.sleep(0.1)
+    server.close()
+    await server.wait_closed()
+
+    (server_rec,) = glob.glob(prefix + ".*.udlrec")
+    for fn in (server_rec, os.path.join(tmp_path, "client.udlrec")):
+        sinks = {"tcp": FrameLog(), "term": FrameLog()}
+        await replay(read_recording(fn), sinks, speed=0)
+        assert sinks["tcp"].msgs == [b"P", b"O\x00\x54\x00\x10"]
+        assert sinks["term"].msgs[0] == b"P\xff\xff"
+        assert sinks["term"].msgs[1] == b"I\x00\x54\x00\x10" + bytes(16)
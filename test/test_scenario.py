@@ -0,0 +1,105 @@
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+from pytexalarm.livestate import ChangeEvent, LivePoller
+from pytexalarm.pialarm import ELITE_VIRTUALKEYPAD, get_panel_decoder
+from pytexalarm.scenario import (
+    ZONE_ACTIVE,
+    EventGenerator,
+    ScriptStep,
+    match_events,
+    zone_fields,
+)
+from pytexalarm.snapshot import PanelSnapshots
+from pytexalarm.udlclient import AsyncioUDLClient
+from pytexalarm.udlserver import SerialWintexPanel, start_udl_server
+
+
+@pytest.mark.asyncio
+async def test_scripted_events() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    snapshots = PanelSnapshots(panel)
+    script = [
+        ScriptStep(0, "screen", "Zone 001 Tamper"),
+        ScriptStep(0, "leds", 4),
+        ScriptStep(0, "leds", 4),  # no change, not an event
+        ScriptStep(0, "zone3", ZONE_ACTIVE),
+    ]
+    generator = EventGenerator(panel, zones=24, script=script, snapshots=snapshots)
+    await generator.run()
+
+    assert [(e.field, e.old, e.new) for e in generator.events] == [
+        ("screen", "", "Zone 001 Tamper "),
+        ("leds", 0, 4),
+        ("zone3", "00", "01"),
+    ]
+    assert panel.io[0x1196:0x11A6] == b"Zone 001 Tamper "
+    assert panel.io[0x11B7] == 4
+    assert panel.io[2] == ZONE_ACTIVE
+    # readers see each change as it is made
+    assert snapshots.generation == 3
+    assert snapshots.snapshot().io[0x11B7] == 4
+
+
+def test_events_leave_batch_pending() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    snapshots = PanelSnapshots(panel)
+    ser = SerialWintexPanel(panel, snapshots)
+    ser.handle_msg(b"I\x00\x54\x00\x04ABCD")
+    ser.handle_msg(b"W\x00\x11\x96\x01Z")
+    generator = EventGenerator(panel, snapshots=snapshots)
+    assert generator.apply("screen2", "x")
+    snap = snapshots.snapshot()
+    assert snap.io[0x11A6] == ord("x")
+    # the uncommitted 'I' and 'W' writes stay unpublished, though the 'W'
+    # shares a page
+    assert snap.mem[0x5400:0x5404] == bytes(4)
+    assert snap.io[0x1196] == 0
+    ser.commit()
+    assert snapshots.snapshot().mem[0x5400:0x5404] == b"ABCD"
+    assert snapshots.snapshot().io[0x1196:0x1197] == b"Z"
+
+
+def test_match_events() -> None:
+    truth = [
+        ChangeEvent("leds", 0, 1, 1.0),
+        ChangeEvent("leds", 1, 2, 2.0),  # overwritten before the next poll
+        ChangeEvent("leds", 2, 3, 2.1),
+    ]
+    seen = [ChangeEvent("leds", 0, 1, 1.5), ChangeEvent("leds", 1, 3, 2.5)]
+    latencies, missed = match_events(truth, seen)
+    assert latencies == [0.5, pytest.approx(0.4)]
+    assert missed == [truth[1]]
+
+
+@pytest.mark.asyncio
+async def test_poller_against_generator() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    server = await start_udl_server(panel, False, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = await AsyncioUDLClient.create("127.0.0.1", "1234", port, stupid_delay=0)
+    local = get_panel_decoder(panel.banner)
+    seen: list[ChangeEvent] = []
+    fields = zone_fields(24) + ELITE_VIRTUALKEYPAD.fields
+    poller = LivePoller(
+        local, client, seen.append, fields, min_interval=0.01, max_interval=0.05
+    )
+    generator = EventGenerator(panel, zones=24, rate=40, seed=1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for rng in poller.ranges:
+                await poller.poll(rng)
+            polling = asyncio.create_task(poller.run())
+            await generator.run(20)
+            await asyncio.sleep(0.1)
+            polling.cancel()
+        latencies, missed = match_events(generator.events, seen)
+        assert len(generator.events) == 20
+        assert len(latencies) + len(missed) == 20
+        assert latencies and max(latencies) < 1.0
+    finally:
+        await client.close()
+        server.close()
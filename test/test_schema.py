@@ -0,0 +1,211 @@
+import contextlib
+import glob
+import io
+import os
+import random
+from typing import Any
+
+import pytest
+
+from pytexalarm.paged import PagedMemory
+from pytexalarm.pialarm import (
+    ELITE_ZONES,
+    ZONE_TYPES,
+    ZONE_WIRING,
+    PanelDecoder,
+    get_panel_decoder,
+)
+from pytexalarm.schema import Field, Layout
+from pytexalarm.trace_uart import panel_from_ser2net_trace
+
+
+def test_layout_decode() -> None:
+    mem = bytearray(64)
+    mem[0:5] = b"\0ab\0\0"
+    mem[8:13] = b"cd   "
+    mem[16:20] = bytes([1, 2, 3, 4])
+    mem[32:34] = bytes([0x12, 0x0F])
+    layout = Layout(
+        "things",
+        [
+            Field("name", 0, 8, 5, "ascii"),
+            Field("text", 0, 8, 5, "text"),
+            Field("odd", 16, 2, type="lookup", values=("x", "y"), key="int0"),
+            Field("word", 16, 2, 2),
+            Field("flags", 32, type="hex"),
+            Field("serial", 32, 0, 2, "bcd"),
+        ],
+    )
+    assert layout.decode(mem, 2) == [
+        {
+            "name": "ab",
+            "text": "ab",
+            "odd": 1,
+            "word": 0x0201,
+            "flags": "12",
+            "serial": "12f",
+        },
+        {
+            "name": "cd   ",
+            "text": "cd",
+            "odd": 3,
+            "word": 0x0403,
+            "flags": "0f",
+            "serial": "00",
+        },
+    ]
+    # records past the end of the region decode as zeros
+    assert layout.decode(mem[:20], 3)[2]["word"] == 0
+    assert layout.column("flags", mem[:33], 3) == ["12", "00", "00"]
+    # one field from a slice of its own, as pollers read panel.io
+    assert layout.value("word", mem) == 0x0201
+    assert layout.value("serial", PagedMemory(64, {0: bytes(mem)})) == "12f"
+    assert layout.enums() == {
+        "things.odd": {"type": "lookup", "key": "int0", "values": ["x", "y"]}
+    }
+    with pytest.raises(ValueError):
+        Layout("bad", [Field("x", 0, type="float")])
+
+
+def test_elite_schema() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.mem[0x5400 + 32 * 23 : 0x5400 + 32 * 24] = b"Back Door".ljust(32, b"\0")
+    panel.mem[23] = 16
+    panel.mem[0xC0 + 2 * 23] = 1
+    panel.mem[0x4190:0x4193] = bytes.fromhex("1234ff")
+    js = panel.decode()
+    assert len(js["zones"]) == 24
+    assert js["zones"][23]["name"] == "Back Door"
+    assert js["zones"][23]["type"] == 16
+    assert js["zones"][23]["attrib1"] == 1
+    assert js["zones"][23]["attrib2"] == 0
+    assert js["users"][0]["pincode"] == "1234"
+    # enums come from the same fields
+    zone_types = js["enums"]["zones.type"]["values"]
+    assert zone_types[16] == "Security"
+    assert zone_types == list(ELITE_ZONES.fields[2].values)
+    assert set(js["enums"]) == {
+        "zones.type",
+        "zones.wiring",
+        "zones.access_areas",
+        "keypad.leds",
+    }
+
+
+def old_decode(panel: PanelDecoder) -> dict[str, Any]:
+    # the byte at a time decoder the layouts replaced, as a reference
+    mem, io = panel.mem[:], panel.io[:]
+
+    def ascii(region: bytes, start: int, sz: int) -> str:
+        return "".join([chr(x) for x in region[start : start + sz].strip(b"\0")])
+
+    def bcd(start: int, sz: int) -> str:
+        return "".join(["{:01x}".format(x) for x in mem[start : start + sz]])
+
+    pincode = mem[0x4190 : 0x4190 + 0x4B] + mem[0x630B : 0x630B + 0x18]
+    config = {
+        "unique_id": bcd(0x5D04, 0x10),
+        "engineer_reset": ascii(mem, 0x1100, 32),
+        "anticode_reset": ascii(mem, 0x1120, 32),
+        "service_message": ascii(mem, 0x1140, 32),
+        "panel_location": ascii(mem, 0x1160, 32),
+        "banner_message": ascii(mem, 0x1180, 16),
+        "part_arm_header": ascii(mem, 0x1190, 16),
+    }
+    for n in range(3):
+        config[f"part_arm{n + 1}_message"] = ascii(mem, 0x1800 + 16 * n, 16)
+    return {
+        "zones": [
+            {
+                "name": ascii(mem, 0x5400 + i * 32, 16),
+                "name2": ascii(mem, 0x5400 + i * 32 + 16, 16),
+                "type": mem[i],
+                "chime": mem[0x30 + i],
+                "area": mem[0x60 + i],
+                "wiring": mem[0x90 + i],
+                "attrib1": mem[0xC0 + i * 2],
+                "attrib2": mem[0xC1 + i * 2],
+            }
+            for i in range(24)
+        ],
+        "users": [
+            {
+                "name": ascii(mem, 0x4000 + 8 * i, 8).rstrip(),
+                "pincode": pincode[3 * i : 3 * i + 3].hex().strip("def"),
+                "access_areas": mem[0x42EE + i * 2],
+                "flags0": "{:02x}".format(mem[0x42B6 + i]),
+                "flags1": "{:02x}".format(mem[0x43E8 + i]),
+            }
+            for i in range(25)
+        ],
+        "areas": [{"text": ascii(mem, 0x16A0 + i * 16, 16)} for i in range(2)],
+        "config": config,
+        "area_suites": [
+            {
+                "id": i,
+                "text": ascii(mem, 0x5E8 + i * 16, 16),
+                "arm_mode": "",
+                "areas": "",
+            }
+            for i in range(2)
+        ],
+        "expanders": [
+            {
+                "location": ascii(mem, 0xE50 + i * 16, 16),
+                "area": mem[0xF50 + i * 2],
+                "aux_input": mem[0xF70 + i],
+                "sounds": mem[0xF80 + i],
+                "speaker": mem[0xF90 + i],
+            }
+            for i in range(2)
+        ],
+        "enums": {
+            "zones.type": {"type": "lookup", "key": "int1", "values": list(ZONE_TYPES)},
+            "zones.wiring": {
+                "type": "lookup",
+                "key": "int0",
+                "values": list(ZONE_WIRING),
+            },
+            "zones.access_areas": {"type": "bitmask", "values": ["A", "B"]},
+            "keypad.leds": {"type": "bitmask", "values": ["?", "?", "Omit"]},
+        },
+        "communications": {
+            "sms_centre1": ascii(mem, 0x1A30, 16),
+            "sms_centre2": ascii(mem, 0x1A40, 16),
+        },
+        "virtualkeypad": {
+            "screen": ascii(io, 0x1196, 16),
+            "screen2": ascii(io, 0x11A6, 16),
+            "leds": io[0x11B7],
+        },
+        "keypads": [
+            {
+                "keypad_z1_zone": mem[0xFC0 + i * 2],
+                "keypad_z2_zone": mem[0xFC1 + i * 2],
+                "areas": mem[0xFA0 + i * 2],
+                "options": mem[0xFE0 + i * 2],
+                "sounds": mem[0x1010 + i],
+                "volume": mem[0x1000 + i],
+            }
+            for i in range(4)
+        ],
+    }
+
+
+@pytest.mark.parametrize(
+    "fn", sorted(glob.glob("protocol/wintex-ser2net/*.trace")), ids=os.path.basename
+)
+def test_decode_corpus(fn: str) -> None:
+    with open(fn, "r") as r, contextlib.redirect_stdout(io.StringIO()):
+        panel = panel_from_ser2net_trace(r)
+    assert panel is not None
+    assert panel.decode() == old_decode(panel)
+
+
+def test_decode_random() -> None:
+    # every byte set, so no field decodes from zeros by luck
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    rng = random.Random(3)
+    panel.mem[:] = rng.randbytes(len(panel.mem))
+    panel.io[:] = rng.randbytes(len(panel.io))
+    assert panel.decode() == old_decode(panel)
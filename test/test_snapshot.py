@@ -0,0 +1,76 @@
+from pytexalarm.paged import PAGE_SIZE, PagedMemory
+from pytexalarm.pialarm import get_panel_decoder
+from pytexalarm.snapshot import ZERO_PAGE, PanelSnapshots
+from pytexalarm.udl import udl_frame
+from pytexalarm.udlserver import SerialWintexPanel
+
+
+def test_snapshots() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.mem[0x5400:0x5408] = b"Kitchen "
+    snapshots = PanelSnapshots(panel)
+    ser = SerialWintexPanel(panel, snapshots)
+    before = snapshots.snapshot()
+    assert snapshots.snapshot() is before
+
+    # wintex writes are visible to its own reads, not to snapshot readers
+    ser.on_bytes(udl_frame(b"I\x00\x54\x00\x04Hall"))
+    ser.on_bytes(udl_frame(b"O\x00\x54\x00\x04"))
+    assert ser.outbound[-1] == udl_frame(b"I\x00\x54\x00\x04Hall")
+    ser.on_bytes(udl_frame(b"W\x00\x11\x96\x02Hi"))
+    assert snapshots.generation == 0
+    assert snapshots.snapshot() is before
+    assert before.decode()["zones"][0]["name"] == "Kitchen "
+
+    # until the zone commit
+    ser.on_bytes(udl_frame(b"U\x01"))
+    assert snapshots.generation == 1
+    after = snapshots.snapshot()
+    assert after.decode()["zones"][0]["name"] == "Hallhen "
+    assert after.io[0x1196:0x1198] == b"Hi"
+    assert before.decode()["zones"][0]["name"] == "Kitchen "
+
+    # only the written pages were copied
+    _, mem_pages, _ = snapshots.committed
+    page = 0x5400 // PAGE_SIZE
+    ser.on_bytes(udl_frame(b"I\x00\x00\x00\x01\x07"))
+    ser.on_bytes(udl_frame(b"H"))
+    _, new_pages, _ = snapshots.committed
+    assert new_pages[page] is mem_pages[page]
+    assert new_pages[0] is not mem_pages[0]
+    assert snapshots.snapshot().mem[0] == 7
+    assert snapshots.commit() == 2
+
+
+def test_commit_io_lazy() -> None:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    snapshots = PanelSnapshots(panel)
+    _, mem_pages, io_pages = snapshots.committed
+    for i in range(10):
+        panel.io[0x11B7] = i
+        assert snapshots.commit_io(0x11B7, 1) == i + 1
+    # nothing copied until a reader asks
+    assert snapshots.committed[2] is io_pages
+    snap = snapshots.snapshot()
+    assert snap.io[0x11B7] == 9
+    _, new_mem, new_io = snapshots.committed
+    assert new_mem is mem_pages
+    assert [p for p in range(len(io_pages)) if new_io[p] is not io_pages[p]] == [4]
+    # and the snapshot decodes from the committed pages themselves
+    assert isinstance(snap.io, PagedMemory)
+    assert snap.io.pages[4] is new_io[4]
+
+
+def test_sparse_snapshots() -> None:
+    # an unknown panel is sparse, and so are its generations
+    panel = get_panel_decoder("Unknown panel")
+    assert isinstance(panel.mem, PagedMemory)
+    panel.mem[0x5400:0x5404] = b"Hall"
+    snapshots = PanelSnapshots(panel)
+    _, mem_pages, io_pages = snapshots.committed
+    assert [p for p, page in enumerate(mem_pages) if page is not ZERO_PAGE] == [0x15]
+    assert all(page is ZERO_PAGE for page in io_pages)
+    snap = snapshots.snapshot()
+    assert isinstance(snap.mem, PagedMemory)
+    assert snap.mem.allocated() == PAGE_SIZE
+    assert snap.mem[0x5400:0x5404] == b"Hall"
@@ -1,3 +1,6 @@
+import contextlib
+import glob
+import io
 import os
 
 import pytest
@@ -40,3 +43,14 @@ def test_pcap_trace() -> None:
     assert data["zones"][7]["name"] == "Bedroom PIR"
     assert data["zones"][8]["name"] == "Stairs Top PIR"
     assert data["zones"][9]["name"] == "Boot Room Door"
+
+
+@pytest.mark.parametrize(
+    "fn", sorted(glob.glob("protocol/wintex-ser2net/*.trace")), ids=os.path.basename
+)
+def test_ser2net_corpus(fn: str) -> None:
+    # every trace replays, including writes past the regions we size
+    with open(fn, "r") as r, contextlib.redirect_stdout(io.StringIO()):
+        panel = panel_from_ser2net_trace(r)
+    assert panel is not None
+    assert len(panel.decode()["zones"]) == 24
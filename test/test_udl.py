@@ -1,8 +1,21 @@
 import random
+from typing import Any
 
 import pytest
 
-from pytexalarm.udl import compact_ranges, udl_frame, udl_verify, uncompact_ranges
+from pytexalarm.udl import (
+    SerialWintex,
+    SerialWintexDispatch,
+    compact_ranges,
+    handles,
+    plan_cost,
+    plan_reads,
+    subtract_ranges,
+    udl_frame,
+    udl_verify,
+    uncompact_ranges,
+    union_ranges,
+)
 
 
 def test_checksum() -> None:
@@ -33,6 +46,93 @@ def test_frame() -> None:
     assert udl_frame(b"ZElite 24    V6.05.03") == b"\x17ZElite 24    V6.05.03\xe5"
 
 
+class RecordingWintex(SerialWintex):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.msgs: list[bytes] = []
+        self.outbound: list[bytes] = []
+
+    def handle_msg(self, body: bytes) -> bytes:
+        self.msgs.append(bytes(body))
+        return b"\x06"
+
+    def send_bytes(self, msg: bytes) -> None:
+        self.outbound.append(msg)
+
+
+@pytest.mark.parametrize("zerocopy", [False, True])
+def test_on_bytes(zerocopy: bool) -> None:
+    p = RecordingWintex(zerocopy=zerocopy)
+    stream = udl_frame(b"Z") + udl_frame(b"O\x00\x16\x78\x01") + udl_frame(b"P")
+    # split mid-frame, then a corrupt frame recovered by ATZ
+    p.on_bytes(stream[0:4])
+    p.on_bytes(stream[4:])
+    p.on_bytes(b"\x05\x01\x02\x03\x04ATZ\r" + udl_frame(b"H")[0:2])
+    assert p.msgs == [b"Z", b"O\x00\x16\x78\x01", b"P"]
+    assert p.buf == b"\x03H"
+    p.on_bytes(b"\xb4")
+    assert p.msgs[-1] == b"H"
+    assert p.outbound == [b"\x03\x06\xf6"] * 4
+    assert p.buf == b""
+
+
+class FailingWintex(RecordingWintex):
+    def handle_msg(self, body: bytes) -> bytes:
+        super().handle_msg(body)
+        if body == b"X":
+            raise RuntimeError("handler bug")
+        return b"\x06"
+
+
+@pytest.mark.parametrize("zerocopy", [False, True])
+def test_on_bytes_handler_raises(zerocopy: bool) -> None:
+    # the frame that raised is consumed, and the rest handled on the next call
+    p = FailingWintex(zerocopy=zerocopy)
+    with pytest.raises(RuntimeError):
+        p.on_bytes(udl_frame(b"Z") + udl_frame(b"X") + udl_frame(b"P"))
+    p.on_bytes(b"")
+    assert p.msgs == [b"Z", b"X", b"P"]
+    assert p.buf == b""
+
+
+class EchoDispatch(SerialWintexDispatch):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.outbound: list[bytes] = []
+
+    @handles(b"E")
+    def echo(self, body: bytes) -> bytes:
+        return b"E" + body
+
+    def send_bytes(self, msg: bytes) -> None:
+        self.outbound.append(msg)
+
+
+class PingDispatch(EchoDispatch):
+    @handles(b"P")
+    def ping(self, body: bytes) -> bytes:
+        return b"P\xff\xff"
+
+
+def test_dispatch() -> None:
+    p = PingDispatch()
+    p.on_bytes(udl_frame(b"Eab") + udl_frame(b"P") + udl_frame(b"P") + udl_frame(b"X"))
+    pong = udl_frame(b"P\xff\xff")
+    assert p.outbound == [udl_frame(b"Eab"), pong, pong]
+    assert p.command_counts() == {"E": 1, "P": 2, "X": 1}
+    # an empty body is unknown, not a crash
+    p.on_bytes(b"\x02\xfd" + udl_frame(b"P"))
+    assert p.outbound[3:] == [pong]
+
+    # a subclass's handlers stay out of its parent's table
+    assert ord("P") not in EchoDispatch.handlers
+    EchoDispatch.register(b"X", lambda self, body: b"\x06")
+    e = EchoDispatch()
+    e.on_bytes(udl_frame(b"X") + udl_frame(b"P"))
+    assert e.outbound == [udl_frame(b"\x06")]
+    assert ord("X") not in PingDispatch.handlers
+
+
 @pytest.fixture
 def notrandom() -> None:
     random.seed(0)
@@ -53,3 +153,32 @@ def test_compact_uncompact_ranges(notrandom: None) -> None:
             gs.append((base, sz))
         print(gs)
         assert compact_ranges(uncompact_ranges(gs)) == gs
+
+
+def test_plan_reads() -> None:
+    assert union_ranges([(6769, 1), (6769, 1), (8143, 1)]) == [(6769, 1), (8143, 1)]
+    assert union_ranges([(10, 10), (0, 15), (20, 5), (30, 0)]) == [(0, 25)]
+    assert union_ranges([(0, 10), (20, 10)]) == [(0, 10), (20, 10)]
+    assert union_ranges([(0, 10), (20, 10)], merge_gap=10) == [(0, 30)]
+
+    # (2496,160) and (2408,48) requested by several topics only get read once
+    plan = plan_reads([(2496, 160), (2408, 48), (2496, 160), (2408, 48)])
+    assert plan == [(2408, 48), (2496, 64), (2560, 64), (2624, 32)]
+    assert plan_cost(plan) == (4, 208)
+    assert subtract_ranges([(0, 100), (200, 10)], [(10, 20), (40, 5)]) == [
+        (0, 10),
+        (30, 10),
+        (45, 55),
+        (200, 10),
+    ]
+    assert subtract_ranges([(0, 100)], [(0, 64), (64, 64)]) == []
+    assert subtract_ranges([(10, 20)], [(0, 15), (25, 100)]) == [(15, 10)]
+    assert plan_reads([(0, 24), (30, 24), (300, 130)], frame_size=128) == [
+        (0, 54),
+        (300, 128),
+        (428, 2),
+    ]
+    # joining would need a third frame, so the gap isn't worth reading
+    plan = plan_reads([(0, 64), (74, 64)])
+    assert plan == [(0, 64), (74, 64)]
+    assert plan_cost(plan) == (2, 128)
@@ -0,0 +1,629 @@
+import asyncio
+import os
+import time
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Optional
+
+import pytest
+import pytest_asyncio
+
+from pytexalarm.journal import ReadJournal
+from pytexalarm.livestate import ChangeEvent, LivePoller
+from pytexalarm.pialarm import (
+    PanelDecoder,
+    UDLTopics,
+    WintexEliteDecoder,
+    get_panel_decoder,
+    panel_from_file,
+)
+from pytexalarm.udl import udl_frame
+from pytexalarm.udlclient import (
+    AsyncioUDLClient,
+    BaseUDLClient,
+    ProtocolUDLClient,
+    RttEstimator,
+    SerialUDLClient,
+    UDLFrameProtocol,
+    UDLSession,
+)
+from pytexalarm.udlserver import (
+    DirectoryWintexPanel,
+    LinkModel,
+    PanelDirectory,
+    SerialWintexPanel,
+    link_factory,
+    parser,
+    serve_directory,
+    start_udl_server,
+)
+
+
+@pytest.fixture
+def panel() -> PanelDecoder:
+    panel = get_panel_decoder("Elite 24    V4.02.01")
+    panel.mem[:] = bytes(i % 251 for i in range(len(panel.mem)))
+    return panel
+
+
+@pytest_asyncio.fixture
+async def server_port(panel: PanelDecoder) -> AsyncIterator[int]:
+    server = await start_udl_server(panel, False, "127.0.0.1", 0)
+    yield server.sockets[0].getsockname()[1]
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_read_ranges(panel: PanelDecoder, server_port: int) -> None:
+    client = await AsyncioUDLClient.create(
+        "127.0.0.1", "1234", port=server_port, stupid_delay=0
+    )
+    try:
+        assert await client.read_identification() == panel.banner
+        assert client.read_size == 248
+        ranges = [(0, 24), (21504, 64), (21568, 64), (6769, 1), (6769, 1)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        assert client.last_read_stats.frames == 5
+        assert client.last_read_stats.nbytes == 154
+
+        target = get_panel_decoder(panel.banner)
+        await target.udl_read_with(client, UDLTopics.ZONES)
+        assert target.mem[21504 : 21504 + 768] == panel.mem[21504 : 21504 + 768]
+    finally:
+        await client.close()
+
+
+class LossyPanel(SerialWintexPanel):
+    def __init__(self, panel: PanelDecoder, drop: int, **kwargs: Any) -> None:
+        super().__init__(panel, **kwargs)
+        self.drop = drop
+
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        reply = super().handle_msg(body)
+        if body[0:1] == b"O":
+            self.drop -= 1
+            if self.drop == 0:
+                return None
+        return reply
+
+
+class DeadPanel(SerialWintexPanel):
+    # stops answering reads for good after the first 'alive' of them
+    def __init__(self, panel: PanelDecoder, alive: int, **kwargs: Any) -> None:
+        super().__init__(panel, **kwargs)
+        self.alive = alive
+
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        if body[0:1] == b"O":
+            self.alive -= 1
+            if self.alive < 0:
+                return None
+        return super().handle_msg(body)
+
+
+async def serve(
+    factory: Callable[[], SerialWintexPanel], protocol: bool = False
+) -> tuple[asyncio.Server, BaseUDLClient]:
+    async def handler(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        ser = factory()
+        while data := await reader.read(4096):
+            ser.on_bytes(data)
+            writer.writelines(ser.outbound)
+            del ser.outbound[:]
+
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    if protocol:
+        loop = asyncio.get_running_loop()
+        _, proto = await loop.create_connection(UDLFrameProtocol, "127.0.0.1", port)
+        return server, ProtocolUDLClient(proto, "1234", None, window=4, timeout=0.2)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    client = AsyncioUDLClient(reader, writer, "1234", None, window=4, timeout=0.2)
+    return server, client
+
+
+@pytest.mark.parametrize("protocol", [False, True])
+@pytest.mark.asyncio
+async def test_read_ranges_lost_reply(panel: PanelDecoder, protocol: bool) -> None:
+    server, client = await serve(lambda: LossyPanel(panel, drop=3), protocol)
+    try:
+        ranges = [(base, 64) for base in range(0, 640, 64)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        assert client.last_read_stats.retries == 1
+        # only the lost page was asked for again
+        assert client.counters.requests == len(ranges) + 1
+    finally:
+        await client.close()
+        server.close()
+
+
+class GarblingPanel(LossyPanel):
+    # corrupts the checksum of one read reply instead of dropping it
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        reply = super().handle_msg(body)
+        if body[0:1] == b"O" and reply is None:
+            good = udl_frame(SerialWintexPanel.handle_msg(self, body) or b"")
+            self.outbound.append(good[:-1] + bytes([good[-1] ^ 0xFF]))
+        return reply
+
+
+@pytest.mark.parametrize("protocol", [False, True])
+@pytest.mark.asyncio
+async def test_read_ranges_garbled_reply(panel: PanelDecoder, protocol: bool) -> None:
+    server, client = await serve(lambda: GarblingPanel(panel, drop=3), protocol)
+    logged: list[str] = []
+    client.log = logged.append
+    try:
+        ranges = [(base, 64) for base in range(0, 640, 64)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        assert client.counters.bad_replies == 1
+        # only the garbled page was asked for again
+        assert client.counters.requests == len(ranges) + 1
+        assert any("CRC" in msg for msg in logged)
+    finally:
+        await client.close()
+        server.close()
+
+
+class SmallFramePanel(SerialWintexPanel):
+    # answers oversized reads with only the first 64 bytes
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        reply = super().handle_msg(body)
+        if reply and body[0:1] == b"O" and body[4] > 64:
+            return reply[0:4] + b"\x40" + reply[5:69]
+        return reply
+
+
+@pytest.mark.asyncio
+async def test_probe_read_size(panel: PanelDecoder) -> None:
+    server, client = await serve(lambda: SmallFramePanel(panel))
+    try:
+        assert await client.probe_read_size("Small frames") == 64
+        assert client.read_size_cache["Small frames"] == 64
+        client.read_size_cache["Small frames"] = 128
+        assert await client.probe_read_size("Small frames") == 128
+    finally:
+        await client.close()
+        server.close()
+
+
+class IgnoringPanel(SerialWintexPanel):
+    # doesn't answer oversized reads at all, and counts them
+    ignored = 0
+
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        if body[0:1] == b"O" and body[4] > 64:
+            self.ignored += 1
+            return None
+        return super().handle_msg(body)
+
+
+@pytest.mark.asyncio
+async def test_probe_read_size_ignored(panel: PanelDecoder) -> None:
+    ser = IgnoringPanel(panel)
+    server, client = await serve(lambda: ser)
+    try:
+        start = time.monotonic()
+        assert await client.probe_read_size("Ignoring", deadline=0.1) == 64
+        # each size is given up on at its first address
+        assert ser.ignored == 2
+        assert time.monotonic() - start < 2
+    finally:
+        await client.close()
+        server.close()
+
+
+class ShrinkingPanel(SmallFramePanel):
+    # answers large reads in full, until the probe is over
+    def __init__(self, panel: PanelDecoder, full: int, **kwargs: Any) -> None:
+        super().__init__(panel, **kwargs)
+        self.full = full
+
+    def handle_msg(self, body: bytes) -> Optional[bytes]:
+        if body[0:1] == b"O" and body[4] > 64 and self.full > 0:
+            self.full -= 1
+            return SerialWintexPanel.handle_msg(self, body)
+        return super().handle_msg(body)
+
+
+@pytest.mark.asyncio
+async def test_read_size_fallback(panel: PanelDecoder) -> None:
+    server, client = await serve(lambda: ShrinkingPanel(panel, full=2))
+    try:
+        client.banner = "Shrinking"
+        assert await client.probe_read_size("Shrinking") == 248
+        ranges = [(0, 248), (248, 64), (0x5400, 200)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        assert client.read_size == 64
+        assert "Shrinking" not in client.read_size_cache
+        # 2 short replies, then 4 + 4 pages for them
+        assert client.last_read_stats.frames == 9
+    finally:
+        await client.close()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_session(panel: PanelDecoder, server_port: int) -> None:
+    session = UDLSession(
+        partial(
+            AsyncioUDLClient.create, "127.0.0.1", "1234", server_port, stupid_delay=0
+        ),
+        heartbeat=0.1,
+    )
+    logged: list[str] = []
+    session.log = logged.append
+    try:
+        async with session.borrow() as client:
+            assert await client.read_mem(0, 4) == panel.mem[0:4]
+        assert session.banner == panel.banner
+        async with session.borrow() as again:
+            assert again is client
+
+        # idle link is kept alive by heartbeats
+        before = client.last_activity
+        await asyncio.sleep(0.35)
+        assert client.last_activity > before
+
+        # a dropped link is re-established on the next call
+        assert isinstance(client, AsyncioUDLClient)
+        client.writer.close()
+        data = await session.call(lambda c: c.read_mem(16, 4))
+        assert data == panel.mem[16:20]
+        assert session.connects == 2
+        assert session.client is not client
+        # which logs through the session
+        assert session.client and session.client.log == logged.append
+
+        # and the session is a client itself, e.g. for a LivePoller
+        local = get_panel_decoder(panel.banner)
+        events: list[ChangeEvent] = []
+        poller = LivePoller(local, session, events.append)
+        await poller.poll(poller.ranges[0])
+        assert local.io[0x1196:0x11A6] == panel.io[0x1196:0x11A6]
+        assert await session.read_identification() == panel.banner
+
+        # a caller's own bug is theirs, not a reason to reconnect
+        def bug(c: BaseUDLClient) -> Any:
+            raise ValueError("caller bug")
+
+        with pytest.raises(ValueError):
+            await session.call(bug)
+        assert session.connects == 2
+
+        # a request cancelled before its reply arrives takes the link with it
+        busy = session.client
+        assert busy
+        busy.counters.requests = 0
+        task = asyncio.create_task(session.call(lambda c: c.read_mem(0, 4)))
+        while not busy.counters.requests:
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert busy.is_closing()
+        assert await session.call(lambda c: c.read_mem(0, 4)) == panel.mem[0:4]
+        assert session.connects == 3
+    finally:
+        await session.close()
+
+
+@pytest.mark.asyncio
+async def test_write(panel: PanelDecoder, server_port: int) -> None:
+    client = await AsyncioUDLClient.create(
+        "127.0.0.1", "1234", port=server_port, stupid_delay=0
+    )
+    try:
+        local = get_panel_decoder(panel.banner)
+        local.mem[:] = panel.mem[:]
+        local.mark_known(0, 0x5000)
+        # one zone name change is one frame, written though never read
+        writes = await local.udl_write_edits(client, {0x5400 + 32: b"Back Door"}, True)
+        assert writes == [(0x5420, 9)]
+        assert panel.mem[0x5420:0x5429] == b"Back Door"
+
+        # nearby changes are coalesced, distant ones get their own frame
+        target = bytearray(local.mem[:])
+        target[0] = target[5] = target[0x4000] = 0xAA
+        writes = await local.udl_write_with(client, target, verify=True)
+        assert writes == [(0, 6), (0x4000, 1)]
+        assert panel.mem == target
+        assert await local.udl_write_with(client, target) == []
+
+        # but not across bytes never read, which would overwrite them with zeros
+        panel.mem[0x5442] = 0x55
+        writes = await local.udl_write_edits(client, {0x5440: b"\x01", 0x5444: b"\x02"})
+        assert writes == [(0x5440, 1), (0x5444, 1)]
+        assert panel.mem[0x5442] == 0x55
+
+        # an edit matching the zeros in mem is still written if never read
+        writes = await local.udl_write_edits(client, {0x5442: b"\x00"})
+        assert writes == [(0x5442, 1)]
+        assert panel.mem[0x5442] == 0
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_read_mem_retry(panel: PanelDecoder) -> None:
+    server, client = await serve(lambda: LossyPanel(panel, drop=2))
+    try:
+        assert await client.read_mem(0, 8) == panel.mem[0:8]
+        # second read's reply is lost, it times out and is sent again
+        assert await client.read_mem(8, 8) == panel.mem[8:16]
+        assert client.counters.requests == 3
+        assert client.counters.timeouts == 1
+        assert client.counters.retries == 1
+
+    finally:
+        await client.close()
+        server.close()
+
+    # retries are bounded
+    server, client = await serve(lambda: LossyPanel(panel, drop=1))
+    client.retries = 0
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await client.read_mem(0, 8)
+        assert client.counters.timeouts == 1
+    finally:
+        await client.close()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_link_model(panel: PanelDecoder) -> None:
+    # a 19200 baud UART and 10ms of panel per request: the 71 byte reply to a
+    # 64 byte read takes 37ms on the wire, so the read can't beat 47ms
+    link = LinkModel(baudrate=19200, frame_delay=0.01)
+    server = await start_udl_server(panel, False, "127.0.0.1", 0, link=link)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    client = AsyncioUDLClient(reader, writer, "1234", None, timeout=0.5)
+    try:
+        start = time.monotonic()
+        assert await client.read_mem(0, 64) == panel.mem[0:64]
+        assert time.monotonic() - start >= 0.047
+    finally:
+        await client.close()
+        server.close()
+
+    # garbled bytes, the same ones every run, are retried past
+    link = LinkModel(corrupt_rate=0.002, seed=1)
+    server = await start_udl_server(panel, False, "127.0.0.1", 0, link=link)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    client = AsyncioUDLClient(reader, writer, "1234", None, timeout=0.2)
+    try:
+        ranges = [(base, 64) for base in range(0, 3200, 64)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        assert client.counters.retries > 0
+    finally:
+        await client.close()
+        server.close()
+
+
+@pytest.mark.parametrize("protocol", [False, True])
+@pytest.mark.asyncio
+async def test_read_ranges_lossy_link(panel: PanelDecoder, protocol: bool) -> None:
+    # a lost byte runs one reply into the next, taking several with it
+    link = LinkModel(baudrate=115200, drop_rate=0.0005, seed=0)
+    server = await start_udl_server(panel, False, "127.0.0.1", 0, link=link)
+    port = server.sockets[0].getsockname()[1]
+    create = ProtocolUDLClient.create if protocol else AsyncioUDLClient.create
+    client = await create("127.0.0.1", "1234", port, stupid_delay=0)
+    client.rtt = RttEstimator(0.5)
+    try:
+        ranges = [(base, 64) for base in range(0, 6400, 64)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        assert client.counters.timeouts + client.counters.bad_replies > 0
+    finally:
+        await client.close()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_link_per_connection(panel: PanelDecoder) -> None:
+    # the first connection is through a slow panel, the second is not
+    links = link_factory(parser.parse_args(["--link-delay", "0.05", "0"]))
+    server = await start_udl_server(panel, False, "127.0.0.1", 0, link=links)
+    port = server.sockets[0].getsockname()[1]
+    times = []
+    try:
+        for _ in range(2):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            client = AsyncioUDLClient(reader, writer, "1234", None, timeout=0.5)
+            start = time.monotonic()
+            assert await client.read_mem(0, 64) == panel.mem[0:64]
+            times.append(time.monotonic() - start)
+            await client.close()
+    finally:
+        server.close()
+    assert times[0] >= 0.05 > times[1]
+
+    # one model is copied to each connection, seeded apart
+    model = LinkModel(corrupt_rate=0.1, seed=3)
+    assert [model.for_connection(i).seed for i in range(3)] == [3, 4, 5]
+    assert model.seed == 3
+
+
+def test_rtt_estimator() -> None:
+    rtt = RttEstimator(initial=5.0, factor=3.0, floor=0.5)
+    assert rtt.deadline() == 5.0
+    for _ in range(50):
+        rtt.add(0.01)
+    assert rtt.deadline() == 0.5
+    for _ in range(50):
+        rtt.add(0.4)
+    assert rtt.deadline() == pytest.approx(1.2)
+
+
+@pytest.mark.asyncio
+async def test_resume_download(panel: PanelDecoder, tmp_path: str) -> None:
+    assert isinstance(panel, WintexEliteDecoder)
+    topics = UDLTopics.ZONES | UDLTopics.USERS | UDLTopics.AREAS
+    plan = panel.udl_read_plan(topics)
+    journal = ReadJournal(os.path.join(tmp_path, "panel.mem.journal"))
+    journal.start(panel.banner)
+
+    first = get_panel_decoder(panel.banner)
+    server, client = await serve(lambda: DeadPanel(panel, alive=len(plan) // 2 + 5))
+    client.retries = 1
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await first.udl_read_with(client, topics, journal)
+    finally:
+        await client.close()
+        server.close()
+
+    second = get_panel_decoder(panel.banner)
+    done = journal.replay(panel.banner, second.mem)
+    # every page answered before the panel died was journalled
+    assert len(done) == len(plan) // 2 + 5
+    assert journal.replay("Elite 48    V4.02.01", bytearray(0)) == []
+    server, client = await serve(lambda: SerialWintexPanel(panel))
+    try:
+        await second.udl_read_with(client, topics, journal, done)
+        assert client.last_read_stats.frames <= len(plan) - len(done)
+    finally:
+        await client.close()
+        server.close()
+    for base, sz in plan:
+        assert second.mem[base : base + sz] == panel.mem[base : base + sz]
+
+
+@pytest_asyncio.fixture
+async def pty_panel(panel: PanelDecoder) -> AsyncIterator[tuple[int, str]]:
+    # the emulator on the master side of a pty, the client opens the slave
+    master, slave = os.openpty()
+    ser = SerialWintexPanel(panel, direction="uart")
+
+    def on_readable() -> None:
+        ser.on_bytes(os.read(master, 4096))
+        for out in ser.outbound:
+            os.write(master, out)
+        del ser.outbound[:]
+
+    loop = asyncio.get_running_loop()
+    loop.add_reader(master, on_readable)
+    yield master, os.ttyname(slave)
+    loop.remove_reader(master)
+    os.close(slave)
+    os.close(master)
+
+
+@pytest.mark.asyncio
+async def test_serial_client(panel: PanelDecoder, pty_panel: tuple[int, str]) -> None:
+    pytest.importorskip("serial_asyncio_fast")
+    master, device = pty_panel
+    client = await SerialUDLClient.create_serial(device, "1234", baudrate=115200)
+    try:
+        assert client.frame_gap == 0.05
+        assert await client.read_identification() == panel.banner
+        ranges = [(0, 24), (21504, 64), (6769, 1)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        await client.write_mem(100, b"\x01\x02")
+        assert panel.mem[100:102] == b"\x01\x02"
+
+        # a reply that stops part way is dropped after the inter-frame gap
+        os.write(master, b"\x10I\x00\x00")
+        with pytest.raises(ValueError, match="stalled"):
+            await client.read_frame()
+        assert await client.read_mem(0, 8) == panel.mem[0:8]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_protocol_client(panel: PanelDecoder, server_port: int) -> None:
+    client = await ProtocolUDLClient.create(
+        "127.0.0.1", "1234", port=server_port, stupid_delay=0
+    )
+    try:
+        assert await client.read_identification() == panel.banner
+        ranges = [(0, 24), (21504, 248), (6769, 1), (6769, 1)]
+        data = await client.read_ranges(ranges)
+        assert data == [panel.mem[b : b + s] for b, s in ranges]
+        await client.write_mem(100, b"\x01\x02")
+        assert panel.mem[100:102] == b"\x01\x02"
+        await client.send_heartbeat()
+    finally:
+        await client.close()
+    with pytest.raises(ConnectionError):
+        await client.read_frame()
+
+
+@pytest.mark.asyncio
+async def test_panel_directory(tmp_path: str) -> None:
+    for i, passwd in enumerate(["1111", "2222", ""]):
+        p = get_panel_decoder("Elite 24    V4.02.01")
+        p.udlpasswd = passwd
+        p.mem[0:4] = bytes([i] * 4)
+        p.save(os.path.join(tmp_path, f"panel{i}.panel"))
+    with open(os.path.join(tmp_path, "notes.txt"), "w") as f:
+        f.write("not a panel")
+
+    directory = PanelDirectory(str(tmp_path), max_resident=1)
+    assert list(directory.files) == ["panel0", "panel1", "panel2"]
+    assert directory.loads == 0
+    (server,) = await serve_directory(directory, 0, False, False, "127.0.0.1")
+    port = server.sockets[0].getsockname()[1]
+
+    async def login(passwd: str) -> AsyncioUDLClient:
+        client = await AsyncioUDLClient.create(
+            "127.0.0.1", passwd, port=port, stupid_delay=0
+        )
+        client.rtt = RttEstimator(0.2)
+        client.retries = 0
+        return client
+
+    try:
+        # the panel without a stored password is found by its file name
+        clients = [await login(pw) for pw in ("1111", "2222", "panel2")]
+        for i, client in enumerate(clients):
+            assert await client.read_identification() == "Elite 24    V4.02.01"
+            assert await client.read_mem(0, 4) == bytes([i] * 4)
+        # all three stay loaded while connected, despite max_resident
+        assert len(directory.resident) == 3
+        await clients[1].write_mem(0, b"\x09")
+        for client in clients:
+            await client.close()
+
+        stranger = await login("9999")
+        with pytest.raises(asyncio.TimeoutError):
+            await stranger.read_identification()
+        await stranger.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    # once idle, the least recently used panels are evicted and written back
+    await asyncio.sleep(0.1)
+    assert list(directory.resident) == ["panel2"]
+    assert directory.loads == 3
+    assert panel_from_file(directory.files["panel1"]).mem[0:4] == b"\x09\x01\x01\x01"
+
+
+def test_panel_directory_writes(tmp_path: str, capsys: Any) -> None:
+    for i in range(2):
+        p = get_panel_decoder("Elite 24    V4.02.01")
+        p.udlpasswd = "1111"
+        p.save(os.path.join(tmp_path, f"panel{i}.panel"))
+    directory = PanelDirectory(str(tmp_path), max_resident=0)
+    # a second panel with the same password can't be chosen at login
+    assert "panel1 has the same UDL login as panel0" in capsys.readouterr().out
+    assert directory.by_password("1111") == "panel0"
+
+    # live state written with 'W' is saved on eviction too
+    ser = DirectoryWintexPanel(directory, "panel1", direction="tcp")
+    ser.handle_msg(b"W\x00\x11\x96\x02Hi")
+    ser.release()
+    assert panel_from_file(directory.files["panel1"]).io[0x1196:0x1198] == b"Hi"
@@ -1,3 +1,4 @@
+import json
 from typing import Any
 
 import pytest
@@ -32,3 +33,14 @@ async def test_webpage(
     resp = await webui_client.get("/")
     assert resp.status == 200
     assert "Elite 24" in await resp.text()
+
+
+@pytest.mark.asyncio
+async def test_log(
+    mock_panel: PanelDecoder, webui_client: TestClient[Any, Any]
+) -> None:
+    resp = await webui_client.get("/log?parameter=3")
+    assert resp.status == 200
+    assert json.loads(await resp.text()) == []
+    resp = await webui_client.get("/log?start=yesterday")
+    assert resp.status == 400